@@ -16,7 +16,7 @@ function App() {
   const [loading, setLoading] = useState(false);
   const [updating, setUpdating] = useState(false);
   const [error, setError] = useState(null);
-  const [latestUpdate, setLatestUpdate] = useState(null);
+  const [summary, setSummary] = useState(null);
   const [user, setUser] = useState(null);
   const [authLoading, setAuthLoading] = useState(true);
   const [configurationError, setConfigurationError] = useState(null);
@@ -43,8 +43,10 @@ function App() {
       const currentUser = await getCurrentUser();
       setUser(currentUser);
       if (currentUser) {
-        // 認証済みの場合、アイテム一覧を取得
+        // 認証済みの場合、アイテム一覧と更新状態を取得
         fetchItems();
+        fetchStatus();
+        fetchSummary();
       }
     } catch (error) {
       if (process.env.REACT_APP_DEBUG_MODE === 'true') {
@@ -80,15 +82,16 @@ function App() {
   const formatDateTime = (isoString) => {
     if (!isoString) return '未更新';
     
-    const date = new Date(isoString);
+    // タイムゾーンのない時刻はUTCとして扱い、日本時間で表示する
+    const hasTimeZone = /(Z|[+-]\d{2}:\d{2})$/.test(isoString);
+    const date = new Date(hasTimeZone ? isoString : `${isoString}Z`);
     const jstDate = new Date(date.getTime() + 9 * 60 * 60 * 1000);
     
-    return `${jstDate.getFullYear()}/${(jstDate.getMonth() + 1).toString().padStart(2, '0')}/${jstDate.getDate().toString().padStart(2, '0')} ${jstDate.getHours().toString().padStart(2, '0')}:${jstDate.getMinutes().toString().padStart(2, '0')}`;
+    return `${jstDate.getUTCFullYear()}/${(jstDate.getUTCMonth() + 1).toString().padStart(2, '0')}/${jstDate.getUTCDate().toString().padStart(2, '0')} ${jstDate.getUTCHours().toString().padStart(2, '0')}:${jstDate.getUTCMinutes().toString().padStart(2, '0')}`;
   };
 
-  // 更新状態をチェックする関数
-  const checkUpdateStatus = (items) => {
-    const updateLock = items.find(item => item.id === '__UPDATE_LOCK__');
+  // 更新状態をチェックする関数（GET /status のレスポンスを判定）
+  const checkUpdateStatus = (updateLock) => {
     if (updateLock && updateLock.status === 'running') {
       try {
         const startTime = new Date(updateLock.started_at);
@@ -115,7 +118,8 @@ function App() {
           return { 
             isUpdating: true, 
             elapsed: elapsedMinutes,
-            startTime: updateLock.started_at 
+            startTime: updateLock.started_at,
+            progress: updateLock.progress
           };
         } else {
           if (process.env.REACT_APP_DEBUG_MODE === 'true') {
@@ -185,64 +189,18 @@ function App() {
       }
       
       if (Array.isArray(response.data)) {
-        const updateStatus = checkUpdateStatus(response.data);
-        
-        if (updateStatus.isUpdating && !updating) {
-          setUpdating(true);
-          if (process.env.REACT_APP_DEBUG_MODE === 'true') {
-            console.log('更新中状態を検出:', updateStatus);
-          }
-        } else if (!updateStatus.isUpdating && updating) {
-          setUpdating(false);
-          if (process.env.REACT_APP_DEBUG_MODE === 'true') {
-            console.log('更新完了を検出');
-          }
-        }
-        
-        const bookItems = response.data.filter(item => item.id !== '__UPDATE_LOCK__');
-        
-        const sortedItems = [...bookItems].sort((a, b) => {
-          if (a.has_sale && !b.has_sale) return -1;
-          if (!a.has_sale && b.has_sale) return 1;
-          
-          const ratioA = a.current_price && a.points ? (a.points / a.current_price) * 100 : 0;
-          const ratioB = b.current_price && b.points ? (b.points / b.current_price) * 100 : 0;
-          
-          if (ratioA > ratioB) return -1;
-          if (ratioA < ratioB) return 1;
-          
-          if (a.updated_at && b.updated_at) {
-            return new Date(b.updated_at) - new Date(a.updated_at);
-          }
-          
-          return 0;
-        });
-        setItems(sortedItems);
-        
-        let latest = null;
-        bookItems.forEach(item => {
-          if (item.updated_at) {
-            const updateTime = new Date(item.updated_at);
-            if (!latest || updateTime > new Date(latest)) {
-              latest = item.updated_at;
-            }
-          }
-        });
-        setLatestUpdate(latest);
-        
-        return updateStatus;
+        // 並び順（セール中 → ポイント還元率 → 更新日時）はAPI側で適用済み
+        setItems(response.data);
       } else {
         console.error('Expected an array but got:', typeof response.data);
         setItems([]);
         setError('データ形式が不正です。管理者に連絡してください。');
-        return { isUpdating: false };
       }
       
     } catch (err) {
       console.error('アイテムの取得に失敗しました:', err);
       setError('アイテムの取得に失敗しました。');
       setItems([]);
-      return { isUpdating: false };
     } finally {
       if (!skipLoadingState) {
         setLoading(false);
@@ -250,7 +208,43 @@ function App() {
     }
   };
 
-  // 更新中の場合は定期的にポーリング
+  // 登録件数・セール件数・最終更新時刻を取得（集計レコード1件の参照のみで軽量）
+  const fetchSummary = async () => {
+    try {
+      const authAxios = await getAuthenticatedAxios();
+      const response = await apiCallWithRetry(
+        () => authAxios.get('/summary')
+      );
+      setSummary(response.data);
+    } catch (err) {
+      console.error('集計の取得に失敗しました:', err);
+    }
+  };
+
+  // スクレイパーの更新状態を取得（更新ロック1件の参照のみで軽量）
+  const fetchStatus = async () => {
+    try {
+      const authAxios = await getAuthenticatedAxios();
+      const response = await apiCallWithRetry(
+        () => authAxios.get('/status')
+      );
+      const updateStatus = checkUpdateStatus(response.data);
+      
+      if (updateStatus.isUpdating) {
+        setUpdating(true);
+        if (process.env.REACT_APP_DEBUG_MODE === 'true') {
+          console.log('更新中状態を検出:', updateStatus);
+        }
+      }
+      
+      return updateStatus;
+    } catch (err) {
+      console.error('更新状態の取得に失敗しました:', err);
+      return null;
+    }
+  };
+
+  // 更新中の場合は定期的に更新状態をポーリング（完了を検出したら一覧を再取得）
   useEffect(() => {
     let interval;
     
@@ -260,16 +254,18 @@ function App() {
       }
       interval = setInterval(async () => {
         try {
-          const updateStatus = await fetchItems(true);
+          const updateStatus = await fetchStatus();
           
           if (updateStatus && !updateStatus.isUpdating) {
             if (process.env.REACT_APP_DEBUG_MODE === 'true') {
               console.log('ポーリングで更新完了を検出しました');
             }
             setUpdating(false);
+            fetchItems(true);
+            fetchSummary();
           } else if (updateStatus && updateStatus.isUpdating) {
             if (process.env.REACT_APP_DEBUG_MODE === 'true') {
-              console.log('まだ更新中です。経過時間:', Math.round(updateStatus.elapsed * 10) / 10, '分');
+              console.log('まだ更新中です。経過時間:', Math.round(updateStatus.elapsed * 10) / 10, '分', updateStatus.progress);
             }
           }
         } catch (error) {
@@ -310,6 +306,7 @@ function App() {
       
       setUrl('');
       fetchItems();
+      fetchSummary();
       setError(null);
     } catch (err) {
       console.error('アイテムの追加に失敗しました:', err);
@@ -332,6 +329,7 @@ function App() {
         const authAxios = await getAuthenticatedAxios();
         await authAxios.delete(`/items/${id}`);
         fetchItems();
+        fetchSummary();
         setError(null);
       } catch (err) {
         console.error('アイテムの削除に失敗しました:', err);
@@ -392,6 +390,7 @@ function App() {
       await signOut();
       setUser(null);
       setItems([]);
+      setSummary(null);
       setError(null);
     } catch (error) {
       console.error('ログアウトエラー:', error);
@@ -563,7 +562,10 @@ function App() {
                 <option value="discount-asc">割引率（低い順）</option>
               </select>
             </div>
-            <span>最終更新: {formatDateTime(latestUpdate)}</span>
+            {summary && (
+              <span>登録: {summary.total_items}件 / セール中: {summary.sale_items}件</span>
+            )}
+            <span>最終更新: {formatDateTime(summary?.last_run?.finished_at)}</span>
             <button 
               className={`update-button ${updating ? 'updating' : ''}`}
               onClick={updateItems}
@@ -0,0 +1,163 @@
+"""
+セール・通知判定のベンチマークと回帰確認
+
+従来の1件ずつの判定（calculate_discount_percentage / should_notify）と、
+1回のループでまとめて判定する kindle_scraper.decide_sales を同じコーパスで実行し、
+割引率・セール判定・通知判定がすべて一致することを確認しつつ処理時間を計測する。
+コーパスは乱数で生成する（--corpus で [{"item": {...}, "kindle_info": {...}}, ...] 形式のJSONも指定できる）。
+NOTIFY_BELOW_MIN_DAYS は従来の判定にない条件のため、比較時は0（無効）にする。
+
+使い方:
+    python lambda/benchmarks/bench_decisions.py --items 5000 --repeat 5
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import kindle_scraper  # noqa: E402
+
+def legacy_calculate_discount_percentage(current_price, list_price, point_value):
+    """従来のcalculate_discount_percentage"""
+    if not current_price or not list_price:
+        return 0
+    current_price = float(current_price)
+    list_price = float(list_price)
+    point_value = float(point_value)
+    effective_price = current_price - point_value
+    discount = list_price - effective_price
+    return (discount / list_price) * 100 if list_price > 0 else 0
+
+def legacy_should_notify(item, current_price, point_value):
+    """従来のshould_notify（ログ出力を除く）"""
+    should_send = True
+    last_notification = item.get('last_notification')
+    if last_notification:
+        try:
+            last_notification_date = datetime.fromisoformat(last_notification)
+            elapsed_days = (datetime.now() - last_notification_date).total_seconds() / (24 * 3600)
+            if elapsed_days < kindle_scraper.NOTIFICATION_INTERVAL_DAYS:
+                last_price = item.get('current_price')
+                last_points = item.get('points', 0)
+                if last_price is not None and current_price is not None:
+                    last_effective_price = float(last_price) - float(last_points)
+                    current_effective_price = float(current_price) - float(point_value)
+                    if current_effective_price >= last_effective_price * 0.9:
+                        should_send = False
+        except (ValueError, TypeError):
+            pass
+    return should_send
+
+def legacy_decide(rows, sale_percentage, sale_price):
+    """従来のevaluate_itemの判定部分を1件ずつ実行する"""
+    discounts, sales, notifications = [], [], []
+    for item, kindle_info in rows:
+        current_price = kindle_info['current_price']
+        point_value = kindle_info['point_value']
+        discount = legacy_calculate_discount_percentage(current_price, kindle_info['list_price'], point_value)
+        has_sale = discount >= sale_percentage or current_price <= sale_price
+        discounts.append(discount)
+        sales.append(has_sale)
+        notifications.append(has_sale and legacy_should_notify(item, current_price, point_value))
+    return discounts, sales, notifications
+
+def batch_decide(rows, sale_percentage, sale_price):
+    """まとめて判定する"""
+    return kindle_scraper.decide_sales(rows, sale_percentage, sale_price, datetime.now())
+
+def generate_corpus(count, seed):
+    """前回の価格・ポイント・通知日時の組み合わせを網羅するようにアイテムを生成する"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    rows = []
+    for index in range(count):
+        price = rng.choice([0, 99, 300, 500, 550, 700, 990, 1200, 1500]) + rng.randint(0, 50)
+        points = rng.choice([0, 0, 1, 5, 50, int(price * 0.2), int(price * 0.5)])
+        item = {'id': f"item-{index:05d}", 'description': f"サンプル書籍 {index}"}
+
+        previous = rng.random()
+        if previous < 0.8:
+            item['current_price'] = Decimal(str(rng.choice([price, price + 100, int(price * 1.2), max(1, price - 10)])))
+            item['points'] = Decimal(str(rng.choice([0, points, points + 10])))
+        elif previous < 0.85:
+            item['current_price'] = Decimal(str(price))
+            item['points'] = None
+
+        notified = rng.random()
+        if notified < 0.5:
+            item['last_notification'] = (now - timedelta(days=rng.uniform(0, 14))).isoformat()
+        elif notified < 0.55:
+            item['last_notification'] = 'invalid-date'
+
+        kindle_info = {
+            'title': item['description'],
+            'current_price': price,
+            'list_price': price,
+            'point_value': points,
+            'item': f"https://www.amazon.co.jp/dp/B{index:09d}"
+        }
+        rows.append((item, kindle_info))
+    return rows
+
+def load_corpus(path):
+    with open(path, encoding='utf-8') as f:
+        records = json.load(f, parse_float=Decimal)
+    return [(record['item'], record['kindle_info']) for record in records]
+
+def measure(decide, rows, sale_percentage, sale_price, repeat):
+    """最良の処理時間（秒）と判定結果を返す"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = decide(rows, sale_percentage, sale_price)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description='セール・通知判定のベンチマークと回帰確認')
+    parser.add_argument('--items', type=int, default=5000, help='生成するアイテム数')
+    parser.add_argument('--seed', type=int, default=0, help='コーパス生成の乱数シード')
+    parser.add_argument('--corpus', help='判定に使うコーパス（JSON）')
+    parser.add_argument('--repeat', type=int, default=5, help='計測の繰り返し回数（最良値を採用）')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    kindle_scraper.NOTIFY_BELOW_MIN_DAYS = 0
+    sale_percentage, sale_price = kindle_scraper.get_sale_thresholds()
+    rows = load_corpus(args.corpus) if args.corpus else generate_corpus(args.items, args.seed)
+
+    legacy_elapsed, expected = measure(legacy_decide, rows, sale_percentage, sale_price, args.repeat)
+    batch_elapsed, got = measure(batch_decide, rows, sale_percentage, sale_price, args.repeat)
+
+    names = ('discount', 'has_sale', 'notify')
+    mismatches = [
+        (rows[index][0]['id'], name, want[index], have[index])
+        for name, want, have in zip(names, expected, got)
+        for index in range(len(rows))
+        if want[index] != have[index]
+    ]
+
+    print(f"アイテム数: {len(rows)}, 繰り返し: {args.repeat}, セール: {sum(expected[1])}件, 通知: {sum(expected[2])}件")
+    print(f"{'decision':<10} {'total ms':>10} {'us/item':>9}")
+    for name, elapsed in (('legacy', legacy_elapsed), ('batch', batch_elapsed)):
+        print(f"{name:<10} {elapsed * 1000:>10.2f} {elapsed * 1e6 / len(rows):>9.2f}")
+
+    if mismatches:
+        print(f"\n不一致 {len(mismatches)}件:")
+        for item_id, name, want, have in mismatches[:10]:
+            print(f"  {item_id} {name}: 従来={want} 一括={have}")
+        return 1
+    print("\n判定はすべて一致しました")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
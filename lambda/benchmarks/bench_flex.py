@@ -0,0 +1,238 @@
+"""
+Flex Messageのバブル作成のベンチマーク
+
+従来の辞書リテラルからバブルを作成してjson.dumpsでサイズを測る方法と、
+kindle_scraper.render_flex_bubble（事前に変換したテンプレートにスロットを埋める方法）で
+セール情報のバブルを作成し、処理時間を比較する。
+タイトルが切り詰められないアイテムについては、両者のJSONが同じ内容になることを確認する。
+
+使い方:
+    python lambda/benchmarks/bench_flex.py --items 1000 --repeat 5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import kindle_scraper  # noqa: E402
+
+def legacy_create_flex_bubble(item):
+    """従来のcreate_flex_bubble（バブルの辞書を毎回作成する）"""
+    return {
+        "type": "bubble",
+        "header": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "text",
+                    "text": f"{item['discount_percentage']:.1f}%オフ",
+                    "color": "#ffffff",
+                    "weight": "bold",
+                    "size": "xl"
+                }
+            ],
+            "backgroundColor": "#DD3333"
+        },
+        "body": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "text",
+                    "text": item['title'],
+                    "weight": "bold",
+                    "size": "md",
+                    "wrap": True,
+                    "maxLines": 2
+                },
+                {
+                    "type": "box",
+                    "layout": "vertical",
+                    "margin": "lg",
+                    "contents": [
+                        {
+                            "type": "box",
+                            "layout": "baseline",
+                            "contents": [
+                                {
+                                    "type": "text",
+                                    "text": "定価",
+                                    "color": "#999999",
+                                    "size": "sm",
+                                    "flex": 1
+                                },
+                                {
+                                    "type": "text",
+                                    "text": f"¥{item['list_price']:,}",
+                                    "color": "#999999",
+                                    "size": "sm",
+                                    "decoration": "line-through",
+                                    "flex": 2
+                                }
+                            ]
+                        },
+                        {
+                            "type": "box",
+                            "layout": "baseline",
+                            "contents": [
+                                {
+                                    "type": "text",
+                                    "text": "現在価格",
+                                    "color": "#333333",
+                                    "size": "sm",
+                                    "flex": 1
+                                },
+                                {
+                                    "type": "text",
+                                    "text": f"¥{item['current_price']:,}",
+                                    "color": "#333333",
+                                    "size": "sm",
+                                    "flex": 2
+                                }
+                            ]
+                        },
+                        {
+                            "type": "box",
+                            "layout": "baseline",
+                            "contents": [
+                                {
+                                    "type": "text",
+                                    "text": "ポイント",
+                                    "color": "#333333",
+                                    "size": "sm",
+                                    "flex": 1
+                                },
+                                {
+                                    "type": "text",
+                                    "text": f"{item['point_value']}pt",
+                                    "color": "#333333",
+                                    "size": "sm",
+                                    "flex": 2
+                                }
+                            ]
+                        },
+                        {
+                            "type": "box",
+                            "layout": "baseline",
+                            "contents": [
+                                {
+                                    "type": "text",
+                                    "text": "実質価格",
+                                    "color": "#DD3333",
+                                    "size": "sm",
+                                    "weight": "bold",
+                                    "flex": 1
+                                },
+                                {
+                                    "type": "text",
+                                    "text": f"¥{item['effective_price']:,}",
+                                    "color": "#DD3333",
+                                    "size": "sm",
+                                    "weight": "bold",
+                                    "flex": 2
+                                }
+                            ]
+                        }
+                    ]
+                }
+            ]
+        },
+        "footer": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "button",
+                    "style": "primary",
+                    "action": {
+                        "type": "uri",
+                        "label": "商品を見る",
+                        "uri": item['item']
+                    }
+                }
+            ]
+        }
+    }
+
+
+def legacy_build(sale_items):
+    """従来の方法: バブルの辞書を作成し、サイズを測るためにJSONに変換する"""
+    bubbles = [legacy_create_flex_bubble(item) for item in sale_items]
+    sizes = [len(json.dumps(bubble)) for bubble in bubbles]
+    return bubbles, sizes
+
+def template_build(sale_items):
+    """テンプレートの方法: スロットを埋めたJSON文字列を作成する（長さがそのままサイズ）"""
+    bubble_jsons = [kindle_scraper.render_flex_bubble(item) for item in sale_items]
+    sizes = [len(bubble_json) if bubble_json is not None else None for bubble_json in bubble_jsons]
+    return bubble_jsons, sizes
+
+def generate_sale_items(count, seed):
+    """タイトルの長さ・価格の桁数が異なるセール情報を生成する"""
+    rng = random.Random(seed)
+    items = []
+    for index in range(count):
+        price = rng.randint(99, 3000)
+        points = rng.randint(0, price // 2)
+        title = f"サンプル書籍 {index} " + 'あいうえおかきくけこ' * rng.choice([0, 1, 3, 8, 40])
+        items.append({
+            'id': f"item-{index:05d}",
+            'title': title,
+            'current_price': price,
+            'list_price': price,
+            'point_value': points,
+            'effective_price': price - points,
+            'discount_percentage': points / price * 100,
+            'item': f"https://www.amazon.co.jp/dp/B{index:09d}"
+        })
+    return items
+
+def measure(build, sale_items, repeat):
+    """最良の処理時間（秒）と結果を返す"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = build(sale_items)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description='Flex Messageのバブル作成のベンチマーク')
+    parser.add_argument('--items', type=int, default=1000, help='作成するバブル数')
+    parser.add_argument('--seed', type=int, default=0, help='セール情報生成の乱数シード')
+    parser.add_argument('--repeat', type=int, default=5, help='計測の繰り返し回数（最良値を採用）')
+    args = parser.parse_args()
+
+    sale_items = generate_sale_items(args.items, args.seed)
+    legacy_elapsed, (bubbles, legacy_sizes) = measure(legacy_build, sale_items, args.repeat)
+    template_elapsed, (bubble_jsons, sizes) = measure(template_build, sale_items, args.repeat)
+
+    mismatches = [
+        item['id'] for item, bubble, bubble_json in zip(sale_items, bubbles, bubble_jsons)
+        if len(item['title']) <= kindle_scraper.FLEX_TITLE_MAX_CHARS and json.loads(bubble_json) != bubble
+    ]
+    shortened = sum(1 for item in sale_items if len(item['title']) > kindle_scraper.FLEX_TITLE_MAX_CHARS)
+    over_budget = sum(1 for size in legacy_sizes if size > kindle_scraper.FLEX_BUBBLE_MAX_BYTES)
+
+    print(f"バブル数: {len(sale_items)}, 繰り返し: {args.repeat}, 上限: {kindle_scraper.FLEX_BUBBLE_MAX_BYTES}バイト")
+    print(f"{'build':<10} {'total ms':>10} {'us/bubble':>10} {'max bytes':>10}")
+    for name, elapsed, build_sizes in (('legacy', legacy_elapsed, legacy_sizes), ('template', template_elapsed, sizes)):
+        max_size = max(size for size in build_sizes if size is not None)
+        print(f"{name:<10} {elapsed * 1000:>10.2f} {elapsed * 1e6 / len(sale_items):>10.2f} {max_size:>10}")
+    print(f"\nタイトルを切り詰めたバブル: {shortened}件（従来の方法で上限を超えるバブル: {over_budget}件）")
+
+    if mismatches:
+        print(f"内容が一致しないバブル {len(mismatches)}件: {', '.join(mismatches[:5])}")
+        return 1
+    print("タイトルを切り詰めていないバブルの内容はすべて一致しました")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
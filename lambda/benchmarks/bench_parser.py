@@ -0,0 +1,106 @@
+"""
+HTMLパーサーバックエンドのベンチマーク
+
+保存済みのAmazon商品ページ（*.html）に対して各バックエンド・切り出し有無の組み合わせで
+parse_kindle_page を実行し、html.parser（切り出しなし）と同じ結果になるかを確認しつつ
+処理時間を計測する。結果が一致した中で最速の組み合わせを HTML_PARSER_BACKEND /
+HTML_PRESLICE に設定する。
+
+使い方:
+    # 商品ページを保存する（URLを1行ずつ記載したファイルを指定）
+    python lambda/benchmarks/bench_parser.py pages/ --fetch urls.txt
+    # ベンチマークを実行する
+    python lambda/benchmarks/bench_parser.py pages/ --repeat 5
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import kindle_scraper  # noqa: E402
+
+BASELINE = ('html.parser', False)
+
+def fetch_pages(directory, url_file):
+    """URL一覧のページを取得してdirectoryに保存する"""
+    os.makedirs(directory, exist_ok=True)
+    with open(url_file, encoding='utf-8') as f:
+        urls = [line.strip() for line in f if line.strip()]
+
+    session = kindle_scraper.get_http_session()
+    for index, url in enumerate(urls):
+        kindle_scraper.get_rate_limiter(url).acquire()
+        response = session.get(
+            url,
+            headers=kindle_scraper.HEADERS,
+            timeout=(kindle_scraper.HTTP_CONNECT_TIMEOUT, kindle_scraper.HTTP_READ_TIMEOUT)
+        )
+        response.raise_for_status()
+        path = os.path.join(directory, f"page_{index:04d}.html")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        print(f"保存しました: {path} ({url})")
+
+def load_pages(directory):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            pages.append((os.path.basename(path), f.read()))
+    return pages
+
+def run_config(pages, backend, preslice, repeat):
+    """1つの組み合わせで全ページを処理し、(最良の合計秒数, 結果一覧)を返す"""
+    best = None
+    results = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results = [kindle_scraper.parse_kindle_page(html, backend=backend, preslice=preslice) for _, html in pages]
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+def main():
+    parser = argparse.ArgumentParser(description='HTMLパーサーバックエンドのベンチマーク')
+    parser.add_argument('directory', help='保存済み商品ページ（*.html）のディレクトリ')
+    parser.add_argument('--repeat', type=int, default=3, help='計測の繰り返し回数（最良値を採用）')
+    parser.add_argument('--fetch', metavar='URL_FILE', help='URL一覧のページを取得して保存する')
+    args = parser.parse_args()
+
+    if args.fetch:
+        fetch_pages(args.directory, args.fetch)
+
+    pages = load_pages(args.directory)
+    if not pages:
+        print(f"{args.directory} に *.html がありません")
+        return 1
+
+    _, expected = run_config(pages, *BASELINE, repeat=1)
+
+    print(f"ページ数: {len(pages)}, 繰り返し: {args.repeat}")
+    print(f"{'backend':<12} {'preslice':<9} {'total ms':>10} {'ms/page':>9}  result")
+
+    fastest = None
+    for backend in kindle_scraper.PARSER_BACKENDS:
+        if kindle_scraper.resolve_parser_backend(backend) != backend:
+            print(f"{backend:<12} {'-':<9} {'-':>10} {'-':>9}  利用不可")
+            continue
+
+        for preslice in (False, True):
+            elapsed, results = run_config(pages, backend, preslice, args.repeat)
+            mismatches = [name for (name, _), got, want in zip(pages, results, expected) if got != want]
+            status = 'OK' if not mismatches else f"不一致 {len(mismatches)}件: {', '.join(mismatches[:3])}"
+            print(f"{backend:<12} {str(preslice):<9} {elapsed * 1000:>10.1f} {elapsed * 1000 / len(pages):>9.2f}  {status}")
+
+            if not mismatches and (fastest is None or elapsed < fastest[0]):
+                fastest = (elapsed, backend, preslice)
+
+    if fastest:
+        _, backend, preslice = fastest
+        print(f"\n最速（結果一致）: HTML_PARSER_BACKEND={backend} HTML_PRESLICE={str(preslice).lower()}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+Kindle Items APIのルーティング・ログ出力のベンチマーク
+
+API Gatewayと同じ形式のイベント（JWTクレーム付き）で kindle_items.lambda_handler を呼び出し、
+従来の処理（イベント全体のログ出力、normalize_pathでの2回のログ出力、if文の連鎖による振り分け）
+と比較して、1回の呼び出しあたりのオーバーヘッドを計測する。
+DynamoDBはメモリ上の疑似テーブルに置き換え、各ルートの処理自体は両者で同じ関数を使う。
+
+使い方:
+    python lambda/benchmarks/bench_router.py --iterations 20000
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import kindle_items  # noqa: E402
+
+logger = kindle_items.logger
+
+class FakeTable:
+    """kindle_itemsが使うDynamoDBテーブルの操作をメモリ上で返す疑似テーブル"""
+    name = 'KindleItems'
+
+    def __init__(self, item_count):
+        self.items = [
+            {
+                'id': f"item-{index:04d}",
+                'url': f"https://www.amazon.co.jp/dp/B{index:09d}",
+                'description': f"サンプル書籍 {index}",
+                'current_price': 500 + index,
+                'points': index % 50,
+                'has_sale': index % 7 == 0,
+                'updated_at': '2024-01-01T00:00:00'
+            }
+            for index in range(item_count)
+        ]
+
+    def get_item(self, Key):
+        if Key['id'] == kindle_items.REVISION_ID:
+            return {'Item': {'id': Key['id'], 'revision': 1}}
+        return {'Item': self.items[0]} if Key['id'] == self.items[0]['id'] else {}
+
+    def scan(self, **kwargs):
+        return {'Items': list(self.items)}
+
+    def query(self, **kwargs):
+        return {'Items': self.items[:kwargs.get('Limit', 20)]}
+
+    def put_item(self, Item):
+        return {}
+
+    def update_item(self, **kwargs):
+        return {}
+
+    def delete_item(self, Key, ReturnValues=None):
+        return {}
+
+def make_event(method, path, body=None, query=None):
+    """HTTP API（ペイロード形式2.0）のイベントを作成する"""
+    return {
+        'version': '2.0',
+        'routeKey': f"{method} {path}",
+        'rawPath': path,
+        'rawQueryString': '',
+        'headers': {
+            'accept': 'application/json',
+            'accept-encoding': 'gzip, deflate, br',
+            'authorization': 'Bearer ' + 'x' * 900,
+            'content-type': 'application/json',
+            'host': 'example.execute-api.ap-northeast-1.amazonaws.com',
+            'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        },
+        'queryStringParameters': query,
+        'requestContext': {
+            'accountId': '123456789012',
+            'apiId': 'example',
+            'authorizer': {
+                'jwt': {
+                    'claims': {
+                        'sub': '00000000-0000-0000-0000-000000000000',
+                        'email': 'user@example.com',
+                        'cognito:username': 'user',
+                        'token_use': 'id',
+                        'iss': 'https://cognito-idp.ap-northeast-1.amazonaws.com/ap-northeast-1_example'
+                    },
+                    'scopes': None
+                }
+            },
+            'http': {'method': method, 'path': path, 'protocol': 'HTTP/1.1', 'sourceIp': '192.0.2.1'},
+            'requestId': 'example-request-id',
+            'stage': '$default'
+        },
+        'body': json.dumps(body) if body is not None else None,
+        'isBase64Encoded': False
+    }
+
+EVENTS = [
+    ('GET /api/status', make_event('GET', '/api/status')),
+    ('GET /api/items/{id}', make_event('GET', '/api/items/item-0000')),
+    ('GET /api/items?limit', make_event('GET', '/api/items', query={'limit': '20'})),
+    ('POST /api/items', make_event('POST', '/api/items', body={'url': 'https://www.amazon.co.jp/dp/B000000001'})),
+    ('GET /api/unknown', make_event('GET', '/api/unknown/path')),
+]
+
+def legacy_normalize_path(path):
+    """従来のnormalize_path（ログ出力2回を含む）"""
+    logger.info(f"オリジナルパス: {path}")
+    if path and path.startswith('/api'):
+        path = path[len('/api'):]
+    path = path.strip('/')
+    if '/' in path:
+        parts = path.split('/', 1)
+        if len(parts) > 1 and parts[0] not in ['items']:
+            path = parts[1]
+    logger.info(f"正規化後パス: {path}")
+    return path
+
+def legacy_handler(event, context):
+    """従来のlambda_handler（イベント全体のログ出力とif文の連鎖による振り分け）"""
+    logger.info(f"Kindle Items API - イベント: {json.dumps(event)}")
+    http_method = kindle_items.get_http_method(event)
+    path = kindle_items.get_path(event)
+    logger.info(f"Kindle Items API - HTTPメソッド: {http_method}, パス: {path}")
+
+    if http_method == 'OPTIONS':
+        return kindle_items.create_response(200, {})
+
+    normalized_path = legacy_normalize_path(path)
+    if normalized_path == '':
+        if http_method == 'GET':
+            return kindle_items.handle_root(event)
+    elif normalized_path == 'status':
+        if http_method == 'GET':
+            return kindle_items.handle_get_status(event)
+    elif normalized_path == 'items':
+        if http_method == 'GET':
+            return kindle_items.handle_list_items(event)
+        elif http_method == 'POST':
+            logger.info(f"リクエストボディ: {event.get('body')}")
+            return kindle_items.handle_create_item(event)
+    elif normalized_path == 'items/batch' and http_method == 'POST':
+        return kindle_items.handle_create_items_batch(event)
+    elif normalized_path == 'items/batch-delete' and http_method == 'POST':
+        return kindle_items.handle_delete_items_batch(event)
+    elif normalized_path.startswith('items/'):
+        item_id = normalized_path.split('/', 1)[1]
+        if http_method == 'GET':
+            return kindle_items.handle_get_item(event, item_id)
+        elif http_method == 'DELETE':
+            return kindle_items.handle_delete_item(event, item_id)
+
+    logger.warning(f"一致するルートが見つかりません: method={http_method}, path={normalized_path}")
+    return kindle_items.create_response(404, {'detail': 'Not Found'})
+
+def measure(handler_function, event, iterations):
+    """1回の呼び出しあたりの平均時間（マイクロ秒）を返す"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        handler_function(event, None)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description='Kindle Items APIのルーティング・ログ出力のベンチマーク')
+    parser.add_argument('--iterations', type=int, default=20000, help='ルートごとの呼び出し回数')
+    parser.add_argument('--items', type=int, default=20, help='疑似テーブルのアイテム数')
+    args = parser.parse_args()
+
+    # Lambdaと同様にログを出力させる（出力先はメモリ上、書式化のコストも含めて計測する）
+    log_stream = io.StringIO()
+    log_handler = logging.StreamHandler(log_stream)
+    log_handler.setFormatter(logging.Formatter('[%(levelname)s] %(asctime)s %(message)s'))
+    logger.addHandler(log_handler)
+    logger.propagate = False
+
+    kindle_items._table = FakeTable(args.items)
+    kindle_items._cold_start = False
+
+    print(f"呼び出し回数: {args.iterations}, LOG_SAMPLE_RATE: {kindle_items.LOG_SAMPLE_RATE}")
+    print(f"{'route':<24} {'legacy us':>10} {'router us':>10} {'saved us':>9}")
+    for name, event in EVENTS:
+        legacy = measure(legacy_handler, event, args.iterations)
+        routed = measure(kindle_items.lambda_handler, event, args.iterations)
+        print(f"{name:<24} {legacy:>10.1f} {routed:>10.1f} {legacy - routed:>9.1f}")
+        log_stream.seek(0)
+        log_stream.truncate()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
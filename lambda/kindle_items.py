@@ -1,98 +1,747 @@
+import time
+
+# コールドスタート時のモジュール読み込み時間の計測開始
+_MODULE_LOAD_STARTED = time.perf_counter()
+
 import json
-import boto3
+import base64
+import binascii
+import functools
+import gzip
+import hashlib
+from datetime import datetime
+from decimal import Decimal
 import os
+import random
+import re
+import unicodedata
 import uuid
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+# 任意: 高速なJSONエンコーダー（未インストールの場合は標準のjsonを使う）
+try:
+  import orjson
+except ImportError:
+  orjson = None
 
 # ロギング設定
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# DynamoDBクライアント（環境変数から取得）
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ.get('DYNAMODB_TABLE', 'KindleItems'))
+# 初期化時間の内訳（ミリ秒、コールドスタート時の最初の呼び出しでログ出力する）
+_init_timings = {}
+_cold_start = True
+
+# DynamoDBテーブル（最初に必要になった時点で作成し、ウォームスタート時は再利用する）
+_table = None
+
+def get_table():
+  global _table
+  if _table is None:
+    started = time.perf_counter()
+    import boto3
+    _init_timings['import_boto3'] = round((time.perf_counter() - started) * 1000, 1)
+
+    started = time.perf_counter()
+    _table = boto3.resource('dynamodb').Table(os.environ.get('DYNAMODB_TABLE', 'KindleItems'))
+    _init_timings['create_table_resource'] = round((time.perf_counter() - started) * 1000, 1)
+  return _table
+
+# コールドスタートの最初の呼び出しで初期化時間の内訳をログ出力するデコレーター
+def report_init_timings(handler_function):
+  @functools.wraps(handler_function)
+  def wrapper(event, context):
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    started = time.perf_counter()
+    try:
+      return handler_function(event, context)
+    finally:
+      if cold_start:
+        timings = dict(_init_timings, first_invocation=round((time.perf_counter() - started) * 1000, 1))
+        logger.info(f"コールドスタート初期化時間(ms): {json.dumps(timings)}")
+  return wrapper
+
+# 管理用レコード（IDが__で始まる）は一覧に含めない
+# 更新ロックはスクレイパーの実行状態レコードを兼ねる（GET /statusで返す）
+SYSTEM_RECORD_PREFIX = '__'
+UPDATE_LOCK_ID = '__UPDATE_LOCK__'
+
+# 一覧の並び順用のGSI（パーティションキー list_pk、ソートキー sort_key）
+LIST_INDEX_NAME = os.environ.get('LIST_INDEX_NAME', 'ListOrderIndex')
+LIST_PARTITION_VALUE = 'ITEM'
+SORT_KEY_MAX_RATIO_BP = 999999
+
+# セール中のアイテムだけを持つスパースGSI（パーティションキー sale_pk、ソートキー 割引率 sale_discount）
+SALE_INDEX_NAME = os.environ.get('SALE_INDEX_NAME', 'SaleIndex')
+SALE_PARTITION_VALUE = 'SALE'
+
+# タイトル検索用のトークンレコード（IDは __SEARCH__#<トークン>、ids にアイテムIDの集合を持つ）
+# アイテムの search_title には索引済みのタイトルを保存する（タイトルが変わるとスクレイパーが索引を更新する）
+SEARCH_TOKEN_PREFIX = '__SEARCH__#'
+# 検索で照合する候補の上限と、返す件数の既定値
+SEARCH_MAX_CANDIDATES = int(os.environ.get('SEARCH_MAX_CANDIDATES', '500'))
+SEARCH_DEFAULT_LIMIT = 20
+# 検索用トークンレコードを並列に更新する数（一括登録・一括削除ではトークンが数千件になる）
+SEARCH_TOKEN_CONCURRENCY = int(os.environ.get('SEARCH_TOKEN_CONCURRENCY', '16'))
+
+# ページ単位取得時の件数上限
+MAX_PAGE_LIMIT = 100
+
+# 一括登録・一括削除の設定（1リクエストの上限件数、BatchWriteItemの再試行）
+BATCH_MAX_ENTRIES = int(os.environ.get('BATCH_MAX_ENTRIES', '500'))
+BATCH_WRITE_CHUNK_SIZE = 25
+BATCH_GET_CHUNK_SIZE = 100
+BATCH_MAX_RETRIES = 5
+BATCH_RETRY_BASE_SECONDS = 0.05
+
+# リクエストログを出力する割合（0〜1、5xxのレスポンスは常に出力する）
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '0.1'))
+
+# 一覧のリビジョン（アイテムの作成・削除・スクレイパーの書き込みで加算し、ETagに使う）
+REVISION_ID = '__REVISION__'
+# 画面ヘッダー用の集計レコード（スクレイパーが実行終了時に書き込み、作成・削除時は件数を増減する）
+CATALOG_SUMMARY_ID = '__CATALOG_SUMMARY__'
+
+# 価格履歴（スクレイパーが変化点を追記するバイナリ属性、形式はkindle_scraper.pyのencode_price_historyを参照）
+# 一覧・詳細のレスポンスには含めず、GET /items/{id}/history でのみ返す
+PRICE_HISTORY_ATTRIBUTE = 'price_history'
+PRICE_HISTORY_VERSION = 1
+# 履歴と合わせて返す集計の期間（日）
+PRICE_HISTORY_WINDOWS = (30, 90, 365)
+
+# この大きさ（バイト）以上のレスポンスはクライアントが対応していればgzip圧縮する
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
 
 # CORSヘッダー
 CORS_HEADERS = {
   'Access-Control-Allow-Origin': '*',
-  'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-  'Access-Control-Allow-Methods': 'GET,POST,DELETE,OPTIONS'
+  'Access-Control-Allow-Headers': 'Content-Type,Authorization,If-None-Match',
+  'Access-Control-Allow-Methods': 'GET,POST,DELETE,OPTIONS',
+  'Access-Control-Expose-Headers': 'ETag'
 }
 
+# JSONエンコード時の変換（DynamoDBのDecimalは整数ならint、それ以外はfloatにする）
+def json_default(value):
+  if isinstance(value, Decimal):
+    return int(value) if value == value.to_integral_value() else float(value)
+  if isinstance(value, set):
+    return sorted(value)
+  raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+# DynamoDBの値を変換しながらUTF-8のJSONにエンコード（orjsonがあれば使う）
+def encode_json(body):
+  if orjson is not None:
+    return orjson.dumps(body, default=json_default)
+  return json.dumps(body, ensure_ascii=False, separators=(',', ':'), default=json_default).encode('utf-8')
+
 # レスポンス作成ヘルパー
-def create_response(status_code, body):
+# accept_encodingにgzipが含まれ、本文がCOMPRESSION_MIN_BYTES以上の場合は圧縮して返す
+def create_response(status_code, body, headers=None, accept_encoding=None):
+  response_headers = dict(CORS_HEADERS, **(headers or {}))
+  body_bytes = encode_json(body)
+
+  if accepts_gzip(accept_encoding):
+    if len(body_bytes) >= COMPRESSION_MIN_BYTES:
+      response_headers['Content-Encoding'] = 'gzip'
+      response_headers['Vary'] = 'Accept-Encoding'
+      return {
+        'statusCode': status_code,
+        'headers': response_headers,
+        'body': base64.b64encode(gzip.compress(body_bytes, compresslevel=6)).decode('ascii'),
+        'isBase64Encoded': True
+      }
+
   return {
     'statusCode': status_code,
-    'headers': CORS_HEADERS,
-    'body': json.dumps(body, ensure_ascii=False)
+    'headers': response_headers,
+    'body': body_bytes.decode('utf-8')
+  }
+
+# 変更がない場合のレスポンス（本文なし）
+def create_not_modified_response(etag):
+  return {
+    'statusCode': 304,
+    'headers': dict(CORS_HEADERS, ETag=etag),
+    'body': ''
+  }
+
+# Accept-Encodingでgzipが許可されているか判定（q=0は不許可）
+def accepts_gzip(accept_encoding):
+  if not accept_encoding:
+    return False
+  for entry in accept_encoding.lower().split(','):
+    coding, _, params = entry.strip().partition(';')
+    if coding.strip() in ('gzip', '*'):
+      return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+  return False
+
+# リクエストヘッダーを取得（API Gateway V1/V2で大文字小文字が異なるため区別しない）
+def get_header(event, name):
+  for key, value in (event.get('headers') or {}).items():
+    if key.lower() == name.lower():
+      return value
+  return None
+
+# 一覧のリビジョンを取得
+def get_revision():
+  record = get_table().get_item(Key={'id': REVISION_ID}).get('Item') or {}
+  return int(record.get('revision', 0))
+
+# 一覧のリビジョンを加算（失敗しても本処理は継続する）
+def bump_revision():
+  try:
+    get_table().update_item(
+      Key={'id': REVISION_ID},
+      UpdateExpression='ADD revision :one',
+      ExpressionAttributeValues={':one': 1}
+    )
+  except Exception as e:
+    logger.error(f"リビジョンの更新に失敗: {str(e)}")
+
+# レスポンスに含めない属性（価格履歴）をアイテムから取り除く
+def omit_price_history(item):
+  item.pop(PRICE_HISTORY_ATTRIBUTE, None)
+  return item
+
+# 集計レコードの件数を増減（失敗しても本処理は継続し、次回のスクレイパー実行で正しい件数に戻る）
+def adjust_catalog_summary(total_delta, sale_delta=0):
+  if not total_delta and not sale_delta:
+    return
+  try:
+    get_table().update_item(
+      Key={'id': CATALOG_SUMMARY_ID},
+      UpdateExpression='ADD total_items :total, sale_items :sales SET updated_at = :now',
+      ExpressionAttributeValues={
+        ':total': total_delta,
+        ':sales': sale_delta,
+        ':now': datetime.utcnow().isoformat() + 'Z'
+      }
+    )
+  except Exception as e:
+    logger.error(f"集計レコードの更新に失敗: {str(e)}")
+
+# 集計レコードを取得（まだない場合は件数0として返す）
+def get_catalog_summary():
+  record = get_table().get_item(Key={'id': CATALOG_SUMMARY_ID}).get('Item') or {}
+  return {
+    'total_items': record.get('total_items', 0),
+    'sale_items': record.get('sale_items', 0),
+    'last_run': {
+      'started_at': record.get('last_run_started_at'),
+      'finished_at': record.get('last_run_finished_at'),
+      'duration_seconds': record.get('last_run_duration_seconds'),
+      'failed_count': record.get('last_run_failed_count'),
+      'failed_shards_count': record.get('last_run_failed_shards')
+    },
+    'updated_at': record.get('updated_at')
   }
 
+# リビジョンとクエリパラメーターからETagを作成（ページごとに異なる値になる）
+def build_etag(revision, params):
+  digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:8]
+  return f'"{revision}-{digest}"'
+
+# If-None-MatchがETagと一致するか判定
+def etag_matches(if_none_match, etag):
+  if not if_none_match:
+    return False
+  tags = [tag.strip() for tag in if_none_match.split(',')]
+  return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+# 一覧の並び順キーを作成（kindle_scraper.pyのbuild_sort_keyと同じ形式）
+# セール中 → ポイント還元率（ベーシスポイント） → 更新日時 の順に降順で並ぶ
+def build_sort_key(item, updated_at=None):
+  ratio_bp = 0
+  if item.get('current_price') and item.get('points'):
+    ratio_bp = min(SORT_KEY_MAX_RATIO_BP, int(float(item['points']) / float(item['current_price']) * 10000))
+  return f"{1 if item.get('has_sale') else 0}#{ratio_bp:06d}#{updated_at or ''}"
+
+# 続きの取得位置（LastEvaluatedKey）を不透明なカーソル文字列に変換
+def encode_cursor(last_evaluated_key):
+  if not last_evaluated_key:
+    return None
+  return base64.urlsafe_b64encode(encode_json(last_evaluated_key)).decode('ascii').rstrip('=')
+
+# カーソル文字列をExclusiveStartKeyに戻す（key_namesはインデックスのキー属性、不正な場合はValueError）
+def decode_cursor(cursor, key_names):
+  try:
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+    # 数値のキー（割引率など）はDynamoDBに渡すためDecimalで読み込む
+    key = json.loads(raw.decode('utf-8'), parse_float=Decimal, parse_int=Decimal)
+  except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+    raise ValueError(f'Invalid cursor: {str(e)}')
+  if not isinstance(key, dict) or set(key) != set(key_names):
+    raise ValueError('Invalid cursor')
+  return key
+
 # アイテム一覧を取得
 def get_all_items():
-  response = table.scan()
-  items = response.get('Items', [])
-  # 型変換
-  for item in items:
-    if 'current_price' in item and item['current_price'] is not None:
-      item['current_price'] = float(item['current_price'])
-    if 'points' in item and item['points'] is not None:
-      item['points'] = int(item['points'])
-    if 'has_sale' in item and item['has_sale'] is not None:
-      item['has_sale'] = bool(item['has_sale'])
+  items = []
+  scan_kwargs = {}
+  # ページネーションを処理して全件を取得
+  while True:
+    response = get_table().scan(**scan_kwargs)
+    # 更新ロックやワーカーのリースなどの管理用レコードは除外
+    items.extend(
+      omit_price_history(item) for item in response.get('Items', [])
+      if not item['id'].startswith(SYSTEM_RECORD_PREFIX)
+    )
+    if 'LastEvaluatedKey' not in response:
+      break
+    scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+  # ページ単位の取得と同じ順序に並べる（並び順キーがまだないアイテムもその場で計算する）
+  # Decimalはレスポンスのエンコード時にまとめて変換する
+  items.sort(
+    key=lambda item: item.get('sort_key') or build_sort_key(item, item.get('updated_at')),
+    reverse=True
+  )
   return items
 
+# GSIをソートキーの降順で取得（limitを指定しない場合は全ページを取得する）
+# 戻り値: (アイテム一覧, 続きのカーソル)
+def query_index_descending(index_name, partition_key, partition_value, sort_key, limit=None, cursor=None):
+  query_kwargs = {
+    'IndexName': index_name,
+    'KeyConditionExpression': f'{partition_key} = :pk',
+    'ExpressionAttributeValues': {':pk': partition_value},
+    'ScanIndexForward': False
+  }
+  if limit:
+    query_kwargs['Limit'] = limit
+  if cursor:
+    query_kwargs['ExclusiveStartKey'] = decode_cursor(cursor, ('id', partition_key, sort_key))
+
+  items = []
+  while True:
+    response = get_table().query(**query_kwargs)
+    items.extend(omit_price_history(item) for item in response.get('Items', []))
+    last_evaluated_key = response.get('LastEvaluatedKey')
+    if limit or not last_evaluated_key:
+      return items, encode_cursor(last_evaluated_key)
+    query_kwargs['ExclusiveStartKey'] = last_evaluated_key
+
+# アイテム一覧を並び順キーの降順でページ単位に取得
+def get_items_page(limit, cursor=None):
+  return query_index_descending(LIST_INDEX_NAME, 'list_pk', LIST_PARTITION_VALUE, 'sort_key', limit, cursor)
+
+# セール中のアイテムを割引率の高い順に取得（limitを指定しない場合は全件）
+def get_sale_items(limit=None, cursor=None):
+  return query_index_descending(SALE_INDEX_NAME, 'sale_pk', SALE_PARTITION_VALUE, 'sale_discount', limit, cursor)
+
 # 単一アイテムを取得
 def get_item(item_id):
-  response = table.get_item(Key={'id': item_id})
+  response = get_table().get_item(Key={'id': item_id})
   item = response.get('Item')
-  # 型変換
-  if item:
-    if 'current_price' in item and item['current_price'] is not None:
-      item['current_price'] = float(item['current_price'])
-    if 'points' in item and item['points'] is not None:
-      item['points'] = int(item['points'])
-    if 'has_sale' in item and item['has_sale'] is not None:
-      item['has_sale'] = bool(item['has_sale'])
-  return item
+  return omit_price_history(item) if item else None
 
-# アイテムを作成
-def create_item(url, description=None):
-  item_id = str(uuid.uuid4())
+# 可変長整数（zigzag符号化）を1つ読み、(値, 次の位置)を返す
+def _decode_varint(data, position):
+  value = 0
+  shift = 0
+  while True:
+    byte = data[position]
+    position += 1
+    value |= (byte & 0x7F) << shift
+    if byte < 0x80:
+      return (value >> 1) ^ -(value & 1), position
+    shift += 7
+
+# バイナリの価格履歴を [(時刻(UNIX秒), 価格, ポイント), ...] に復号（kindle_scraper.pyのdecode_price_historyと同じ処理）
+# 履歴がない場合や未対応のバージョンの場合は空のリストを返す
+def decode_price_history(data):
+  # DynamoDBから読んだ値はBinary型のため、中身のbytesを取り出す
+  data = bytes(getattr(data, 'value', data) or b'')
+  if not data or data[0] != PRICE_HISTORY_VERSION:
+    return []
+
+  entries = []
+  minutes = price = points = 0
+  position = 1
+  while position < len(data):
+    delta, position = _decode_varint(data, position)
+    minutes += delta
+    delta, position = _decode_varint(data, position)
+    price += delta
+    delta, position = _decode_varint(data, position)
+    points += delta
+    entries.append((minutes * 60, price, points))
+  return entries
+
+# 直近days日間の実質価格（価格 - ポイント）の最安値・最高値・中央値を求める（kindle_scraper.pyのsummarize_price_historyと同じ処理）
+# 各変化点の値は次の変化点まで続いたものとし、中央値は継続時間で重み付けする。期間内の値がない場合はNone
+def summarize_price_history(entries, days, now=None):
+  now = now if now is not None else time.time()
+  window_start = now - days * 86400
+  values = []
+  for index, (observed_at, price, points) in enumerate(entries):
+    ended_at = entries[index + 1][0] if index + 1 < len(entries) else now
+    if ended_at < window_start:
+      continue
+    values.append((price - points, max(1, ended_at - max(observed_at, window_start))))
+  if not values:
+    return None
+
+  values.sort()
+  half = sum(weight for _, weight in values) / 2
+  accumulated = 0
+  for value, weight in values:
+    accumulated += weight
+    if accumulated >= half:
+      median = value
+      break
+  return {'min': values[0][0], 'max': values[-1][0], 'median': median, 'change_points': len(values)}
+
+# 1件のアイテムの価格履歴と期間ごとの集計を取得（アイテムが存在しない場合はNone）
+def get_price_history(item_id):
+  response = get_table().get_item(
+    Key={'id': item_id},
+    ProjectionExpression='#id, #desc, #hist',
+    ExpressionAttributeNames={'#id': 'id', '#desc': 'description', '#hist': PRICE_HISTORY_ATTRIBUTE}
+  )
+  record = response.get('Item')
+  if not record:
+    return None
+
+  entries = decode_price_history(record.get(PRICE_HISTORY_ATTRIBUTE))
+  now = time.time()
+  return {
+    'id': record['id'],
+    'description': record.get('description'),
+    'history': [
+      {
+        'observed_at': datetime.utcfromtimestamp(observed_at).isoformat() + 'Z',
+        'price': price,
+        'points': points,
+        'effective_price': price - points
+      }
+      for observed_at, price, points in entries
+    ],
+    'stats': {f"{days}d": summarize_price_history(entries, days, now) for days in PRICE_HISTORY_WINDOWS}
+  }
+
+# スクレイパーの実行状態を取得（更新ロックのレコードを1件読むだけ）
+def get_update_status():
+  record = get_table().get_item(Key={'id': UPDATE_LOCK_ID}).get('Item') or {}
+  status = record.get('status', 'idle')
+  return {
+    'status': status,
+    'is_updating': status == 'running',
+    'started_at': record.get('started_at'),
+    'finished_at': record.get('finished_at'),
+    'progress': {
+      'processed': record.get('progress_processed'),
+      'total': record.get('progress_total'),
+      'updated_at': record.get('progress_updated_at')
+    },
+    'last_completed_at': record.get('last_completed_at'),
+    'last_run': {
+      # 中断・再開した実行では最初の呼び出しの開始時刻（started_at は現在の呼び出しの開始時刻）
+      'started_at': record.get('last_started_at'),
+      'sale_items_count': record.get('last_sale_items_count'),
+      'processed_count': record.get('last_processed_count'),
+      'written_count': record.get('last_written_count'),
+      'failed_count': record.get('last_failed_count')
+    }
+  }
+
+# 検索用にタイトルを正規化（NFKC・小文字化し、記号と空白を区切りにする）
+def normalize_search_text(text):
+  text = unicodedata.normalize('NFKC', text or '').lower()
+  return re.sub(r'[\W_]+', ' ', text).strip()
+
+# タイトルを検索用のトークン（文字bigram）に分割（kindle_scraper.pyのtokenize_titleと同じ処理）
+# 分かち書きのない日本語にも対応するため、区切りごとの連続する2文字をトークンとする
+def tokenize_title(text):
+  tokens = set()
+  for word in normalize_search_text(text).split():
+    tokens.update(word[i:i + 2] for i in range(len(word) - 1))
+  return tokens
+
+# 検索用トークンレコードのアイテムIDの集合を更新（additions / removals は {トークン: アイテムIDの集合}）
+# トークンごとの更新は最大SEARCH_TOKEN_CONCURRENCY件並列で行う
+# 全て成功した場合にTrueを返す
+def update_search_tokens(additions, removals):
+  table = get_table()
+  # テーブルリソースはスレッドセーフではないため、スレッド間ではクライアントを共有する
+  client = table.meta.client
+  updates = [
+    (action, token, item_ids)
+    for action, changes in (('ADD', additions), ('DELETE', removals))
+    for token, item_ids in changes.items()
+  ]
+
+  def update_token(update):
+    action, token, item_ids = update
+    try:
+      client.update_item(
+        TableName=table.name,
+        Key={'id': f"{SEARCH_TOKEN_PREFIX}{token}"},
+        UpdateExpression=f"{action} ids :ids",
+        ExpressionAttributeValues={':ids': set(item_ids)}
+      )
+      return True
+    except Exception as e:
+      logger.error(f"検索トークンの更新に失敗 ({token}): {str(e)}")
+      return False
+
+  with ThreadPoolExecutor(max_workers=max(1, min(SEARCH_TOKEN_CONCURRENCY, len(updates)))) as executor:
+    return all(list(executor.map(update_token, updates)))
+
+# アイテムのタイトル（search_title）の変更を検索用トークンに反映
+# removed_itemsは削除したアイテム、added_itemsは新しく作成したアイテム
+def reindex_items_for_search(added_items=(), removed_items=()):
+  additions = {}
+  removals = {}
+  for item in added_items:
+    for token in tokenize_title(item.get('search_title')):
+      additions.setdefault(token, set()).add(item['id'])
+  for item in removed_items:
+    for token in tokenize_title(item.get('search_title')):
+      removals.setdefault(token, set()).add(item['id'])
+  if not additions and not removals:
+    return True
+  return update_search_tokens(additions, removals)
+
+# 新規アイテムのレコードを作成
+def build_new_item(url, description=None):
   item = {
-    'id': item_id,
+    'id': str(uuid.uuid4()),
     'url': url,
     'description': description or '',
     'has_sale': False,
     'current_price': None,
     'points': None
   }
-  table.put_item(Item=item)
+  # 一覧の並び順用GSIに含める（価格取得後はスクレイパーが並び順キーを更新する）
+  item['list_pk'] = LIST_PARTITION_VALUE
+  item['sort_key'] = build_sort_key(item)
+  # 検索用トークンに登録するタイトル（登録に失敗した場合はNoneにし、スクレイパーが再登録する）
+  item['search_title'] = item['description']
+  return item
+
+# アイテムを作成
+def create_item(url, description=None):
+  item = build_new_item(url, description)
+  if not reindex_items_for_search(added_items=[item]):
+    item['search_title'] = None
+  get_table().put_item(Item=item)
+  bump_revision()
+  adjust_catalog_summary(1)
   return item
 
+# BatchWriteItemで書き込み（25件ずつ、未処理分は指数バックオフで再試行）
+# 戻り値: 最後まで処理できなかったリクエストのキー（id）の集合
+def batch_write(requests):
+  table = get_table()
+  client = table.meta.client
+  failed_ids = set()
+
+  for start in range(0, len(requests), BATCH_WRITE_CHUNK_SIZE):
+    pending = requests[start:start + BATCH_WRITE_CHUNK_SIZE]
+    for attempt in range(BATCH_MAX_RETRIES + 1):
+      try:
+        response = client.batch_write_item(RequestItems={table.name: pending})
+        pending = response.get('UnprocessedItems', {}).get(table.name, [])
+      except Exception as e:
+        logger.error(f"BatchWriteItemエラー（試行 {attempt + 1}回目）: {str(e)}")
+      if not pending:
+        break
+      if attempt < BATCH_MAX_RETRIES:
+        time.sleep(BATCH_RETRY_BASE_SECONDS * (2 ** attempt))
+
+    for request in pending:
+      if 'PutRequest' in request:
+        failed_ids.add(request['PutRequest']['Item']['id'])
+      else:
+        failed_ids.add(request['DeleteRequest']['Key']['id'])
+
+  return failed_ids
+
+# レコードをまとめて取得（BatchGetItemで100件ずつ、未処理分は再試行）
+# attributesを指定した場合はその属性のみを取得する
+# 戻り値: {id: レコード}（存在しないIDは含まれない）
+def batch_get_items(item_ids, attributes=None):
+  table = get_table()
+  client = table.meta.client
+  request = {}
+  if attributes:
+    request['ProjectionExpression'] = ', '.join(f"#a{i}" for i in range(len(attributes)))
+    request['ExpressionAttributeNames'] = {f"#a{i}": name for i, name in enumerate(attributes)}
+  records = {}
+
+  for start in range(0, len(item_ids), BATCH_GET_CHUNK_SIZE):
+    keys = [{'id': item_id} for item_id in item_ids[start:start + BATCH_GET_CHUNK_SIZE]]
+    for attempt in range(BATCH_MAX_RETRIES + 1):
+      response = client.batch_get_item(RequestItems={table.name: dict(request, Keys=keys)})
+      records.update((record['id'], record) for record in response.get('Responses', {}).get(table.name, []))
+      keys = response.get('UnprocessedKeys', {}).get(table.name, {}).get('Keys', [])
+      if not keys:
+        break
+      if attempt < BATCH_MAX_RETRIES:
+        time.sleep(BATCH_RETRY_BASE_SECONDS * (2 ** attempt))
+    else:
+      raise RuntimeError(f"BatchGetItemで{len(keys)}件を取得できませんでした")
+
+  return records
+
+# アイテムを一括作成（entriesはURL文字列または {'url', 'description'}）
+# 戻り値: 入力順のエントリーごとの結果
+def create_items_batch(entries):
+  results = []
+  items = []
+  seen_urls = set()
+
+  for index, entry in enumerate(entries):
+    if isinstance(entry, str):
+      entry = {'url': entry}
+    url = entry.get('url') if isinstance(entry, dict) else None
+    if not url or not isinstance(url, str):
+      results.append({'index': index, 'status': 'invalid', 'detail': 'URL is required'})
+      continue
+    description = entry.get('description', '')
+    if description is not None and not isinstance(description, str):
+      results.append({'index': index, 'url': url, 'status': 'invalid', 'detail': 'description must be a string'})
+      continue
+    if url in seen_urls:
+      results.append({'index': index, 'url': url, 'status': 'invalid', 'detail': 'Duplicate URL in request'})
+      continue
+    seen_urls.add(url)
+
+    item = build_new_item(url, description)
+    items.append(item)
+    results.append({'index': index, 'url': url, 'status': 'created', 'item': item})
+
+  # 検索用トークンはバッチ全体でトークンごとにまとめて登録する
+  if not reindex_items_for_search(added_items=items):
+    for item in items:
+      item['search_title'] = None
+
+  failed_ids = batch_write([{'PutRequest': {'Item': item}} for item in items])
+  for result in results:
+    if result['status'] == 'created' and result['item']['id'] in failed_ids:
+      result['status'] = 'failed'
+      result['detail'] = 'Write was not processed'
+      del result['item']
+
+  if len(failed_ids) < len(items):
+    bump_revision()
+    adjust_catalog_summary(len(items) - len(failed_ids))
+  return results
+
+# アイテムを一括削除（存在しないIDはnot_foundとして返す）
+# 戻り値: 入力順のエントリーごとの結果
+def delete_items_batch(item_ids):
+  results = []
+  valid_ids = []
+  seen_ids = set()
+
+  for index, item_id in enumerate(item_ids):
+    if not item_id or not isinstance(item_id, str) or item_id.startswith(SYSTEM_RECORD_PREFIX):
+      results.append({'index': index, 'id': item_id, 'status': 'invalid', 'detail': 'Invalid id'})
+      continue
+    if item_id in seen_ids:
+      results.append({'index': index, 'id': item_id, 'status': 'invalid', 'detail': 'Duplicate id in request'})
+      continue
+    seen_ids.add(item_id)
+    valid_ids.append(item_id)
+    results.append({'index': index, 'id': item_id, 'status': 'deleted'})
+
+  existing = batch_get_items(valid_ids, ['id', 'search_title', 'has_sale']) if valid_ids else {}
+  existing_ids = set(existing)
+  failed_ids = batch_write([{'DeleteRequest': {'Key': {'id': item_id}}} for item_id in valid_ids if item_id in existing_ids])
+  deleted = [record for item_id, record in existing.items() if item_id not in failed_ids]
+
+  # 削除は確定しているため、検索用トークンの更新より先にリビジョンと集計を反映する
+  # （トークンに残った削除済みのIDは、検索時にアイテムが見つからないため結果に含まれない）
+  if deleted:
+    bump_revision()
+    adjust_catalog_summary(-len(deleted), -sum(1 for record in deleted if record.get('has_sale')))
+  reindex_items_for_search(removed_items=deleted)
+
+  for result in results:
+    if result['status'] != 'deleted':
+      continue
+    if result['id'] not in existing_ids:
+      result['status'] = 'not_found'
+    elif result['id'] in failed_ids:
+      result['status'] = 'failed'
+      result['detail'] = 'Delete was not processed'
+  return results
+
+# 一括処理の結果を件数とともにレスポンスにする
+def create_batch_response(results):
+  counts = {}
+  for result in results:
+    counts[result['status']] = counts.get(result['status'], 0) + 1
+  return create_response(200, {'results': results, 'counts': counts})
+
+# リクエストボディのJSONを取得（API Gateway V1/V2互換、Base64エンコードにも対応）
+def parse_json_body(event):
+  body_str = event.get('body') or '{}'
+  if event.get('isBase64Encoded'):
+    body_str = base64.b64decode(body_str).decode('utf-8')
+  return json.loads(body_str)
+
+# 一括処理のリクエストから対象の配列を取得（不正な場合はValueError）
+def get_batch_entries(event, key):
+  try:
+    body = parse_json_body(event)
+  except (json.JSONDecodeError, UnicodeDecodeError, binascii.Error) as e:
+    raise ValueError(f'Invalid JSON in request body: {str(e)}')
+  entries = body.get(key) if isinstance(body, dict) else None
+  if not isinstance(entries, list) or not entries:
+    raise ValueError(f'{key} must be a non-empty array')
+  if len(entries) > BATCH_MAX_ENTRIES:
+    raise ValueError(f'{key} must contain at most {BATCH_MAX_ENTRIES} entries')
+  return entries
+
 # アイテムを削除
 def delete_item(item_id):
-  response = table.delete_item(
+  response = get_table().delete_item(
     Key={'id': item_id},
     ReturnValues='ALL_OLD'
   )
   item = response.get('Attributes')
-  # 型変換
   if item:
-    if 'current_price' in item and item['current_price'] is not None:
-      item['current_price'] = float(item['current_price'])
-    if 'points' in item and item['points'] is not None:
-      item['points'] = int(item['points'])
-    if 'has_sale' in item and item['has_sale'] is not None:
-      item['has_sale'] = bool(item['has_sale'])
+    reindex_items_for_search(removed_items=[item])
+    bump_revision()
+    adjust_catalog_summary(-1, -1 if item.get('has_sale') else 0)
+    omit_price_history(item)
   return item
 
+# タイトルで検索（トークンレコードの集合の積で候補を絞り、タイトルを照合する）
+# 戻り値: (一覧と同じ順序のアイテム, 候補が上限を超えて一部のみ照合したかどうか)
+def search_items(query, limit):
+  tokens = tokenize_title(query)
+  if not tokens:
+    raise ValueError('q must contain at least 2 consecutive characters')
+
+  token_records = batch_get_items([f"{SEARCH_TOKEN_PREFIX}{token}" for token in tokens], ['id', 'ids'])
+  id_sets = sorted(
+    (token_records.get(f"{SEARCH_TOKEN_PREFIX}{token}", {}).get('ids') or set() for token in tokens),
+    key=len
+  )
+  candidates = set(id_sets[0]).intersection(*id_sets[1:])
+  truncated = len(candidates) > SEARCH_MAX_CANDIDATES
+  candidate_ids = sorted(candidates)[:SEARCH_MAX_CANDIDATES]
+
+  # bigramの一致だけでは語順が異なるものも含まれるため、正規化したタイトルで照合する
+  words = normalize_search_text(query).split()
+  items = [
+    omit_price_history(item) for item in batch_get_items(candidate_ids).values()
+    if all(word in normalize_search_text(item.get('description')) for word in words)
+  ]
+  items.sort(key=lambda item: item.get('sort_key') or build_sort_key(item, item.get('updated_at')), reverse=True)
+  return items[:limit], truncated
+
 # スクレイパーは独立したLambda関数として動作するため、
 # API側からの呼び出しは行いません
 
 # パスを正規化する (ステージプレフィックスを削除し、itemsエンドポイントを処理)
 def normalize_path(path):
-  logger.info(f"オリジナルパス: {path}")
-  
   # 0. /apiを削除
   if path and path.startswith('/api'):
     path = path[len('/api'):]
@@ -113,8 +762,7 @@ def normalize_path(path):
   # 3. パスがない場合のデフォルト
   if not path:
     path = ''
-    
-  logger.info(f"正規化後パス: {path}")
+
   return path
 
 # リクエストからHTTPメソッドを取得（API Gateway V1/V2互換）
@@ -139,91 +787,235 @@ def get_path(event):
   # デフォルト
   return '/'
 
+# ルートのハンドラー（paramsにはパスから取り出した値が入る）
+# ルートエンドポイントへのGET
+def handle_root(event):
+  return create_response(200, {'message': 'Kindle Items API is running. Use /items or /items/ to access the API.'})
+
+# スクレイパーの実行状態
+def handle_get_status(event):
+  return create_response(200, get_update_status())
+
+# アイテム一覧取得
+def handle_list_items(event):
+  params = event.get('queryStringParameters') or {}
+
+  # 前回の取得から一覧が変わっていなければ本文を返さない
+  etag = build_etag(get_revision(), params)
+  if etag_matches(get_header(event, 'If-None-Match'), etag):
+    return create_not_modified_response(etag)
+  list_headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+  accept_encoding = get_header(event, 'Accept-Encoding')
+
+  limit = None
+  if 'limit' in params:
+    try:
+      limit = int(params['limit'])
+    except ValueError:
+      return create_response(400, {'detail': 'limit must be an integer'})
+    if limit < 1 or limit > MAX_PAGE_LIMIT:
+      return create_response(400, {'detail': f'limit must be between 1 and {MAX_PAGE_LIMIT}'})
+
+  # has_sale=trueの場合はセール中のアイテムだけをSaleIndexから割引率の高い順に取得
+  if 'has_sale' in params:
+    if params['has_sale'] != 'true':
+      return create_response(400, {'detail': 'has_sale only supports true'})
+    try:
+      items, next_cursor = get_sale_items(limit, params.get('cursor'))
+    except ValueError as e:
+      return create_response(400, {'detail': str(e)})
+    if limit is None:
+      return create_response(200, items, list_headers, accept_encoding)
+    return create_response(200, {'items': items, 'next_cursor': next_cursor}, list_headers, accept_encoding)
+
+  # limitを指定した場合はページ単位で取得（続きはnext_cursorをcursorに指定する）
+  if limit is not None:
+    try:
+      items, next_cursor = get_items_page(limit, params.get('cursor'))
+    except ValueError as e:
+      return create_response(400, {'detail': str(e)})
+    return create_response(200, {'items': items, 'next_cursor': next_cursor}, list_headers, accept_encoding)
+
+  items = get_all_items()
+  return create_response(200, items, list_headers, accept_encoding)
+
+# アイテム作成
+def handle_create_item(event):
+  try:
+    body = parse_json_body(event)
+    url = body.get('url')
+    description = body.get('description', '')
+
+    # 入力検証（URLのみ必須）
+    if not url:
+      return create_response(400, {'detail': 'URL is required'})
+    if description is not None and not isinstance(description, str):
+      return create_response(400, {'detail': 'description must be a string'})
+
+    item = create_item(url, description)
+    return create_response(201, item)
+  except json.JSONDecodeError as e:
+    logger.error(f"JSONデコードエラー: {str(e)}")
+    return create_response(400, {'detail': f'Invalid JSON in request body: {str(e)}'})
+  except Exception as e:
+    logger.error(f"アイテム作成エラー: {str(e)}")
+    return create_response(500, {'detail': f'Error creating item: {str(e)}'})
+
+# 一括作成
+def handle_create_items_batch(event):
+  try:
+    entries = get_batch_entries(event, 'items')
+  except ValueError as e:
+    return create_response(400, {'detail': str(e)})
+  try:
+    results = create_items_batch(entries)
+  except Exception as e:
+    logger.error(f"一括作成エラー: {str(e)}")
+    return create_response(500, {'detail': f'Error creating items: {str(e)}'})
+  return create_batch_response(results)
+
+# 一括削除
+def handle_delete_items_batch(event):
+  try:
+    item_ids = get_batch_entries(event, 'ids')
+  except ValueError as e:
+    return create_response(400, {'detail': str(e)})
+  try:
+    results = delete_items_batch(item_ids)
+  except Exception as e:
+    logger.error(f"一括削除エラー: {str(e)}")
+    return create_response(500, {'detail': f'Error deleting items: {str(e)}'})
+  return create_batch_response(results)
+
+# 集計（登録件数・セール件数・前回の実行結果）取得
+def handle_get_summary(event):
+  return create_response(200, get_catalog_summary())
+
+# タイトル検索
+def handle_search(event):
+  params = event.get('queryStringParameters') or {}
+  query = params.get('q', '')
+  try:
+    limit = int(params.get('limit', SEARCH_DEFAULT_LIMIT))
+  except ValueError:
+    return create_response(400, {'detail': 'limit must be an integer'})
+  if limit < 1 or limit > MAX_PAGE_LIMIT:
+    return create_response(400, {'detail': f'limit must be between 1 and {MAX_PAGE_LIMIT}'})
+
+  try:
+    items, truncated = search_items(query, limit)
+  except ValueError as e:
+    return create_response(400, {'detail': str(e)})
+  return create_response(200, {'items': items, 'truncated': truncated}, accept_encoding=get_header(event, 'Accept-Encoding'))
+
+# アイテム詳細取得
+def handle_get_item(event, item_id):
+  item = get_item(item_id)
+  if not item:
+    return create_response(404, {'detail': 'Item not found'})
+  return create_response(200, item)
+
+# アイテムの価格履歴取得
+def handle_get_item_history(event, item_id):
+  history = get_price_history(item_id)
+  if not history:
+    return create_response(404, {'detail': 'Item not found'})
+  return create_response(200, history, accept_encoding=get_header(event, 'Accept-Encoding'))
+
+# アイテム削除
+def handle_delete_item(event, item_id):
+  item = delete_item(item_id)
+  if not item:
+    return create_response(404, {'detail': 'Item not found'})
+  return create_response(200, item)
+
+# ルート定義（メソッド, 正規化後のパス, ハンドラー）
+# {name} はパラメーターとして取り出し、ハンドラーにキーワード引数で渡す
+ROUTES = [
+  ('GET', '', handle_root),
+  ('GET', 'status', handle_get_status),
+  ('GET', 'summary', handle_get_summary),
+  ('GET', 'search', handle_search),
+  ('GET', 'items', handle_list_items),
+  ('POST', 'items', handle_create_item),
+  ('POST', 'items/batch', handle_create_items_batch),
+  ('POST', 'items/batch-delete', handle_delete_items_batch),
+  ('GET', 'items/{item_id}', handle_get_item),
+  ('GET', 'items/{item_id}/history', handle_get_item_history),
+  ('DELETE', 'items/{item_id}', handle_delete_item),
+]
+
+_ROUTE_PARAM_PATTERN = re.compile(r'\{(\w+)\}')
+
+# ルートのパターンを正規表現に変換（例: 'items/{item_id}' -> 'items/(?P<item_id>[^/]+)'）
+def compile_route(pattern):
+  # splitの結果は偶数番目がリテラル、奇数番目がパラメーター名
+  parts = _ROUTE_PARAM_PATTERN.split(pattern)
+  return re.compile(''.join(
+    re.escape(part) if index % 2 == 0 else f'(?P<{part}>[^/]+)'
+    for index, part in enumerate(parts)
+  ))
+
+# ルート定義をメソッドごとの正規表現の一覧に変換（モジュール読み込み時に1回だけ行う）
+def compile_routes(routes):
+  table = {}
+  for method, pattern, route_handler in routes:
+    table.setdefault(method, []).append((compile_route(pattern), route_handler, pattern))
+  return table
+
+_ROUTE_TABLE = compile_routes(ROUTES)
+
+# メソッドとパスに一致するルートを探す
+# 戻り値: (ハンドラー, パラメーター, ルートのパターン)、一致しない場合は (None, {}, None)
+def resolve_route(method, path):
+  for regex, route_handler, pattern in _ROUTE_TABLE.get(method, ()):
+    match = regex.fullmatch(path)
+    if match:
+      return route_handler, match.groupdict(), pattern
+  return None, {}, None
+
+# リクエストログ（LOG_SAMPLE_RATEの割合で出力、5xxは必ず出力。イベント全体や認証情報は出力しない）
+def log_request(context, method, route, status_code, started):
+  is_error = status_code >= 500
+  if not is_error and random.random() >= LOG_SAMPLE_RATE:
+    return
+  record = {
+    'request_id': getattr(context, 'aws_request_id', None),
+    'method': method,
+    'route': route,
+    'status': status_code,
+    'duration_ms': round((time.perf_counter() - started) * 1000, 1)
+  }
+  if is_error:
+    logger.warning(json.dumps(record))
+  else:
+    logger.info(json.dumps(record))
+
 # メインのLambdaハンドラー
+@report_init_timings
 def lambda_handler(event, context):
-  # イベントのデバッグ出力（開発時のみ）
-  logger.info(f"Kindle Items API - イベント: {json.dumps(event)}")
-  
+  started = time.perf_counter()
+
   # HTTPメソッドとパスを取得
   http_method = get_http_method(event)
-  path = get_path(event)
-  
-  logger.info(f"Kindle Items API - HTTPメソッド: {http_method}, パス: {path}")
-  
+
   # プレフライトリクエスト処理
   if http_method == 'OPTIONS':
     return create_response(200, {})
-    
-  # パスを正規化
-  normalized_path = normalize_path(path)
-  
-  # ルート (/) へのアクセス
-  if normalized_path == '':
-    # ルートエンドポイントへのGET
-    if http_method == 'GET':
-      return create_response(200, {'message': 'Kindle Items API is running. Use /items or /items/ to access the API.'})
-  
-  # itemsエンドポイント処理 (GET, POST)
-  elif normalized_path == 'items':
-    # アイテム一覧取得
-    if http_method == 'GET':
-      items = get_all_items()
-      logger.info(f"取得アイテム数: {len(items)}")
-      return create_response(200, items)
-    
-    # アイテム作成
-    elif http_method == 'POST':
-      try:
-        # リクエストボディの取得（API Gateway V1/V2互換）
-        if 'body' in event:
-          body_str = event['body']
-          if body_str is None:
-            body_str = '{}'
-        else:
-          body_str = '{}'
-        
-        logger.info(f"リクエストボディ: {body_str}")
-        
-        body = json.loads(body_str)
-        url = body.get('url')
-        description = body.get('description', '')
-        
-        # 入力検証（URLのみ必須）
-        if not url:
-          return create_response(400, {'detail': 'URL is required'})
-        
-        item = create_item(url, description)
-        return create_response(201, item)
-      except json.JSONDecodeError as e:
-        logger.error(f"JSONデコードエラー: {str(e)}")
-        return create_response(400, {'detail': f'Invalid JSON in request body: {str(e)}'})
-      except Exception as e:
-        logger.error(f"アイテム作成エラー: {str(e)}")
-        return create_response(500, {'detail': f'Error creating item: {str(e)}'})
-  
-  # 個別アイテム処理 (GET, DELETE)
-  elif normalized_path.startswith('items/'):
-    # /items/xxxx の形式からIDを抽出
-    item_id = normalized_path.split('/', 1)[1]
-    
-    # アイテム詳細取得
-    if http_method == 'GET':
-      item = get_item(item_id)
-      if not item:
-        return create_response(404, {'detail': 'Item not found'})
-      return create_response(200, item)
-    
-    # アイテム削除
-    elif http_method == 'DELETE':
-      item = delete_item(item_id)
-      if not item:
-        return create_response(404, {'detail': 'Item not found'})
-      return create_response(200, item)
-  
-  # 一致するルートが見つからない
-  logger.warning(f"一致するルートが見つかりません: method={http_method}, path={normalized_path}")
-  return create_response(404, {'detail': 'Not Found'})
+
+  route_handler, params, route = resolve_route(http_method, normalize_path(get_path(event)))
+  if route_handler is None:
+    # 一致するルートが見つからない
+    response = create_response(404, {'detail': 'Not Found'})
+  else:
+    response = route_handler(event, **params)
+
+  log_request(context, http_method, route, response['statusCode'], started)
+  return response
 
 # 互換性用のハンドラー
 def handler(event, context):
-  return lambda_handler(event, context)
\ No newline at end of file
+  return lambda_handler(event, context)
+
+# モジュール読み込み時間（ファイル先頭からここまで）
+_init_timings['module_load'] = round((time.perf_counter() - _MODULE_LOAD_STARTED) * 1000, 1)
\ No newline at end of file
@@ -1,22 +1,89 @@
-import boto3
-from bs4 import BeautifulSoup
+import time
+
+# コールドスタート時のモジュール読み込み時間の計測開始
+_MODULE_LOAD_STARTED = time.perf_counter()
+
+# boto3 / bs4 / requests / linebot は読み込みに時間がかかるため、必要になった時点で読み込む
+import codecs
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache, wraps
+import hashlib
+import importlib
 import json
 import logging
 import os
 import random
 import re
-import requests
-import time
-from linebot import LineBotApi
-from linebot.exceptions import LineBotApiError
-from linebot.models import FlexSendMessage, TextSendMessage
+import threading
+import unicodedata
+import uuid
+from urllib.parse import urlparse
 from typing import Any, Dict, List
 
 # ロギング設定
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# 初期化時間の内訳（ミリ秒、コールドスタート時の最初の呼び出しでログ出力する）
+_init_timings = {}
+_cold_start = True
+
+@contextmanager
+def init_timer(name):
+    """依存モジュールの読み込みやクライアント作成にかかった時間を記録する"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _init_timings[name] = round(_init_timings.get(name, 0) + (time.perf_counter() - started) * 1000, 1)
+
+# AWSクライアント・DynamoDBテーブル（ウォームスタート時は再利用する）
+_aws_clients = {}
+_dynamodb_tables = {}
+_aws_clients_lock = threading.Lock()
+
+def get_aws_client(service_name, config=None, cache_key=None):
+    """
+    AWSクライアントを取得する（作成済みであれば再利用する）
+    configを指定する場合は、設定ごとにcache_keyを分ける
+    """
+    cache_key = cache_key or service_name
+    with _aws_clients_lock:
+        if cache_key not in _aws_clients:
+            with init_timer('import_boto3'):
+                import boto3
+            with init_timer(f"client_{cache_key}"):
+                _aws_clients[cache_key] = boto3.client(service_name, config=config)
+        return _aws_clients[cache_key]
+
+def get_table(table_name):
+    """DynamoDBテーブルのリソースを取得する（作成済みであれば再利用する）"""
+    with _aws_clients_lock:
+        if table_name not in _dynamodb_tables:
+            with init_timer('import_boto3'):
+                import boto3
+            with init_timer(f"table_{table_name}"):
+                _dynamodb_tables[table_name] = boto3.resource('dynamodb').Table(table_name)
+        return _dynamodb_tables[table_name]
+
+def report_init_timings(handler_function):
+    """コールドスタートの最初の呼び出しで初期化時間の内訳をログ出力する"""
+    @wraps(handler_function)
+    def wrapper(event, context):
+        global _cold_start
+        cold_start, _cold_start = _cold_start, False
+        started = time.perf_counter()
+        try:
+            return handler_function(event, context)
+        finally:
+            if cold_start:
+                timings = dict(_init_timings, first_invocation=round((time.perf_counter() - started) * 1000, 1))
+                logger.info(f"コールドスタート初期化時間(ms): {json.dumps(timings)}")
+    return wrapper
+
 # ユーザーエージェント
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
@@ -33,26 +100,198 @@ HEADERS = {
 # LINE Messaging API 設定
 LINE_CHANNEL_ACCESS_TOKEN = os.environ.get('LINE_CHANNEL_ACCESS_TOKEN', '')
 LINE_USER_ID = os.environ.get('LINE_USER_ID', '')  # 通知を送信するユーザーID
+# 複数のユーザーに通知する場合はカンマ区切りで指定する（指定した場合はLINE_USER_IDより優先し、multicastで送信する）
+LINE_USER_IDS = [user_id.strip() for user_id in os.environ.get('LINE_USER_IDS', '').split(',') if user_id.strip()]
+
+# LINE配信設定（Messaging APIの上限）
+# カルーセル1件あたりのバブル数・JSONのサイズ、1回の送信あたりのメッセージ数、multicastの宛先数
+LINE_CAROUSEL_MAX_BUBBLES = 12
+LINE_CAROUSEL_MAX_BYTES = 50000
+LINE_MESSAGES_PER_REQUEST = 5
+LINE_MULTICAST_MAX_RECIPIENTS = 500
+LINE_TEXT_MAX_CHARS = 5000
+# バブル1件あたりのJSONのバイト数の上限（12件がカルーセルの上限に収まる大きさ）
+FLEX_BUBBLE_MAX_BYTES = int(os.environ.get('FLEX_BUBBLE_MAX_BYTES', '4000'))
+# タイトルの最大文字数（バブルでは2行まで表示）と、サイズの上限を超える場合に短くする文字数
+FLEX_TITLE_MAX_CHARS = 60
+FLEX_TITLE_MIN_CHARS = 20
+# 同時に送信するリクエスト数と、429・5xxの場合の再試行
+LINE_SEND_CONCURRENCY = int(os.environ.get('LINE_SEND_CONCURRENCY', '4'))
+LINE_MAX_RETRIES = int(os.environ.get('LINE_MAX_RETRIES', '5'))
+LINE_RETRY_BASE_SECONDS = 1.0
+LINE_RETRY_MAX_SECONDS = 30.0
+# 送信先: sdk（line-bot-sdkでLINEに送信）/ stub（送信せずに記録する、テスト用）
+LINE_CLIENT_MODE = os.environ.get('LINE_CLIENT_MODE', 'sdk')
 
 # 通知間隔設定（7日 = 1週間）
 NOTIFICATION_INTERVAL_DAYS = 7
+# 0より大きい場合、実質価格が直近N日間の最安値以下のときのみ通知する（価格履歴を使う）
+NOTIFY_BELOW_MIN_DAYS = int(os.environ.get('NOTIFY_BELOW_MIN_DAYS', '0'))
+
+# 通知アウトボックス設定
+# セール通知は「アイテムID#実質価格」をキーとして送信待ちで保存し、送信は outbox_sender モードの呼び出しで非同期に行う
+OUTBOX_PREFIX = '__OUTBOX__#'
+# 送信待ちのエントリのみを持つスパースインデックス（outbox_pk / outbox_sk は送信待ちの間だけ設定する）
+OUTBOX_INDEX_NAME = 'OutboxIndex'
+OUTBOX_PENDING_VALUE = 'PENDING'
+# 1回の送信でまとめるエントリ数、取得したエントリをほかの送信処理から隠す時間（秒）、送信を諦めるまでの試行回数
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '60'))
+OUTBOX_LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS', '300'))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '5'))
+# 送信済み・送信失敗のエントリを残す日数（DynamoDBのTTL属性 purge_at で削除する）
+OUTBOX_RETENTION_DAYS = int(os.environ.get('OUTBOX_RETENTION_DAYS', '30'))
+# 送信処理の呼び出し先: lambda（同じLambda関数を非同期で呼び出す）/ local（同一プロセス内で実行する、テスト用）
+OUTBOX_DISPATCH_MODE = os.environ.get('OUTBOX_DISPATCH_MODE', 'lambda')
+
+# 並列取得設定（同時に処理中にするページリクエスト数）
+SCRAPER_CONCURRENCY = int(os.environ.get('SCRAPER_CONCURRENCY', '4'))
+
+# ホストごとのレート制限設定（トークンバケット）
+# rate: 1秒あたりのリクエスト数, burst: 連続して送信できるリクエスト数の上限
+AMAZON_HOST = 'amazon.co.jp'
+AMAZON_RATE_LIMIT = (
+    float(os.environ.get('AMAZON_REQUESTS_PER_SECOND', '1.5')),
+    int(os.environ.get('AMAZON_REQUEST_BURST', '2'))
+)
+HOST_RATE_LIMITS = {
+    AMAZON_HOST: AMAZON_RATE_LIMIT
+}
+DEFAULT_RATE_LIMIT = (1.0, 1)
+
+# HTTP接続設定（タイムアウトは秒、接続プールは並列数に合わせる）
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', '5'))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', '15'))
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', str(max(SCRAPER_CONCURRENCY, 1))))
+HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', '2'))
+HTTP_RETRY_BACKOFF = float(os.environ.get('HTTP_RETRY_BACKOFF', '1.0'))
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# ストリーミング取得（タイトルとKindle版スワッチを受信した時点で残りの本文を読まずに打ち切る）
+# 打ち切った接続はKeep-Aliveで再利用できないため、既定では無効
+HTTP_STREAM_FETCH = os.environ.get('HTTP_STREAM_FETCH', 'false').lower() == 'true'
+HTTP_STREAM_CHUNK_SIZE = int(os.environ.get('HTTP_STREAM_CHUNK_SIZE', '16384'))
+
+# ページ指紋の設定（価格判定に関係する領域が前回と同じならパース・保存を省略する）
+# アルゴリズムを変更した場合はバージョンを上げて既存の指紋を無効化する
+FINGERPRINT_VERSION = '1'
+TITLE_ELEMENT_ID = 'productTitle'
+KINDLE_SWATCH_ELEMENT_ID = 'tmm-grid-swatch-KINDLE'
+FINGERPRINT_ELEMENT_IDS = (TITLE_ELEMENT_ID, KINDLE_SWATCH_ELEMENT_ID)
+
+# HTMLパーサーのバックエンド（html.parser / bs4-lxml / lxml / selectolax）
+# lxml・selectolaxはレイヤーに含まれていない場合html.parserにフォールバックする
+HTML_PARSER_BACKEND = os.environ.get('HTML_PARSER_BACKEND', 'html.parser')
+# Kindle版スワッチ部分を切り出してからパースする（取得できない場合はページ全体をパース）
+HTML_PRESLICE = os.environ.get('HTML_PRESLICE', 'true').lower() == 'true'
+
+# スキャン設定（並列セグメント数と、スクレイパーが使う属性のみに絞る射影）
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', '4'))
+SCAN_ATTRIBUTES = (
+    'id', 'url', 'description', 'current_price', 'has_sale', 'points', 'last_notification', 'page_fingerprint',
+    'sort_key', 'sale_discount', 'search_title', 'price_history', 'last_checked_at', 'volatility'
+)
+
+# 一覧API（kindle_items.py）のリビジョン（書き込みがあれば加算し、ETagを無効にする）
+REVISION_ID = '__REVISION__'
+# 画面ヘッダー用の集計レコード（実行終了時にスクレイパーが書き込み、APIでの追加・削除時は件数を増減する）
+CATALOG_SUMMARY_ID = '__CATALOG_SUMMARY__'
+
+# 一覧API（kindle_items.py）の並び順用キー（ListOrderIndexのパーティションキーとソートキー）
+LIST_PARTITION_VALUE = 'ITEM'
+# セール中のアイテムだけが持つSaleIndexのパーティションキー（ソートキーは割引率 sale_discount）
+SALE_INDEX_NAME = 'SaleIndex'
+SALE_PARTITION_VALUE = 'SALE'
+# タイトル検索用のトークンレコード（IDは __SEARCH__#<トークン>、ids にアイテムIDの集合を持つ）
+# アイテムの search_title には索引済みのタイトルを保存し、description と異なる場合に索引を更新する
+SEARCH_TOKEN_PREFIX = '__SEARCH__#'
+SORT_KEY_MAX_RATIO_BP = 999999
+
+# 変更検知の対象とする属性（いずれかが変わったアイテムのみDynamoDBに書き込む）
+TRACKED_ATTRIBUTES = (
+    'current_price', 'description', 'has_sale', 'points', 'last_notification', 'page_fingerprint', 'sale_discount',
+    'price_history'
+)
+
+# 価格履歴（アイテムのバイナリ属性 price_history）
+# 価格またはポイントが変わった時点（変化点）だけを、前の変化点との差分を可変長整数で符号化して追記する
+# 形式: バージョン(1バイト) + 変化点ごとに [時刻(分)の差分, 価格の差分, ポイントの差分]（いずれもzigzag varint）
+PRICE_HISTORY_VERSION = 1
+# 保持する変化点の上限（超えた分は古い順に削除する。500件でも数KBに収まる）
+PRICE_HISTORY_MAX_ENTRIES = int(os.environ.get('PRICE_HISTORY_MAX_ENTRIES', '500'))
+
+# DynamoDB書き込み設定（並列数・スロットリング時の再試行）
+WRITE_CONCURRENCY = int(os.environ.get('WRITE_CONCURRENCY', '8'))
+WRITE_MAX_RETRIES = int(os.environ.get('WRITE_MAX_RETRIES', '5'))
+WRITE_RETRY_BASE_SECONDS = 0.1
+WRITE_RETRY_MAX_SECONDS = 5.0
+THROTTLING_ERROR_CODES = frozenset([
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded'
+])
+
+# 実行モード: single（1回の呼び出しで全件処理）/ coordinator（シャードに分割してワーカーに配布）
+# イベントの mode で上書きできる（ワーカーは mode=worker で呼び出される）
+SCRAPER_MODE = os.environ.get('SCRAPER_MODE', 'single')
+SHARD_SIZE = int(os.environ.get('SCRAPER_SHARD_SIZE', '100'))
+# 同時に処理するシャード数（残りのシャードは処理を終えたワーカーが順に呼び出す）
+SHARD_MAX_PARALLEL = int(os.environ.get('SCRAPER_SHARD_MAX_PARALLEL', '10'))
+# ワーカーの呼び出し先: lambda（同じ関数を別インスタンスとして非同期呼び出し）/ local（同一プロセス内、テスト用）
+SHARD_DISPATCH_MODE = os.environ.get('SHARD_DISPATCH_MODE', 'lambda')
+# 分割実行の状態レコード（実行ID・シャード数・完了数と集計値）と、シャードごとのレコード（対象アイテムIDと結果）
+SHARD_RUN_ID = '__SHARD_RUN__'
+SHARD_RECORD_PREFIX = '__SHARD__#'
+# シャードのレコードを残す時間（DynamoDBのTTL属性 purge_at で削除する）
+SHARD_RECORD_RETENTION_HOURS = 24
+
+# 書籍以外の管理用レコードのIDプレフィックス（ロック・リースなど）
+SYSTEM_RECORD_PREFIX = '__'
+
+# 優先度スケジューラー設定
+# SCRAPE_BUDGET: 1回の実行で取得するアイテム数の上限（0の場合は従来通り全件を取得）
+# MAX_STALENESS_HOURS以上確認していないアイテムは予算に関係なく必ず取得する
+# 最終確認時刻（UNIX秒）と価格変動率は、アイテムの属性（SCHEDULE_ATTRIBUTES）に保存する
+SCHEDULE_ATTRIBUTES = ('last_checked_at', 'volatility')
+SCRAPE_BUDGET = int(os.environ.get('SCRAPE_BUDGET', '0'))
+MAX_STALENESS_HOURS = float(os.environ.get('MAX_STALENESS_HOURS', '72'))
+# 価格変動率の指数移動平均の係数と、変動率1.0とみなす相対価格変化
+VOLATILITY_ALPHA = 0.3
+VOLATILITY_FULL_SCALE_CHANGE = 0.1
+VOLATILITY_WEIGHT = 4.0
+# セール中のアイテムはセール終了を早く検知するため優先する
+ON_SALE_BONUS = 0.5
+# セールが始まりやすい曜日（JST, 月曜=0）は予算を増やす
+SALE_WINDOW_WEEKDAYS = {int(day) for day in os.environ.get('SALE_WINDOW_WEEKDAYS', '4').split(',') if day.strip()}
+SALE_WINDOW_BUDGET_MULTIPLIER = float(os.environ.get('SALE_WINDOW_BUDGET_MULTIPLIER', '2'))
+
+# チェックポイント設定（singleモード）
+# CHECKPOINT_INTERVAL件ごとに結果と進捗を保存し、タイムアウト前に中断した場合は次の呼び出しで再開する
+CHECKPOINT_ID = '__SCRAPE_CHECKPOINT__'
+CHECKPOINT_INTERVAL = int(os.environ.get('CHECKPOINT_INTERVAL', '25'))
+CHECKPOINT_TTL_HOURS = float(os.environ.get('CHECKPOINT_TTL_HOURS', '6'))
+# 残り実行時間がこれを下回ったら次のチャンクに進まずに中断する（秒）
+CHECKPOINT_TIME_MARGIN_SECONDS = int(os.environ.get('CHECKPOINT_TIME_MARGIN_SECONDS', '60'))
+# 中断時に自分自身を非同期で呼び出して続きを処理する
+CHECKPOINT_SELF_CONTINUE = os.environ.get('CHECKPOINT_SELF_CONTINUE', 'true').lower() == 'true'
 
 # 更新ロック用の特別なID
 UPDATE_LOCK_ID = '__UPDATE_LOCK__'
 LOCK_TTL_HOURS = 0  # 1時間
 
-def is_already_running(table):
+def is_already_running(table, lock_id=UPDATE_LOCK_ID):
     """
     既にスクレイパーが実行中かどうかを確認する
     既存テーブルの特別なレコードで実行中フラグを管理
+    lock_idにはワーカーのリースIDを指定することもできる
     """
     try:
         # 更新ロックレコードを確認
         response = table.get_item(
-            Key={'id': UPDATE_LOCK_ID}
+            Key={'id': lock_id}
         )
         
-        if 'Item' in response:
+        # 更新ロックは実行後も状態レコード（status=idle）として残るため、実行中のもののみを確認する
+        if 'Item' in response and response['Item'].get('status') == 'running':
             item = response['Item']
             started_at = item.get('started_at')
             
@@ -73,12 +312,12 @@ def is_already_running(table):
                         return True
                     else:
                         logger.info(f"前回の実行から{elapsed_hours:.2f}時間が経過したため、ロックを解除します")
-                        # 期限切れのロックを削除
-                        table.delete_item(Key={'id': UPDATE_LOCK_ID})
+                        # 期限切れのロックを解除
+                        clear_update_lock(table, lock_id)
                 except (ValueError, TypeError) as e:
                     logger.warning(f"実行時間の解析に失敗: {str(e)}, started_at: {started_at}")
-                    # 不正なレコードは削除
-                    table.delete_item(Key={'id': UPDATE_LOCK_ID})
+                    # 不正なレコードは解除
+                    clear_update_lock(table, lock_id)
         
         return False
         
@@ -87,9 +326,10 @@ def is_already_running(table):
         # エラーの場合は安全のため実行を許可しない
         return True
 
-def set_update_lock(table, function_name):
+def set_update_lock(table, function_name, lock_id=UPDATE_LOCK_ID):
     """
-    実行中フラグを設定する
+    実行中フラグ（またはワーカーのリース）を設定する
+    前回の完了時刻などを残すため、レコードは置き換えずに更新する
     """
     try:
         # UTC時刻で統一
@@ -100,15 +340,22 @@ def set_update_lock(table, function_name):
         current_time_str = current_time.isoformat() + 'Z'  # Zを付けてUTCであることを明示
         expires_at_str = expires_at.isoformat() + 'Z'
         
-        table.put_item(
-            Item={
-                'id': UPDATE_LOCK_ID,
-                'status': 'running',
-                'started_at': current_time_str,
-                'expires_at': expires_at_str,
-                'function_name': function_name,
-                'description': 'Kindle scraper update lock',
-                'created_by': 'kindle_scraper'
+        table.update_item(
+            Key={'id': lock_id},
+            UpdateExpression=(
+                'SET #status = :status, started_at = :started, expires_at = :expires, function_name = :fn, '
+                'description = :desc, created_by = :by, progress_processed = :zero, progress_total = :zero '
+                'REMOVE finished_at'
+            ),
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':status': 'running',
+                ':started': current_time_str,
+                ':expires': expires_at_str,
+                ':fn': function_name,
+                ':desc': 'Kindle scraper update lock',
+                ':by': 'kindle_scraper',
+                ':zero': 0
             }
         )
         
@@ -119,14 +366,26 @@ def set_update_lock(table, function_name):
         logger.error(f"実行中フラグの設定でエラーが発生: {str(e)}")
         return False
 
-def clear_update_lock(table):
+def clear_update_lock(table, lock_id=UPDATE_LOCK_ID):
     """
-    実行中フラグをクリアする
+    実行中フラグ（またはワーカーのリース）をクリアする
+    更新ロックは状態表示（GET /status）に使うため、削除せず status=idle にする
     """
     try:
-        table.delete_item(
-            Key={'id': UPDATE_LOCK_ID}
-        )
+        if lock_id == UPDATE_LOCK_ID:
+            table.update_item(
+                Key={'id': lock_id},
+                UpdateExpression='SET #status = :status, finished_at = :finished REMOVE expires_at',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={
+                    ':status': 'idle',
+                    ':finished': datetime.utcnow().isoformat() + 'Z'
+                }
+            )
+        else:
+            table.delete_item(
+                Key={'id': lock_id}
+            )
         
         logger.info("実行中フラグをクリアしました")
         return True
@@ -135,65 +394,434 @@ def clear_update_lock(table):
         logger.error(f"実行中フラグのクリアでエラーが発生: {str(e)}")
         return False
 
-def scan_all_items(table) -> List[Dict[str, Any]]:
+def update_run_progress(table, processed, total):
+    """実行状態レコードの進捗（処理済み件数/対象件数）を更新する"""
+    try:
+        table.update_item(
+            Key={'id': UPDATE_LOCK_ID},
+            UpdateExpression='SET progress_processed = :processed, progress_total = :total, progress_updated_at = :now',
+            ExpressionAttributeValues={
+                ':processed': processed,
+                ':total': total,
+                ':now': datetime.utcnow().isoformat() + 'Z'
+            }
+        )
+    except Exception as e:
+        logger.error(f"進捗の更新でエラーが発生: {str(e)}")
+
+def record_run_completed(table, sale_items_count, processed_count, write_stats, run_started_at):
     """
-    DynamoDBテーブルからすべてのアイテムを取得する
-    ページネーションを処理して大量のアイテムを扱えるようにする
-    更新ロックレコードは除外する
+    全件の処理が完了した実行の開始・完了時刻と結果を実行状態レコードに記録する
+    中断・再開した実行や分割実行では、最初の呼び出しの開始時刻と実行全体の件数を渡す
+    """
+    try:
+        table.update_item(
+            Key={'id': UPDATE_LOCK_ID},
+            UpdateExpression=(
+                'SET last_started_at = :started, last_completed_at = :now, last_sale_items_count = :sales, '
+                'last_processed_count = :processed, last_written_count = :written, last_failed_count = :failed'
+            ),
+            ExpressionAttributeValues={
+                ':started': run_started_at.isoformat() + 'Z',
+                ':now': datetime.utcnow().isoformat() + 'Z',
+                ':sales': sale_items_count,
+                ':processed': processed_count,
+                ':written': write_stats['written'],
+                ':failed': write_stats['failed']
+            }
+        )
+    except Exception as e:
+        logger.error(f"実行結果の記録でエラーが発生: {str(e)}")
+
+def count_sale_items(table, items):
+    """
+    セール中のアイテム数をSaleIndex（セール中のアイテムのみを持つ疎なインデックス）の件数から求める
+    coordinatorモードではワーカーの判定結果がitemsに反映されないため、テーブル側で数える
+    取得に失敗した場合はitemsのhas_saleから数える
+    """
+    try:
+        query_kwargs = {
+            'IndexName': SALE_INDEX_NAME,
+            'KeyConditionExpression': 'sale_pk = :salepk',
+            'ExpressionAttributeValues': {':salepk': SALE_PARTITION_VALUE},
+            'Select': 'COUNT'
+        }
+        count = 0
+        while True:
+            response = table.query(**query_kwargs)
+            count += response.get('Count', 0)
+            if 'LastEvaluatedKey' not in response:
+                return count
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    except Exception as e:
+        logger.error(f"セール中のアイテム数の取得でエラーが発生: {str(e)}")
+        return sum(1 for item in items if item.get('has_sale'))
+
+def write_catalog_summary(table, items, run_started_at, write_stats, failed_shards):
+    """
+    実行終了時に集計レコードを書き込む（失敗しても処理は継続する）
+    件数はこの実行での値で置き換え、実行の開始・終了時刻と所要時間、失敗件数を記録する
+    """
+    finished_at = datetime.utcnow()
+    try:
+        table.update_item(
+            Key={'id': CATALOG_SUMMARY_ID},
+            UpdateExpression=(
+                'SET total_items = :total, sale_items = :sales, last_run_started_at = :started, '
+                'last_run_finished_at = :finished, last_run_duration_seconds = :duration, '
+                'last_run_failed_count = :failed, last_run_failed_shards = :failed_shards, updated_at = :finished'
+            ),
+            ExpressionAttributeValues={
+                ':total': len(items),
+                ':sales': count_sale_items(table, items),
+                ':started': run_started_at.isoformat() + 'Z',
+                ':finished': finished_at.isoformat() + 'Z',
+                ':duration': Decimal(str(round((finished_at - run_started_at).total_seconds(), 1))),
+                ':failed': write_stats['failed'],
+                ':failed_shards': len(failed_shards)
+            }
+        )
+    except Exception as e:
+        logger.error(f"集計レコードの書き込みでエラーが発生: {str(e)}")
+
+def is_system_record(item):
+    """ロックやリースなど、書籍以外の管理用レコードかどうかを判定する"""
+    return str(item.get('id', '')).startswith(SYSTEM_RECORD_PREFIX)
+
+def scan_segment(client, table_name, segment, total_segments):
     """
+    並列スキャンの1セグメント分のアイテムを取得する
+    ページネーションを処理し、スロットリング時は指数バックオフで再試行する
+    管理用レコードはサーバー側のフィルターで除外し、必要な属性のみを取得する
+    """
+    scan_kwargs = {
+        'TableName': table_name,
+        'ProjectionExpression': ', '.join(f"#a{i}" for i in range(len(SCAN_ATTRIBUTES))),
+        # url などの予約語を含むため、属性名はすべてプレースホルダーで指定する
+        'ExpressionAttributeNames': {f"#a{i}": name for i, name in enumerate(SCAN_ATTRIBUTES)},
+        'FilterExpression': 'NOT begins_with(#a0, :system_prefix)',
+        'ExpressionAttributeValues': {':system_prefix': SYSTEM_RECORD_PREFIX}
+    }
+    if total_segments > 1:
+        scan_kwargs['Segment'] = segment
+        scan_kwargs['TotalSegments'] = total_segments
+
     items = []
-    scan_kwargs = {}
-    done = False
-    
-    while not done:
-        response = table.scan(**scan_kwargs)
-        
-        # 更新ロックレコード以外のアイテムのみを追加
-        for item in response.get('Items', []):
-            if item.get('id') != UPDATE_LOCK_ID:
-                items.append(item)
-        
+    attempt = 0
+    while True:
+        try:
+            response = client.scan(**scan_kwargs)
+        except Exception as e:
+            if is_throttling_error(e) and attempt < WRITE_MAX_RETRIES:
+                backoff = min(WRITE_RETRY_MAX_SECONDS, WRITE_RETRY_BASE_SECONDS * (2 ** attempt))
+                time.sleep(random.uniform(backoff / 2, backoff))
+                attempt += 1
+                continue
+            raise
+        attempt = 0
+
+        items.extend(response.get('Items', []))
+
         # 続きのアイテムがあるか確認
         if 'LastEvaluatedKey' in response:
             scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
         else:
-            done = True
-    
+            return items
+
+def scan_all_items(table) -> List[Dict[str, Any]]:
+    """
+    DynamoDBテーブルからすべてのアイテムを取得する
+    SCAN_SEGMENTS個のセグメントに分けてスレッドで並列にスキャンする
+    更新ロックなどの管理用レコードは除外する
+    """
+    total_segments = max(1, SCAN_SEGMENTS)
+    # リソースのクライアントはスレッドセーフで、Pythonの型のまま値を返す
+    client = table.meta.client
+
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        segments = list(executor.map(
+            lambda segment: scan_segment(client, table.name, segment, total_segments),
+            range(total_segments)
+        ))
+
+    items = []
+    for segment_items in segments:
+        for item in segment_items:
+            # フィルター済みだが、念のため管理用レコードを除外する
+            if not is_system_record(item):
+                snapshot_item(item)
+                items.append(item)
+
+    logger.info(f"スキャン完了: {len(items)}件（{total_segments}セグメント）")
     return items
 
-def update_item(table, items) -> bool:
+def bump_revision(table):
+    """一覧のリビジョンを加算する（失敗しても処理は継続する）"""
+    try:
+        table.update_item(
+            Key={'id': REVISION_ID},
+            UpdateExpression='ADD revision :one',
+            ExpressionAttributeValues={':one': 1}
+        )
+    except Exception as e:
+        logger.error(f"リビジョンの更新でエラーが発生: {str(e)}")
+
+def snapshot_item(item):
+    """変更検知のため、追跡対象属性とスケジューラー用属性の現在値をアイテムに記録する"""
+    item['_snapshot'] = tuple(item.get(name) for name in TRACKED_ATTRIBUTES)
+    item['_schedule_snapshot'] = tuple(item.get(name) for name in SCHEDULE_ATTRIBUTES)
+
+def is_schedule_dirty(item):
+    """スケジューラー用属性（今回の確認結果）がスナップショットから変化しているかを判定する"""
+    return item.get('_schedule_snapshot') != tuple(item.get(name) for name in SCHEDULE_ATTRIBUTES)
+
+def is_item_dirty(item):
     """
-    指定されたIDのアイテムを更新する
+    追跡対象属性がスナップショットから変化しているかを判定する
+    一覧の並び順キーがまだないアイテムも書き込み対象とする
     """
-    current_time = datetime.now().isoformat()
-    for item in items:
+    if not item.get('sort_key'):
+        return True
+    # タイトル検索の索引が現在のタイトルと異なるアイテムも書き込み対象とする
+    if item.get('search_title') != item.get('description'):
+        return True
+    snapshot = item.get('_snapshot')
+    return snapshot is None or snapshot != tuple(item.get(name) for name in TRACKED_ATTRIBUTES)
+
+def normalize_search_text(text):
+    """検索用にタイトルを正規化する（NFKC・小文字化し、記号と空白を区切りにする）"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return re.sub(r'[\W_]+', ' ', text).strip()
+
+def tokenize_title(text):
+    """
+    タイトルを検索用のトークン（文字bigram）に分割する（kindle_items.pyのtokenize_titleと同じ処理）
+    分かち書きのない日本語にも対応するため、区切りごとの連続する2文字をトークンとする
+    """
+    tokens = set()
+    for word in normalize_search_text(text).split():
+        tokens.update(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+def update_search_tokens(client, table_name, item_id, old_title, new_title):
+    """
+    タイトルの変更に合わせて検索用トークンレコードのアイテムIDの集合を更新する
+    全て成功した場合にTrueを返す（失敗した場合は次回の実行で再度更新される）
+    """
+    old_tokens = tokenize_title(old_title)
+    new_tokens = tokenize_title(new_title)
+    updates = [('ADD', token) for token in new_tokens - old_tokens] + [('DELETE', token) for token in old_tokens - new_tokens]
+
+    for action, token in updates:
+        for attempt in range(WRITE_MAX_RETRIES + 1):
+            try:
+                client.update_item(
+                    TableName=table_name,
+                    Key={'id': f"{SEARCH_TOKEN_PREFIX}{token}"},
+                    UpdateExpression=f"{action} ids :ids",
+                    ExpressionAttributeValues={':ids': {item_id}}
+                )
+                break
+            except Exception as e:
+                if is_throttling_error(e) and attempt < WRITE_MAX_RETRIES:
+                    backoff = min(WRITE_RETRY_MAX_SECONDS, WRITE_RETRY_BASE_SECONDS * (2 ** attempt))
+                    time.sleep(random.uniform(backoff / 2, backoff))
+                    continue
+                logger.error(f"検索トークンの更新に失敗しました ({item_id}, {token}): {str(e)}")
+                return False
+    return True
+
+def build_sort_key(item, updated_at):
+    """
+    一覧の並び順キーを作成する（kindle_items.pyのbuild_sort_keyと同じ形式）
+    セール中 → ポイント還元率（ベーシスポイント） → 更新日時 の順に降順で並ぶ
+    """
+    ratio_bp = 0
+    if item.get('current_price') and item.get('points'):
+        ratio_bp = min(SORT_KEY_MAX_RATIO_BP, int(float(item['points']) / float(item['current_price']) * 10000))
+    return f"{1 if item.get('has_sale') else 0}#{ratio_bp:06d}#{updated_at or ''}"
+
+def is_throttling_error(error):
+    """DynamoDBのスロットリングエラーかどうかを判定する"""
+    from botocore.exceptions import ClientError
+    return isinstance(error, ClientError) and error.response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES
+
+def is_conditional_check_failed(error):
+    """DynamoDBの条件付き書き込みで条件を満たさなかったエラーかどうかを判定する"""
+    from botocore.exceptions import ClientError
+    return isinstance(error, ClientError) and error.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException'
+
+def build_item_update(client, table_name, item, current_time):
+    """
+    1件のアイテムの更新式を作成する（タイトルが変わっていれば検索用トークンも更新する）
+    戻り値: (sort_key, update_expression, expression_attribute_values, reindexed)
+    """
+    sort_key = build_sort_key(item, current_time)
+    update_expression = (
+        'SET current_price = :price, description = :desc, has_sale = :sale, points = :pts, updated_at = :upd, '
+        'list_pk = :lpk, sort_key = :sk'
+    )
+    expression_attribute_values = {
+        ':price': item['current_price'],
+        ':desc': item['description'],
+        ':sale': item['has_sale'],
+        ':pts': item['points'],
+        ':upd': current_time,
+        ':lpk': LIST_PARTITION_VALUE,
+        ':sk': sort_key
+    }
+    
+    # 通知履歴があれば更新
+    if 'last_notification' in item:
+        update_expression += ', last_notification = :notif'
+        expression_attribute_values[':notif'] = item['last_notification']
+
+    # ページ指紋があれば更新
+    if item.get('page_fingerprint'):
+        update_expression += ', page_fingerprint = :fp'
+        expression_attribute_values[':fp'] = item['page_fingerprint']
+
+    # 価格履歴があれば更新
+    if item.get('price_history'):
+        update_expression += ', price_history = :hist'
+        expression_attribute_values[':hist'] = item['price_history']
+
+    # スケジューラー用の確認結果があれば更新
+    if item.get('last_checked_at') is not None:
+        update_expression += ', last_checked_at = :checked, volatility = :vol'
+        expression_attribute_values[':checked'] = item['last_checked_at']
+        expression_attribute_values[':vol'] = item.get('volatility', Decimal('0'))
+
+    # タイトルが変わっていれば検索用トークンを更新し、索引済みのタイトルを保存する
+    reindexed = False
+    if item.get('search_title') != item['description']:
+        reindexed = update_search_tokens(client, table_name, item['id'], item.get('search_title'), item['description'])
+        if reindexed:
+            update_expression += ', search_title = :desc'
+
+    # セール中のみSaleIndexのキーを持たせ、セールが終わったら削除する（スパースインデックス）
+    if item.get('has_sale') and item.get('sale_discount') is not None:
+        update_expression += ', sale_pk = :salepk, sale_discount = :disc'
+        expression_attribute_values[':salepk'] = SALE_PARTITION_VALUE
+        expression_attribute_values[':disc'] = item['sale_discount']
+    else:
+        update_expression += ' REMOVE sale_pk, sale_discount'
+
+    return sort_key, update_expression, expression_attribute_values, reindexed
+
+def write_item(client, table_name, item, current_time):
+    """
+    1件のアイテムを書き込む（スロットリング時は指数バックオフで再試行する）
+    成功した場合は書き込んだ値を新しいスナップショットとし、Trueを返す
+    必要な属性がないなど更新式を作成できないアイテムは、書き込みに失敗したものとして扱う
+    """
+    try:
+        sort_key, update_expression, expression_attribute_values, reindexed = build_item_update(
+            client, table_name, item, current_time
+        )
+    except Exception as e:
+        logger.error(f"Failed to update item {item.get('id')}: {str(e)}")
+        return False
+
+    for attempt in range(WRITE_MAX_RETRIES + 1):
         try:
-            # 更新ロックレコードはスキップ
-            if item.get('id') == UPDATE_LOCK_ID:
-                continue
-                
-            update_expression = 'SET current_price = :price, description = :desc, has_sale = :sale, points = :pts, updated_at = :upd'
-            expression_attribute_values = {
-                ':price': item['current_price'],
-                ':desc': item['description'],
-                ':sale': item['has_sale'],
-                ':pts': item['points'],
-                ':upd': current_time
-            }
-            
-            # 通知履歴があれば更新
-            if 'last_notification' in item:
-                update_expression += ', last_notification = :notif'
-                expression_attribute_values[':notif'] = item['last_notification']
-            
-            res = table.update_item(
+            client.update_item(
+                TableName=table_name,
                 Key={'id': item['id']},
                 UpdateExpression=update_expression,
-                ExpressionAttributeValues=expression_attribute_values,
-                ReturnValues='UPDATED_NEW'
+                ExpressionAttributeValues=expression_attribute_values
             )
+            item['sort_key'] = sort_key
+            if reindexed:
+                item['search_title'] = item['description']
+            snapshot_item(item)
+            return True
         except Exception as e:
+            if is_throttling_error(e) and attempt < WRITE_MAX_RETRIES:
+                backoff = min(WRITE_RETRY_MAX_SECONDS, WRITE_RETRY_BASE_SECONDS * (2 ** attempt))
+                time.sleep(random.uniform(backoff / 2, backoff))
+                continue
             logger.error(f"Failed to update item {item['id']}: {str(e)}")
+            return False
+
+def write_schedule_attributes(client, table_name, item):
+    """
+    変更のないアイテムのスケジューラー用属性（最終確認時刻・価格変動率）だけを書き込む
+    一覧に表示する値は変わらないため、リビジョンは加算しない
+    書き込みの間にAPIで削除されたアイテムは作り直さない
+    """
+    for attempt in range(WRITE_MAX_RETRIES + 1):
+        try:
+            client.update_item(
+                TableName=table_name,
+                Key={'id': item['id']},
+                UpdateExpression='SET last_checked_at = :checked, volatility = :vol',
+                ConditionExpression='attribute_exists(id)',
+                ExpressionAttributeValues={
+                    ':checked': item['last_checked_at'],
+                    ':vol': item.get('volatility', Decimal('0'))
+                }
+            )
+            snapshot_item(item)
+            return True
+        except Exception as e:
+            if is_throttling_error(e) and attempt < WRITE_MAX_RETRIES:
+                backoff = min(WRITE_RETRY_MAX_SECONDS, WRITE_RETRY_BASE_SECONDS * (2 ** attempt))
+                time.sleep(random.uniform(backoff / 2, backoff))
+                continue
+            if not is_conditional_check_failed(e):
+                logger.error(f"確認時刻の更新に失敗しました ({item['id']}): {str(e)}")
+            return False
+
+def update_item(table, items) -> Dict[str, int]:
+    """
+    変更のあったアイテムのみをDynamoDBに書き込む
+    書き込みは最大WRITE_CONCURRENCY件並列で行う
+    戻り値: {'written': 書き込み件数, 'skipped': 変更がなく省略した件数, 'failed': 失敗件数}
+    """
+    current_time = datetime.now().isoformat()
+    dirty_items = []
+    checked_items = []
+    skipped = 0
+
+    for item in items:
+        # 管理用レコードはスキップ
+        if is_system_record(item):
+            continue
+
+        if is_item_dirty(item):
+            dirty_items.append(item)
+        else:
+            skipped += 1
+            # 変更がなくても、確認した時刻はスケジューラーのために保存する
+            if item.get('last_checked_at') is not None and is_schedule_dirty(item):
+                checked_items.append(item)
+
+    # テーブルリソースはスレッドセーフではないため、スレッド間ではクライアントを共有する
+    client = table.meta.client
+    table_name = table.name
+    written = 0
+
+    if dirty_items:
+        with ThreadPoolExecutor(max_workers=max(1, min(WRITE_CONCURRENCY, len(dirty_items)))) as executor:
+            results = executor.map(lambda item: write_item(client, table_name, item, current_time), dirty_items)
+            written = sum(1 for result in results if result)
+
+    if checked_items:
+        with ThreadPoolExecutor(max_workers=max(1, min(WRITE_CONCURRENCY, len(checked_items)))) as executor:
+            list(executor.map(lambda item: write_schedule_attributes(client, table_name, item), checked_items))
+
+    # 一覧APIのキャッシュ（ETag）を無効にするため、書き込み後にリビジョンを加算する
+    if written:
+        bump_revision(table)
+
+    stats = {
+        'written': written,
+        'skipped': skipped,
+        'failed': len(dirty_items) - written
+    }
+    logger.info(f"DynamoDB書き込み結果: 書き込み {stats['written']}件, 省略 {stats['skipped']}件, 失敗 {stats['failed']}件")
+    return stats
 
 def parse_price(text):
     """テキストから価格（円）を抽出する（例: "￥653" -> 653）"""
@@ -209,37 +837,50 @@ def parse_points(text):
     point_match = re.search(r'([0-9,]+)\s*pt', text)
     return int(point_match.group(1).replace(',', '')) if point_match else 0
 
-def extract_price_and_points(soup):
+def extract_price_and_points_from_swatch(kindle_swatch):
     """
-    Amazonページから現在価格とポイント還元数を取得する。
+    Kindle版のフォーマットスワッチから現在価格とポイント還元数を取得する。
     Kindle Unlimited対象本は表示価格が「￥0」になるため、
     「または￥XXX (Xpt)で購入」に記載された実際の購入価格を取得する。
+    戻り値: (current_price, point_value)、取得できない場合はNone
+    """
+    slot_price_elem = kindle_swatch.select_one(".slot-price")
+    slot_price = parse_price(slot_price_elem.text) if slot_price_elem else None
+
+    # Kindle Unlimited対象（￥0表示）かどうかを判定
+    is_kindle_unlimited = kindle_swatch.select_one(".a-icon-kindle-unlimited") is not None
+
+    if is_kindle_unlimited or slot_price == 0:
+        # 「または￥XXX (Xpt)で購入」から実際の購入価格・ポイントを取得
+        extra_elem = kindle_swatch.select_one(".kindleExtraMessage")
+        if extra_elem:
+            purchase_price = parse_price(extra_elem.text)
+            purchase_points = parse_points(extra_elem.text)
+            if purchase_price is not None:
+                return purchase_price, purchase_points
+
+    # 通常表示の価格が取得できた場合はそれを使う
+    if slot_price is not None and slot_price > 0:
+        points_elem = kindle_swatch.select_one(".slot-buyingPoints")
+        point_value = parse_points(points_elem.text) if points_elem else 0
+        return slot_price, point_value
+
+    return None
+
+def extract_price_and_points(soup):
+    """
+    Amazonページから現在価格とポイント還元数を取得する。
+    Kindle版のフォーマットスワッチを優先し、取得できない場合は従来のセレクタを使う。
+    soupはselect_one()と.textを持つ文書オブジェクト（parse_htmlの戻り値）
     戻り値: (current_price, point_value)
     """
     # Kindle版のフォーマットスワッチを優先的に参照する
-    kindle_swatch = soup.select_one("#tmm-grid-swatch-KINDLE")
+    kindle_swatch = soup.select_one(f"#{KINDLE_SWATCH_ELEMENT_ID}")
 
     if kindle_swatch:
-        slot_price_elem = kindle_swatch.select_one(".slot-price")
-        slot_price = parse_price(slot_price_elem.text) if slot_price_elem else None
-
-        # Kindle Unlimited対象（￥0表示）かどうかを判定
-        is_kindle_unlimited = kindle_swatch.select_one(".a-icon-kindle-unlimited") is not None
-
-        if is_kindle_unlimited or slot_price == 0:
-            # 「または￥XXX (Xpt)で購入」から実際の購入価格・ポイントを取得
-            extra_elem = kindle_swatch.select_one(".kindleExtraMessage")
-            if extra_elem:
-                purchase_price = parse_price(extra_elem.text)
-                purchase_points = parse_points(extra_elem.text)
-                if purchase_price is not None:
-                    return purchase_price, purchase_points
-
-        # 通常表示の価格が取得できた場合はそれを使う
-        if slot_price is not None and slot_price > 0:
-            points_elem = kindle_swatch.select_one(".slot-buyingPoints")
-            point_value = parse_points(points_elem.text) if points_elem else 0
-            return slot_price, point_value
+        result = extract_price_and_points_from_swatch(kindle_swatch)
+        if result is not None:
+            return result
 
     # フォールバック: 従来のセレクタで取得
     current_price_elem = soup.select_one(".kindle-price .a-color-price")
@@ -252,25 +893,321 @@ def extract_price_and_points(soup):
 
     return current_price, point_value
 
-def get_kindle_info(item):
-    """Amazonページから本の情報を取得する"""
-    try:
-        response = requests.get(item, headers=HEADERS)
+def extract_title(soup):
+    """書籍タイトル（#productTitle）を取得する"""
+    title = soup.select_one(f"#{TITLE_ELEMENT_ID}") if soup is not None else None
+    return title.text.strip() if title else "タイトル不明"
+
+class _SelectolaxNode:
+    """selectolaxのノードをBeautifulSoup互換（select_one / text）で扱うためのラッパー"""
+
+    __slots__ = ('_node',)
+
+    def __init__(self, node):
+        self._node = node
+
+    @property
+    def text(self):
+        return self._node.text(deep=True)
+
+    def select_one(self, selector):
+        node = self._node.css_first(selector)
+        return _SelectolaxNode(node) if node is not None else None
+
+class _LxmlNode:
+    """lxml.htmlの要素をBeautifulSoup互換（select_one / text）で扱うためのラッパー"""
+
+    __slots__ = ('_element',)
+
+    def __init__(self, element):
+        self._element = element
+
+    @property
+    def text(self):
+        return self._element.text_content()
+
+    def select_one(self, selector):
+        elements = self._element.cssselect(selector)
+        return _LxmlNode(elements[0]) if elements else None
+
+def _parse_with_html_parser(html):
+    with init_timer('import_bs4'):
+        from bs4 import BeautifulSoup
+    return BeautifulSoup(html, 'html.parser')
+
+def _parse_with_bs4_lxml(html):
+    with init_timer('import_bs4'):
+        from bs4 import BeautifulSoup
+    return BeautifulSoup(html, 'lxml')
+
+def _parse_with_lxml(html):
+    import lxml.html
+    return _LxmlNode(lxml.html.document_fromstring(html))
+
+def _parse_with_selectolax(html):
+    from selectolax.lexbor import LexborHTMLParser
+    return _SelectolaxNode(LexborHTMLParser(html))
+
+# バックエンド名 -> (パース関数, 必要なモジュール)
+PARSER_BACKENDS = {
+    'html.parser': (_parse_with_html_parser, ('bs4',)),
+    'bs4-lxml': (_parse_with_bs4_lxml, ('bs4', 'lxml')),
+    'lxml': (_parse_with_lxml, ('lxml.html', 'cssselect')),
+    'selectolax': (_parse_with_selectolax, ('selectolax.lexbor',)),
+}
+
+@lru_cache(maxsize=None)
+def resolve_parser_backend(name):
+    """
+    利用可能なパーサーバックエンド名を返す
+    未知の名前や必要なライブラリが無い場合はhtml.parserにフォールバックする
+    """
+    if name not in PARSER_BACKENDS:
+        logger.warning(f"不明なHTMLパーサーバックエンドです: {name}。html.parserを使用します")
+        return 'html.parser'
+
+    for module_name in PARSER_BACKENDS[name][1]:
+        try:
+            importlib.import_module(module_name)
+        except ImportError:
+            logger.warning(f"HTMLパーサーバックエンド {name} に必要な {module_name} がありません。html.parserを使用します")
+            return 'html.parser'
+
+    return name
+
+def parse_html(html, backend=None):
+    """指定したバックエンドでHTMLをパースし、select_one()を持つ文書オブジェクトを返す"""
+    backend = resolve_parser_backend(backend or HTML_PARSER_BACKEND)
+    return PARSER_BACKENDS[backend][0](html)
+
+def slice_page_regions(html):
+    """価格判定に関係する領域（タイトル・Kindle版スワッチ）をHTML文字列から切り出す"""
+    return {element_id: slice_element_by_id(html, element_id) for element_id in FINGERPRINT_ELEMENT_IDS}
+
+def parse_kindle_page(html, regions=None, backend=None, preslice=None, allow_fallback=True):
+    """
+    商品ページからタイトル・現在価格・ポイント還元数を取得する
+    preslice有効時はKindle版スワッチとタイトルの断片だけをパースし、
+    スワッチから価格が取得できない場合のみページ全体をパースする
+    allow_fallback=Falseの場合（途中で打ち切ったページなど）、スワッチから価格が
+    取得できなければ従来のセレクタは使わずにNoneを返す
+    戻り値: (title, current_price, point_value)
+    """
+    if preslice is None:
+        preslice = HTML_PRESLICE
+
+    if preslice:
+        if regions is None:
+            regions = slice_page_regions(html)
+        swatch_html = regions.get(KINDLE_SWATCH_ELEMENT_ID)
+
+        if swatch_html:
+            kindle_swatch = parse_html(swatch_html, backend).select_one(f"#{KINDLE_SWATCH_ELEMENT_ID}")
+            result = extract_price_and_points_from_swatch(kindle_swatch) if kindle_swatch else None
+
+            if result is not None:
+                title_html = regions.get(TITLE_ELEMENT_ID)
+                title = extract_title(parse_html(title_html, backend) if title_html else None)
+                return (title,) + tuple(result)
+
+    soup = parse_html(html, backend)
+
+    if not allow_fallback:
+        kindle_swatch = soup.select_one(f"#{KINDLE_SWATCH_ELEMENT_ID}")
+        if not kindle_swatch or extract_price_and_points_from_swatch(kindle_swatch) is None:
+            return None
+
+    current_price, point_value = extract_price_and_points(soup)
+    return extract_title(soup), current_price, point_value
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session():
+    """
+    Amazonページ取得用の共有HTTPセッションを取得する
+    コネクションプールとKeep-Aliveを有効にし、ウォームスタート時は前回のセッションを再利用する
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            with init_timer('import_requests'):
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+            retry = Retry(
+                total=HTTP_MAX_RETRIES,
+                backoff_factor=HTTP_RETRY_BACKOFF,
+                status_forcelist=HTTP_RETRY_STATUSES,
+                allowed_methods=frozenset(['GET', 'HEAD']),
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_SIZE,
+                pool_maxsize=HTTP_POOL_SIZE,
+                max_retries=retry,
+                pool_block=True
+            )
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _http_session = session
+            logger.info(f"HTTPセッションを作成しました（プールサイズ: {HTTP_POOL_SIZE}）")
+        return _http_session
+
+@lru_cache(maxsize=None)
+def _element_id_pattern(element_id):
+    return re.compile(r'\bid=["\']' + re.escape(element_id) + r'["\']')
+
+@lru_cache(maxsize=None)
+def _tag_pattern(tag_name):
+    return re.compile(r'<(/?)' + re.escape(tag_name) + r'(?=[\s>/])', re.IGNORECASE)
+
+_TAG_NAME_PATTERN = re.compile(r'<([a-zA-Z][a-zA-Z0-9]*)')
+
+def slice_element_by_id(html, element_id):
+    """
+    HTML文字列から指定IDの要素（開始タグから対応する終了タグまで）を切り出す
+    パースは行わず、同名タグの入れ子を数えて範囲を特定する
+    要素が見つからない場合や閉じていない場合はNoneを返す
+    """
+    # 通常は id="..." 形式のため高速な文字列検索を先に試す
+    id_index = html.find(f'id="{element_id}"')
+    if id_index < 0:
+        id_match = _element_id_pattern(element_id).search(html)
+        if not id_match:
+            return None
+        id_index = id_match.start()
+
+    start = html.rfind('<', 0, id_index)
+    tag_match = _TAG_NAME_PATTERN.match(html, start) if start >= 0 else None
+    if not tag_match:
+        return None
+
+    depth = 0
+    for match in _tag_pattern(tag_match.group(1)).finditer(html, start):
+        if match.group(1):
+            depth -= 1
+            if depth == 0:
+                end = html.find('>', match.end())
+                return html[start:end + 1] if end >= 0 else None
+        else:
+            depth += 1
+
+    return None
+
+# 指紋計算時に残す属性はclassのみ（hrefのqid等、実行ごとに変わる値を除外する）
+_VOLATILE_ATTRIBUTE_PATTERN = re.compile(r'\s(?!class=)[\w:.-]+=(?:"[^"]*"|\'[^\']*\')')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def compute_page_fingerprint(regions, salt=''):
+    """
+    価格判定に関係する領域（slice_page_regionsの戻り値）から指紋を計算する
+    saltにはセール判定の閾値など、ページ以外で結果に影響する値を渡す
+    Kindle版スワッチが見つからない場合は従来のセレクタでページ全体を見るためNoneを返す
+    """
+    if regions.get(KINDLE_SWATCH_ELEMENT_ID) is None:
+        return None
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{FINGERPRINT_VERSION}|{salt}".encode('utf-8'))
+    for element_id in FINGERPRINT_ELEMENT_IDS:
+        region = regions.get(element_id)
+        normalized = _VOLATILE_ATTRIBUTE_PATTERN.sub('', region or '')
+        normalized = _WHITESPACE_PATTERN.sub(' ', normalized)
+        digest.update(b'|')
+        digest.update(normalized.encode('utf-8'))
+    return digest.hexdigest()
+
+def _stream_until_regions(response):
+    """
+    レスポンス本文をチャンク単位で読み、価格判定に必要な領域がすべて閉じた時点で打ち切る
+    戻り値: (html, truncated)
+    """
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    parts = []
+    tail = ''
+    markers_seen = False
+    swatch_marker = f'id="{KINDLE_SWATCH_ELEMENT_ID}"'
+
+    for chunk in response.iter_content(chunk_size=HTTP_STREAM_CHUNK_SIZE):
+        text = decoder.decode(chunk)
+        parts.append(text)
+
+        # スワッチの開始位置を受信するまでは連結せずにチャンク境界だけを確認する
+        if not markers_seen:
+            markers_seen = swatch_marker in tail + text
+            tail = (tail + text)[-len(swatch_marker):]
+            if not markers_seen:
+                continue
+
+        html = ''.join(parts)
+        parts = [html]
+        if all(slice_element_by_id(html, element_id) for element_id in FINGERPRINT_ELEMENT_IDS):
+            return html, True
+
+    parts.append(decoder.decode(b'', final=True))
+    return ''.join(parts), False
+
+def fetch_page_html(url, stream=None):
+    """
+    商品ページのHTMLを取得する
+    stream有効時はタイトルとKindle版スワッチを受信した時点で受信を打ち切る
+    （目印が見つからない場合はページ全体を読み込む）
+    戻り値: (html, truncated)
+    """
+    if stream is None:
+        stream = HTTP_STREAM_FETCH
+
+    session = get_http_session()
+    timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+    if not stream:
+        response = session.get(url, headers=HEADERS, timeout=timeout)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
+        return response.text, False
+
+    with session.get(url, headers=HEADERS, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        return _stream_until_regions(response)
+
+def get_kindle_info(item, previous_fingerprint=None, fingerprint_salt=''):
+    """
+    Amazonページから本の情報を取得する
+    ページ指紋がprevious_fingerprintと一致した場合はパースせずに unchanged=True を返す
+    """
+    try:
+        html, truncated = fetch_page_html(item)
+
+        regions = slice_page_regions(html)
+        fingerprint = compute_page_fingerprint(regions, fingerprint_salt)
+        if fingerprint is not None and fingerprint == previous_fingerprint:
+            return {
+                "unchanged": True,
+                "fingerprint": fingerprint,
+                "item": item
+            }
 
-        # 書籍タイトルを取得
-        title = soup.select_one("#productTitle")
-        title = title.text.strip() if title else "タイトル不明"
+        # タイトル・価格とポイント還元情報を取得（Kindle Unlimited対応）
+        parsed = parse_kindle_page(html, regions, allow_fallback=not truncated)
+        if parsed is None:
+            # スワッチから価格が取れず途中までのページでは判定できないため、全体を取得し直す
+            logger.info(f"ページ全体を再取得します: {item}")
+            html, _ = fetch_page_html(item, stream=False)
+            regions = slice_page_regions(html)
+            fingerprint = compute_page_fingerprint(regions, fingerprint_salt)
+            parsed = parse_kindle_page(html, regions)
 
-        # 価格とポイント還元情報を取得（Kindle Unlimited対応）
-        current_price, point_value = extract_price_and_points(soup)
+        title, current_price, point_value = parsed
 
         return {
             "title": title,
             "current_price": current_price,
             "list_price": current_price,
             "point_value": point_value,
+            "fingerprint": fingerprint,
             "item": item
         }
         
@@ -278,365 +1215,1085 @@ def get_kindle_info(item):
         logger.error(f"item {item} の処理中にエラーが発生: {e}")
         return None
 
-def calculate_discount_percentage(current_price, list_price, point_value):
-    """割引率を計算する (ポイント還元含む)"""
-    if not current_price or not list_price:
-        return 0
-    
-    # 型変換
-    current_price = float(current_price)
-    list_price = float(list_price)
-    point_value = float(point_value)
-    
-    effective_price = current_price - point_value
-    discount = list_price - effective_price
-    discount_percentage = (discount / list_price) * 100 if list_price > 0 else 0
-    
-    return discount_percentage
+def previous_effective_price(item):
+    """前回保存した実質価格（価格 - ポイント）を返す（価格がない・数値でない場合はNone）"""
+    last_price = item.get('current_price')
+    if last_price is None:
+        return None
+    try:
+        return float(last_price) - float(item.get('points', 0))
+    except (TypeError, ValueError):
+        return None
+
+def parse_notification_time(timestamp):
+    """ISO形式の通知日時をdatetimeに変換する（日時がない・解析できない場合はNone）"""
+    if not timestamp:
+        return None
+    try:
+        return datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return None
+
+def price_history_minimum(item, days, now):
+    """価格履歴から直近days日間の実質価格の最安値を返す（履歴がない場合はNone）"""
+    summary = summarize_price_history(decode_price_history(item.get('price_history')), days, now)
+    return summary['min'] if summary else None
+
+def decide_sales(rows, sale_percentage, sale_price, now):
+    """
+    アイテムごとの行 [(item, kindle_info), ...] について、まとめて割引率・セール判定・通知判定を行う
+    - 割引率: (定価 - 実質価格) / 定価（ポイント還元を含む。定価は現在価格と同じ値のため、実質的にはポイント還元率）
+    - セール: 割引率がsale_percentage以上、または価格がsale_price以下
+    - 通知: セール中で、NOTIFICATION_INTERVAL_DAYS以内に通知済みの場合は前回より実質価格が10%以上下がったときのみ
+      NOTIFY_BELOW_MIN_DAYSを設定した場合は、さらに実質価格がその期間の最安値以下のときのみ
+    通知間隔の基準時刻などは1回だけ求め、前回の値の変換（Decimal・ISO形式の日時・価格履歴）は
+    判定に必要なアイテムに限って行う
+    戻り値: (割引率のリスト, セール判定のリスト, 通知判定のリスト)
+    """
+    notification_cutoff = now - timedelta(days=NOTIFICATION_INTERVAL_DAYS)
+    history_days = NOTIFY_BELOW_MIN_DAYS
+    now_epoch = now.timestamp()
+
+    discounts = []
+    sales = []
+    notifications = []
+    for item, kindle_info in rows:
+        price = float(kindle_info['current_price'])
+        list_price = float(kindle_info['list_price'])
+        effective_price = price - float(kindle_info['point_value'] or 0)
+        discount = ((list_price - effective_price) / list_price) * 100 if price and list_price > 0 else 0
+        has_sale = discount >= sale_percentage or price <= sale_price
+
+        notify = has_sale
+        if notify:
+            # 実質価格が前回から10%以上下がっていなければ、通知間隔内に通知済みのものは再通知しない
+            previous = previous_effective_price(item)
+            if previous is not None and effective_price >= previous * 0.9:
+                notified_at = parse_notification_time(item.get('last_notification'))
+                notify = notified_at is None or notified_at <= notification_cutoff
+            if notify and history_days > 0:
+                minimum = price_history_minimum(item, history_days, now_epoch)
+                notify = minimum is None or effective_price <= minimum
+
+        discounts.append(discount)
+        sales.append(has_sale)
+        notifications.append(notify)
+    return discounts, sales, notifications
+
+class TokenBucket:
+    """
+    トークンバケット方式のレートリミッター
+    rate（トークン/秒）でトークンを補充し、最大capacity個まで貯められる
+    複数スレッドから同時に呼び出されても安全
+    """
+
+    def __init__(self, rate, capacity):
+        # rateが0以下だとトークンが補充されず、待ち時間も求められない
+        if not rate > 0:
+            raise ValueError(f"レート制限のrate（1秒あたりのリクエスト数）は0より大きい値を指定してください: {rate}")
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """トークンを1つ取得する（取得できるまで待機する）"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait_seconds = (1 - self._tokens) / self.rate
+
+            time.sleep(wait_seconds)
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def configure_rate_limit(host, rate, burst):
+    """ホストのレート制限を変更する（値が変わった場合のみバケットを作り直す）"""
+    with _rate_limiters_lock:
+        if HOST_RATE_LIMITS.get(host) == (rate, burst):
+            return
+        HOST_RATE_LIMITS[host] = (rate, burst)
+        _rate_limiters.pop(host, None)
+
+def get_rate_limiter(url):
+    """
+    URLのホストに対応するレートリミッターを取得する
+    amazon.co.jpのサブドメイン（www.など）は1つのバケットを共有する
+    """
+    host = (urlparse(url).hostname or '').lower()
+    if host == AMAZON_HOST or host.endswith('.' + AMAZON_HOST):
+        host = AMAZON_HOST
+
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(host)
+        if limiter is None:
+            rate, burst = HOST_RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT)
+            limiter = TokenBucket(rate, burst)
+            _rate_limiters[host] = limiter
+        return limiter
+
+def can_skip_unchanged(item):
+    """
+    ページに変化がない場合に処理を省略してよいかを判定する
+    セール中で通知間隔が経過している場合は再通知の判定が必要なため省略しない
+    """
+    if not item.get('page_fingerprint') or item.get('current_price') is None:
+        return False
+
+    if not item.get('has_sale'):
+        return True
+
+    # SaleIndexのキー（割引率）がないセール中のアイテムは、判定し直して書き込む
+    # （割引率の計算に必要な定価はアイテムに保存していないため、ページを取得する）
+    if item.get('sale_discount') is None:
+        return False
+
+    last_notification = item.get('last_notification')
+    if not last_notification:
+        return False
+
+    try:
+        elapsed = datetime.now() - datetime.fromisoformat(last_notification)
+    except (ValueError, TypeError):
+        return False
+
+    return elapsed < timedelta(days=NOTIFICATION_INTERVAL_DAYS)
+
+def get_sale_thresholds():
+    """セール判定の閾値（割引率, 価格）を環境変数から取得する"""
+    sale_percentage = float(os.environ.get('SALE_PERCENTAGE', '20'))
+    sale_price = int(os.environ.get('SALE_PRICE', '500'))
+    return sale_percentage, sale_price
+
+def fetch_kindle_info(item):
+    """ホストごとのレート制限に従ってAmazonページから本の情報を取得する"""
+    previous_fingerprint = item.get('page_fingerprint') if can_skip_unchanged(item) else None
+    fingerprint_salt = '|'.join(str(value) for value in get_sale_thresholds())
+
+    get_rate_limiter(item['url']).acquire()
+    return get_kindle_info(item['url'], previous_fingerprint, fingerprint_salt)
+
+def fetch_all_kindle_info(items):
+    """
+    アイテムのページを最大SCRAPER_CONCURRENCY件並列で取得する
+    結果はitemsと同じ順序で (item, kindle_info) として順次返す
+    """
+    if SCRAPER_CONCURRENCY <= 1:
+        for item in items:
+            yield item, fetch_kindle_info(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=SCRAPER_CONCURRENCY) as executor:
+        results = executor.map(fetch_kindle_info, items)
+        for item, kindle_info in zip(items, results):
+            yield item, kindle_info
+
+def _encode_varint(value, out):
+    """整数をzigzag符号化した可変長整数としてoutに追加する"""
+    value = (value << 1) ^ (value >> 63)
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _decode_varint(data, position):
+    """positionから可変長整数を1つ読み、(値, 次の位置)を返す"""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return (value >> 1) ^ -(value & 1), position
+        shift += 7
+
+def encode_price_history(entries):
+    """価格履歴 [(時刻(UNIX秒), 価格, ポイント), ...] をバイナリに符号化する"""
+    out = bytearray([PRICE_HISTORY_VERSION])
+    previous = (0, 0, 0)
+    for observed_at, price, points in entries:
+        current = (int(observed_at) // 60, int(price), int(points))
+        for value, last in zip(current, previous):
+            _encode_varint(value - last, out)
+        previous = current
+    return bytes(out)
+
+def decode_price_history(data):
+    """
+    バイナリの価格履歴を [(時刻(UNIX秒), 価格, ポイント), ...] に復号する（kindle_items.pyと同じ形式）
+    履歴がない場合や未対応のバージョンの場合は空のリストを返す
+    """
+    # DynamoDBから読んだ値はBinary型のため、中身のbytesを取り出す
+    data = bytes(getattr(data, 'value', data) or b'')
+    if not data or data[0] != PRICE_HISTORY_VERSION:
+        return []
+
+    entries = []
+    minutes = price = points = 0
+    position = 1
+    while position < len(data):
+        delta, position = _decode_varint(data, position)
+        minutes += delta
+        delta, position = _decode_varint(data, position)
+        price += delta
+        delta, position = _decode_varint(data, position)
+        points += delta
+        entries.append((minutes * 60, price, points))
+    return entries
+
+def append_price_history(item, observed_at, current_price, point_value):
+    """
+    価格またはポイントが前回の変化点から変わった場合のみ、価格履歴に変化点を追記する
+    上限を超えた場合は古い変化点から削除する
+    """
+    entries = decode_price_history(item.get('price_history'))
+    price = int(round(float(current_price)))
+    points = int(round(float(point_value or 0)))
+    if entries and entries[-1][1:] == (price, points):
+        return
+    entries.append((observed_at, price, points))
+    item['price_history'] = encode_price_history(entries[-PRICE_HISTORY_MAX_ENTRIES:])
+
+def summarize_price_history(entries, days, now=None):
+    """
+    直近days日間の実質価格（価格 - ポイント）の最安値・最高値・中央値を求める（kindle_items.pyと同じ処理）
+    各変化点の値は次の変化点まで続いたものとし、中央値は継続時間で重み付けする
+    期間内の値がない場合はNoneを返す
+    """
+    now = now if now is not None else time.time()
+    window_start = now - days * 86400
+    values = []
+    for index, (observed_at, price, points) in enumerate(entries):
+        ended_at = entries[index + 1][0] if index + 1 < len(entries) else now
+        if ended_at < window_start:
+            continue
+        values.append((price - points, max(1, ended_at - max(observed_at, window_start))))
+    if not values:
+        return None
+
+    values.sort()
+    half = sum(weight for _, weight in values) / 2
+    accumulated = 0
+    for value, weight in values:
+        accumulated += weight
+        if accumulated >= half:
+            median = value
+            break
+    return {'min': values[0][0], 'max': values[-1][0], 'median': median, 'change_points': len(values)}
+
+def record_observation(item, current_price=None, point_value=None):
+    """
+    スケジューラー用に、今回確認した時刻と、前回からの実質価格の変化率で更新した価格変動率（指数移動平均）をアイテムに記録する
+    価格が取得できなかった場合やページに変化がない場合は変化率0とする
+    """
+    change = 0.0
+    last_price = item.get('current_price')
+    if current_price is not None and last_price is not None:
+        last_effective_price = float(last_price) - float(item.get('points') or 0)
+        current_effective_price = float(current_price) - float(point_value or 0)
+        if last_effective_price > 0:
+            change = abs(current_effective_price - last_effective_price) / last_effective_price
+
+    normalized_change = min(1.0, change / VOLATILITY_FULL_SCALE_CHANGE)
+    volatility = (1 - VOLATILITY_ALPHA) * float(item.get('volatility') or 0) + VOLATILITY_ALPHA * normalized_change
+    item['last_checked_at'] = int(time.time())
+    item['volatility'] = Decimal(str(round(volatility, 4)))
+
+def evaluate_items(results, sale_percentage, sale_price):
+    """
+    取得した情報 [(item, kindle_info), ...] でアイテムを更新し、通知対象のセール情報のリストを返す
+    割引率・セール・通知の判定は、価格を取得できたアイテムをまとめて行う（decide_sales）
+    """
+    rows = []
+    for item, kindle_info in results:
+        if not kindle_info:
+            continue
+
+        if kindle_info.get("unchanged"):
+            # 前回から価格関連の領域に変化がないため、判定と保存を省略する
+            logger.info(f"変更なし: {item.get('description') or kindle_info['item']}")
+            record_observation(item)
+            # 価格履歴がまだないアイテムは、保存済みの価格を最初の変化点とする
+            if not item.get('price_history'):
+                append_price_history(item, int(time.time()), item['current_price'], item.get('points'))
+            continue
+
+        if kindle_info["current_price"] is None or kindle_info["list_price"] is None:
+            logger.info(f"価格情報を取得できませんでした: {kindle_info['title']}")
+            record_observation(item)
+            continue
+
+        rows.append((item, kindle_info))
+
+    if not rows:
+        return []
+
+    now = datetime.now()
+    discounts, sales, notifications = decide_sales(rows, sale_percentage, sale_price, now)
+
+    sale_items = []
+    observed_at = int(time.time())
+    for (item, kindle_info), discount_percentage, has_sale, notify in zip(rows, discounts, sales, notifications):
+        current_price = kindle_info["current_price"]
+        list_price = kindle_info["list_price"]
+        point_value = kindle_info["point_value"]
+        # 履歴と変化率は前回の値と比べるため、アイテムを更新する前に記録する
+        record_observation(item, current_price, point_value)
+        append_price_history(item, observed_at, current_price, point_value)
+
+        if has_sale:
+            logger.info(f"タイトル: {kindle_info['title']}, item: {kindle_info['item']}")
+            if notify:
+                sale_items.append({
+                    "id": item['id'],
+                    "title": kindle_info['title'],
+                    "current_price": current_price,
+                    "list_price": list_price,
+                    "point_value": point_value,
+                    "effective_price": current_price - point_value,
+                    "discount_percentage": discount_percentage,
+                    "item": kindle_info['item']
+                })
+            else:
+                logger.info(f"最近通知済みか最安値を上回っているため通知をスキップします: {kindle_info['title']}")
+        else:
+            logger.info(f"タイトル: {kindle_info['title']}")
+
+        # 取得した情報を格納
+        item['current_price'] = current_price
+        item['description'] = kindle_info['title']
+        item['has_sale'] = has_sale
+        item['points'] = point_value
+        # SaleIndexのソートキー（セール中でなければ削除する）
+        item['sale_discount'] = Decimal(str(round(discount_percentage, 1))) if has_sale else None
+        if kindle_info.get('fingerprint'):
+            item['page_fingerprint'] = kindle_info['fingerprint']
+
+    return sale_items
+
+def check_kindle_sales(items, table, shuffle=True):
+    """セール情報を確認し、条件に合うものを通知する"""
+    sale_percentage, sale_price = get_sale_thresholds()
+
+    # 対象の配列をシャッフル（チェックポイント実行時は呼び出し側で順序を決める）
+    if shuffle:
+        random.shuffle(items)
+
+    # Amazonへのリクエスト間隔はホストごとのレートリミッターで制御する
+    # 取得が終わったアイテムをまとめて判定する
+    sale_items = evaluate_items(list(fetch_all_kindle_info(items)), sale_percentage, sale_price)
+
+    # 通知は送信せずにアウトボックスへ登録する（アイテムを保存する前に登録し、登録できたものに通知日時を記録する）
+    return enqueue_notifications(table, items, sale_items)
+
+TEXT_MESSAGE_HEADER = "📚 Kindleセール情報 📚\n\n"
+
+def format_text_item(item):
+    """テキストメッセージ用にセール情報1件を整形する"""
+    return (
+        f"{item['title']}\n"
+        f"定価：¥{item['list_price']:,}、現在価格：¥{item['current_price']:,}\n"
+        f"ポイント：{item['point_value']}pt（{item['discount_percentage']:.1f}%オフ）\n"
+        f"{item['item']}\n\n"
+    )
+
+# カルーセルのJSONのうちバブル以外の部分
+CAROUSEL_JSON_PREFIX = '{"type": "carousel", "contents": ['
+CAROUSEL_JSON_SUFFIX = ']}'
+
+class FlexTemplate:
+    """
+    Flex Messageのレイアウトを一度だけJSON文字列の断片に変換しておき、アイテムごとにスロットを埋めてJSONを作るテンプレート
+    レイアウト中の "{{名前}}" という文字列がスロットになる
+    JSONはline-bot-sdkが送信するのと同じ形式（ASCIIエスケープ）で作るため、文字列の長さがそのままバイト数になる
+    """
+    SLOT_PATTERN = re.compile(r'"\{\{(\w+)\}\}"')
+
+    def __init__(self, layout):
+        parts = self.SLOT_PATTERN.split(json.dumps(layout))
+        # splitの結果は偶数番目が固定部分、奇数番目がスロット名
+        self.segments = parts[0::2]
+        self.slots = parts[1::2]
+        self.static_size = sum(len(segment) for segment in self.segments)
+
+    def encode(self, values):
+        """スロットの値をJSONに変換する（戻り値はスロット名から変換後の文字列への辞書）"""
+        return {name: json.dumps(values[name]) for name in set(self.slots)}
+
+    def size(self, encoded):
+        """スロットを埋めた後のJSONのバイト数"""
+        return self.static_size + sum(len(encoded[name]) for name in self.slots)
+
+    def render(self, encoded):
+        """スロットを埋めたJSON文字列を作る"""
+        parts = [None] * (len(self.segments) + len(self.slots))
+        parts[0::2] = self.segments
+        parts[1::2] = [encoded[name] for name in self.slots]
+        return ''.join(parts)
+
+def build_flex_bubble_layout(include_details=True):
+    """
+    セール情報1件分のバブルのレイアウト（スロット付き）を作成する
+    include_detailsがFalseの場合は省略可能な行（定価・ポイント）を除く
+    """
+    list_price_row = {
+        "type": "box",
+        "layout": "baseline",
+        "contents": [
+            {
+                "type": "text",
+                "text": "定価",
+                "color": "#999999",
+                "size": "sm",
+                "flex": 1
+            },
+            {
+                "type": "text",
+                "text": "{{list_price}}",
+                "color": "#999999",
+                "size": "sm",
+                "decoration": "line-through",
+                "flex": 2
+            }
+        ]
+    }
+    current_price_row = {
+        "type": "box",
+        "layout": "baseline",
+        "contents": [
+            {
+                "type": "text",
+                "text": "現在価格",
+                "color": "#333333",
+                "size": "sm",
+                "flex": 1
+            },
+            {
+                "type": "text",
+                "text": "{{current_price}}",
+                "color": "#333333",
+                "size": "sm",
+                "flex": 2
+            }
+        ]
+    }
+    points_row = {
+        "type": "box",
+        "layout": "baseline",
+        "contents": [
+            {
+                "type": "text",
+                "text": "ポイント",
+                "color": "#333333",
+                "size": "sm",
+                "flex": 1
+            },
+            {
+                "type": "text",
+                "text": "{{points}}",
+                "color": "#333333",
+                "size": "sm",
+                "flex": 2
+            }
+        ]
+    }
+    effective_price_row = {
+        "type": "box",
+        "layout": "baseline",
+        "contents": [
+            {
+                "type": "text",
+                "text": "実質価格",
+                "color": "#DD3333",
+                "size": "sm",
+                "weight": "bold",
+                "flex": 1
+            },
+            {
+                "type": "text",
+                "text": "{{effective_price}}",
+                "color": "#DD3333",
+                "size": "sm",
+                "weight": "bold",
+                "flex": 2
+            }
+        ]
+    }
+    if include_details:
+        price_rows = [list_price_row, current_price_row, points_row, effective_price_row]
+    else:
+        price_rows = [current_price_row, effective_price_row]
+
+    return {
+        "type": "bubble",
+        "header": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "text",
+                    "text": "{{discount}}",
+                    "color": "#ffffff",
+                    "weight": "bold",
+                    "size": "xl"
+                }
+            ],
+            "backgroundColor": "#DD3333"
+        },
+        "body": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "text",
+                    "text": "{{title}}",
+                    "weight": "bold",
+                    "size": "md",
+                    "wrap": True,
+                    "maxLines": 2
+                },
+                {
+                    "type": "box",
+                    "layout": "vertical",
+                    "margin": "lg",
+                    "contents": price_rows
+                }
+            ]
+        },
+        "footer": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "button",
+                    "style": "primary",
+                    "action": {
+                        "type": "uri",
+                        "label": "商品を見る",
+                        "uri": "{{url}}"
+                    }
+                }
+            ]
+        }
+    }
+
+FLEX_BUBBLE_TEMPLATE = FlexTemplate(build_flex_bubble_layout())
+FLEX_BUBBLE_COMPACT_TEMPLATE = FlexTemplate(build_flex_bubble_layout(include_details=False))
+
+def flex_bubble_values(item, title):
+    """バブルのスロットに埋める値"""
+    return {
+        "discount": f"{item['discount_percentage']:.1f}%オフ",
+        "title": title,
+        "list_price": f"¥{item['list_price']:,}",
+        "current_price": f"¥{item['current_price']:,}",
+        "points": f"{item['point_value']}pt",
+        "effective_price": f"¥{item['effective_price']:,}",
+        "url": item['item']
+    }
+
+def render_flex_bubble(item):
+    """
+    セール情報1件分のバブルのJSON文字列をFLEX_BUBBLE_MAX_BYTES以内で作成する
+    タイトルはFLEX_TITLE_MAX_CHARS文字（2行表示で見える長さ）に切り詰め、上限を超える場合は
+    FLEX_TITLE_MIN_CHARS文字まで短くし、それでも超える場合は定価・ポイントの行を省略する
+    上限内に収まらない場合はNoneを返す
+    """
+    title = item['title']
+    if len(title) > FLEX_TITLE_MAX_CHARS:
+        title = title[:FLEX_TITLE_MAX_CHARS - 1] + '…'
+    encoded = FLEX_BUBBLE_TEMPLATE.encode(flex_bubble_values(item, title))
+    if FLEX_BUBBLE_TEMPLATE.size(encoded) <= FLEX_BUBBLE_MAX_BYTES:
+        return FLEX_BUBBLE_TEMPLATE.render(encoded)
+
+    if len(title) > FLEX_TITLE_MIN_CHARS:
+        encoded['title'] = json.dumps(title[:FLEX_TITLE_MIN_CHARS - 1] + '…')
+        if FLEX_BUBBLE_TEMPLATE.size(encoded) <= FLEX_BUBBLE_MAX_BYTES:
+            return FLEX_BUBBLE_TEMPLATE.render(encoded)
+
+    if FLEX_BUBBLE_COMPACT_TEMPLATE.size(encoded) <= FLEX_BUBBLE_MAX_BYTES:
+        return FLEX_BUBBLE_COMPACT_TEMPLATE.render(encoded)
+    return None
+
+def create_flex_carousel(bubble_jsons):
+    """バブルのJSON文字列をつないだカルーセルを作成する"""
+    return json.loads(CAROUSEL_JSON_PREFIX + ', '.join(bubble_jsons) + CAROUSEL_JSON_SUFFIX)
+
+def get_line_recipients():
+    """通知先のユーザーID一覧（LINE_USER_IDSがなければLINE_USER_ID）"""
+    if LINE_USER_IDS:
+        return LINE_USER_IDS
+    return [LINE_USER_ID] if LINE_USER_ID else []
+
+def pack_carousels(bubble_jsons):
+    """
+    バブルのJSON文字列を順番に、LINE_CAROUSEL_MAX_BUBBLES件・LINE_CAROUSEL_MAX_BYTES以内のカルーセルに詰める
+    戻り値: (カルーセルごとのバブルの添字のリスト, 作成できなかった（None）・1件でも上限を超えるバブルの添字のリスト)
+    """
+    empty_size = len(CAROUSEL_JSON_PREFIX) + len(CAROUSEL_JSON_SUFFIX)
+    carousels = []
+    oversized = []
+    current = []
+    current_size = empty_size
+    for index, bubble_json in enumerate(bubble_jsons):
+        size = len(bubble_json) if bubble_json is not None else None
+        if size is None or empty_size + size > LINE_CAROUSEL_MAX_BYTES:
+            oversized.append(index)
+            continue
+        # 2件目以降は区切りの ", " の分も加える
+        added_size = size + (2 if current else 0)
+        if current and (len(current) >= LINE_CAROUSEL_MAX_BUBBLES or current_size + added_size > LINE_CAROUSEL_MAX_BYTES):
+            carousels.append(current)
+            current = []
+            current_size = empty_size
+            added_size = size
+        current.append(index)
+        current_size += added_size
+    if current:
+        carousels.append(current)
+    return carousels, oversized
+
+def format_text_messages(sale_items):
+    """
+    テキストメッセージを1件あたりLINE_TEXT_MAX_CHARS文字以内に分けて整形する（Flex Messageが使えない場合用）
+    戻り値: [(メッセージ, そのメッセージに含めたアイテム), ...]
+    """
+    groups = []
+    current, current_items = TEXT_MESSAGE_HEADER, []
+    for item in sale_items:
+        text = format_text_item(item)
+        if current_items and len(current) + len(text) > LINE_TEXT_MAX_CHARS:
+            groups.append((current, current_items))
+            current, current_items = TEXT_MESSAGE_HEADER, []
+        current += text
+        current_items.append(item)
+    groups.append((current, current_items))
+    return [({"type": "text", "text": text.rstrip()[:LINE_TEXT_MAX_CHARS]}, items) for text, items in groups]
+
+def build_line_messages(sale_items):
+    """
+    送信するメッセージを作成する（先頭に件数のテキスト、続けて上限内に分割したカルーセル）
+    戻り値: [(メッセージ, そのメッセージに含めたアイテム), ...]
+    （件数のテキストは全アイテムを含むものとし、Flex Messageを送れない場合は含めたアイテムをテキストで送る）
+    """
+    messages = [({"type": "text", "text": f"📚 {len(sale_items)}冊のKindleセール本が見つかりました！"}, sale_items)]
+
+    bubble_jsons = [render_flex_bubble(item) for item in sale_items]
+    carousels, oversized = pack_carousels(bubble_jsons)
+    for page, indices in enumerate(carousels, 1):
+        carousel_items = [sale_items[index] for index in indices]
+        contents = create_flex_carousel([bubble_jsons[index] for index in indices])
+        alt_text = 'Kindleセール情報' if len(carousels) == 1 else f'Kindleセール情報 ({page}/{len(carousels)})'
+        messages.append(({"type": "flex", "altText": alt_text, "contents": contents}, carousel_items))
+
+    # バブルを作成できない・1件でもカルーセルに収まらないアイテムはテキストで送る
+    if oversized:
+        messages.extend(format_text_messages([sale_items[index] for index in oversized]))
+    return messages
+
+@lru_cache(maxsize=1)
+def get_line_bot_api():
+    """line-bot-sdkのクライアント（ウォームスタート時は再利用する）"""
+    with init_timer('import_linebot'):
+        from linebot import LineBotApi
+    return LineBotApi(LINE_CHANNEL_ACCESS_TOKEN)
+
+def to_sdk_message(message):
+    """メッセージのJSON（dict）をline-bot-sdkのメッセージに変換する"""
+    with init_timer('import_linebot'):
+        from linebot.models import FlexSendMessage, TextSendMessage
+    if message['type'] == 'flex':
+        return FlexSendMessage(alt_text=message['altText'], contents=message['contents'])
+    return TextSendMessage(text=message['text'])
+
+def send_line_request_sdk(recipients, messages, retry_key=None):
+    """line-bot-sdkで送信する（宛先が1件ならpush、複数ならmulticast、retry_keyはX-Line-Retry-Keyとして送る）"""
+    line_bot_api = get_line_bot_api()
+    sdk_messages = [to_sdk_message(message) for message in messages]
+    if len(recipients) == 1:
+        line_bot_api.push_message(recipients[0], sdk_messages, retry_key=retry_key)
+    else:
+        line_bot_api.multicast(recipients, sdk_messages, retry_key=retry_key)
+
+_line_stub_requests = []
+
+def send_line_request_stub(recipients, messages, retry_key=None):
+    """
+    LINEに送信せず、送信内容を記録する（テスト・ローカル検証用の代替送信先）
+    LINEと同様に、受付済みの再試行キーのリクエストは記録しない
+    """
+    if retry_key is not None and any(request['retry_key'] == retry_key for request in _line_stub_requests):
+        logger.info(f"LINE送信（stub）: 受付済みの再試行キーのため記録しません: {retry_key}")
+        return
+    _line_stub_requests.append({'to': list(recipients), 'messages': messages, 'retry_key': retry_key})
+    logger.info(f"LINE送信（stub）: 宛先{len(recipients)}件, メッセージ{len(messages)}件")
+
+LINE_CLIENTS = {
+    'sdk': send_line_request_sdk,
+    'stub': send_line_request_stub
+}
+
+def is_retryable_line_error(error):
+    """再試行すべきLINE APIのエラー（429・5xx、またはHTTPステータスのない通信エラー）かどうか"""
+    status_code = getattr(error, 'status_code', None)
+    if status_code is None:
+        return not isinstance(error, (TypeError, ValueError, KeyError))
+    return status_code == 429 or status_code >= 500
+
+def line_request_retry_key(retry_key, recipients, batch):
+    """
+    送信全体の再試行キー（UUID）から、1回分のリクエストの再試行キーを決定的に求める
+    リクエスト内の位置ではなく、宛先と、各メッセージの種類・含むアウトボックスのエントリID（ソート済み）から求める
+    （取得件数や宛先が変わって送り直すリクエストの内容が変わった場合は、別のキーになる）
+    """
+    if retry_key is None:
+        return None
+    parts = [','.join(sorted(recipients))]
+    parts.extend(
+        f"{message['type']}:{','.join(sorted(outbox_entry_id(item) for item in items))}"
+        for message, items in batch
+    )
+    return str(uuid.uuid5(uuid.UUID(retry_key), '/'.join(parts)))
+
+def send_line_request(client, recipients, messages, retry_key=None):
+    """
+    1回分（最大LINE_MESSAGES_PER_REQUEST件）のメッセージを送信する（429・5xxは指数バックオフで再試行する）
+    再試行には同じretry_keyを使うため、タイムアウトしたリクエストが届いていても重複して配信されない
+    """
+    for attempt in range(LINE_MAX_RETRIES + 1):
+        try:
+            client(recipients, messages, retry_key)
+            return
+        except Exception as e:
+            if retry_key is not None and getattr(e, 'status_code', None) == 409:
+                # 同じ再試行キーのリクエストを受付済み（以前の送信で届いている）
+                logger.info(f"受付済みのリクエストのため送信を省略します: {retry_key}")
+                return
+            if not is_retryable_line_error(e) or attempt >= LINE_MAX_RETRIES:
+                raise
+            backoff = min(LINE_RETRY_MAX_SECONDS, LINE_RETRY_BASE_SECONDS * (2 ** attempt))
+            logger.warning(f"LINE送信を再試行します（{attempt + 1}回目）: {str(e)}")
+            time.sleep(random.uniform(backoff / 2, backoff))
+
+def deliver_line_batch(client, recipients, batch, retry_key=None):
+    """
+    1回分のメッセージを送信し、送れなかった場合はFlex Messageを同じアイテムのテキストに置き換えて送り直す
+    retry_keyは送信全体の再試行キーで、リクエストごとの再試行キーはline_request_retry_keyで求める
+    戻り値: 送信できたかどうか
+    """
+    try:
+        send_line_request(
+            client, recipients, [message for message, _ in batch],
+            line_request_retry_key(retry_key, recipients, batch)
+        )
+        return True
+    except Exception as e:
+        logger.warning(f"LINE送信エラー: {str(e)}")
+
+    fallback = []
+    for message, items in batch:
+        if message['type'] == 'flex':
+            fallback.extend(format_text_messages(items))
+        else:
+            fallback.append((message, items))
+    try:
+        for start in range(0, len(fallback), LINE_MESSAGES_PER_REQUEST):
+            fallback_batch = fallback[start:start + LINE_MESSAGES_PER_REQUEST]
+            send_line_request(
+                client, recipients, [message for message, _ in fallback_batch],
+                line_request_retry_key(retry_key, recipients, fallback_batch)
+            )
+        return True
+    except Exception as e:
+        logger.error(f"LINEのテキスト送信でもエラーが発生: {str(e)}")
+        return False
+
+def get_line_client(client=None):
+    """
+    送信に使うクライアント（指定がなければLINE_CLIENT_MODEで選ぶ）を返す
+    宛先、またはLINEに送信する場合のChannel Access Tokenが設定されていなければNoneを返す
+    """
+    if client is None:
+        client = LINE_CLIENTS.get(LINE_CLIENT_MODE, send_line_request_sdk)
+    if not get_line_recipients() or (client is send_line_request_sdk and not LINE_CHANNEL_ACCESS_TOKEN):
+        logger.warning("LINE Channel Access TokenまたはUser IDが設定されていません。通知は送信されません。")
+        return None
+    return client
+
+def send_line_message(sale_items, client=None, retry_key=None):
+    """
+    LINE Messaging APIで通知を送信する
+    メッセージを上限内のカルーセルに分割し、LINE_MESSAGES_PER_REQUEST件ずつ、宛先ごと（multicastは500件ずつ）に並列で送信する
+    件数のテキストが先頭に届くよう、各宛先の最初の送信を済ませてから残りを送信する
+    retry_key（UUID文字列）を指定した場合は、各リクエストにそこから求めた再試行キーを付ける
+    （同じセール情報を同じキーで送り直しても、受付済みのリクエストは重複して配信されない）
+    戻り値: すべて送信できた場合True
+    """
+    recipients = get_line_recipients()
+    client = get_line_client(client)
+    if client is None:
+        return False
+
+    if not sale_items:
+        # セール商品がない場合は通知しない
+        logger.info("セール商品がないため、通知は送信されません")
+        return True
+
+    messages = build_line_messages(sale_items)
+    batches = [messages[start:start + LINE_MESSAGES_PER_REQUEST] for start in range(0, len(messages), LINE_MESSAGES_PER_REQUEST)]
+    recipient_groups = [
+        recipients[start:start + LINE_MULTICAST_MAX_RECIPIENTS]
+        for start in range(0, len(recipients), LINE_MULTICAST_MAX_RECIPIENTS)
+    ]
+    logger.info(f"LINE通知: {len(sale_items)}件を{len(messages)}メッセージ・{len(batches)}回に分けて{len(recipients)}人に送信します")
+
+    delivered = True
+    phases = [batches[:1], batches[1:]]
+    with ThreadPoolExecutor(max_workers=max(1, LINE_SEND_CONCURRENCY)) as executor:
+        for phase in phases:
+            futures = [
+                executor.submit(deliver_line_batch, client, group, batch, retry_key)
+                for group in recipient_groups for batch in phase
+            ]
+            for future in as_completed(futures):
+                delivered = future.result() and delivered
+    return delivered
+
+def outbox_entry_id(sale_item):
+    """アウトボックスのエントリID（同じアイテム・同じ実質価格の通知は1件にまとめる）"""
+    effective_price = _decimal_default(Decimal(str(sale_item['effective_price'])))
+    return f"{OUTBOX_PREFIX}{sale_item['id']}#{effective_price}"
+
+def enqueue_notifications(table, items, sale_items):
+    """
+    通知対象のセール情報をアウトボックスに送信待ちとして登録し、登録済みのアイテムに通知日時を記録する
+    同じキーのエントリが送信待ち、またはNOTIFICATION_INTERVAL_DAYS以内に作成済みの場合は登録しない
+    アイテムより先にエントリを書き込むため、途中で失敗しても通知日時だけが保存されることはなく、
+    次回の実行で同じキーに登録し直される（登録済みであれば重複しない）
+    戻り値: 新たに登録したセール情報のリスト
+    """
+    items_by_id = {item['id']: item for item in items}
+    notified_at = datetime.now().isoformat()
+    current_time = datetime.utcnow()
+    created_at = current_time.isoformat() + 'Z'
+    cutoff = (current_time - timedelta(days=NOTIFICATION_INTERVAL_DAYS)).isoformat() + 'Z'
+
+    enqueued = []
+    for sale_item in sale_items:
+        try:
+            table.put_item(
+                Item={
+                    'id': outbox_entry_id(sale_item),
+                    'item_id': sale_item['id'],
+                    'payload': json.dumps(sale_item, default=_decimal_default, ensure_ascii=False),
+                    'created_at': created_at,
+                    'attempts': 0,
+                    'outbox_pk': OUTBOX_PENDING_VALUE,
+                    'outbox_sk': f"{created_at}#{sale_item['id']}"
+                },
+                ConditionExpression='attribute_not_exists(id) OR (attribute_not_exists(outbox_pk) AND created_at < :cutoff)',
+                ExpressionAttributeValues={':cutoff': cutoff}
+            )
+            enqueued.append(sale_item)
+        except Exception as e:
+            if not is_conditional_check_failed(e):
+                # 登録できなかったアイテムは通知日時を記録せず、次回の実行で判定し直す
+                logger.error(f"アウトボックスへの登録でエラーが発生: {sale_item['title']}: {str(e)}")
+                continue
+            logger.info(f"同じ価格の通知が登録済みのためスキップします: {sale_item['title']}")
+
+        items_by_id[sale_item['id']]['last_notification'] = notified_at
+
+    if enqueued:
+        logger.info(f"アウトボックスに{len(enqueued)}件の通知を登録しました")
+    return enqueued
+
+def claim_outbox_entries(table, limit, delivery_key):
+    """
+    送信待ちのエントリを作成順に最大limit件取得し、OUTBOX_LEASE_SECONDSの間ほかの送信処理から取得されないようにする
+    取得中のエントリはフィルターで除き、limit件を取得できるかインデックスの末尾に達するまで続きを読む
+    以前の送信で再試行キー（delivery_key）が割り当てられたエントリはそのキーを引き継ぎ、新しいエントリにはdelivery_keyを割り当てる
+    """
+    now = int(time.time())
+    query_kwargs = {
+        'IndexName': OUTBOX_INDEX_NAME,
+        'KeyConditionExpression': 'outbox_pk = :pending',
+        'FilterExpression': 'attribute_not_exists(claimed_until) OR claimed_until < :now',
+        'ExpressionAttributeValues': {':pending': OUTBOX_PENDING_VALUE, ':now': now},
+        'Limit': limit
+    }
 
-def should_notify(item, current_price, point_value):
-    """通知すべきかどうかを判断する（1週間以内に通知済みかと割引率のチェック）"""
-    # 1. 前回の通知日時をチェック
-    should_send = True
-    last_notification = item.get('last_notification')
-    
-    if last_notification:
-        # ISO形式の文字列をdatetimeオブジェクトに変換
-        try:
-            last_notification_date = datetime.fromisoformat(last_notification)
-            now = datetime.now()
-            elapsed_days = (now - last_notification_date).total_seconds() / (24 * 3600)
-            
-            logger.info(f"アイテム「{item.get('description', 'Unknown')}」の前回通知からの経過日数: {elapsed_days:.1f}日")
-            
-            # 1週間以内の通知はスキップの対象に
-            if elapsed_days < NOTIFICATION_INTERVAL_DAYS:
-                # 前回と今回の価格を比較
-                last_price = item.get('current_price')
-                last_points = item.get('points', 0)
-                
-                if last_price is not None and current_price is not None:
-                    # 型変換 (DynamoDBから取得した数値はDecimal型の場合がある)
-                    # decimal.Decimal型をfloatに変換する
-                    if hasattr(last_price, 'to_eng_string'):  # Decimalかどうかを確認
-                        last_price = float(last_price)
-                    else:
-                        last_price = float(last_price)
-                        
-                    if hasattr(last_points, 'to_eng_string'):  # Decimalかどうかを確認
-                        last_points = float(last_points)
-                    else:
-                        last_points = float(last_points)
-                    
-                    # 実質価格の計算（すべてfloatに変換）
-                    last_effective_price = float(last_price) - float(last_points)
-                    current_effective_price = float(current_price) - float(point_value)
-                    
-                    price_diff_percentage = ((last_effective_price - current_effective_price) / last_effective_price) * 100 if last_effective_price > 0 else 0
-                    
-                    logger.info(f"価格比較: 前回={last_effective_price}円（実質）, 今回={current_effective_price}円（実質）, 変化率={price_diff_percentage:.1f}%")
-                    
-                    # 実質価格が前回より10%以上安くなった場合のみ再通知
-                    if current_effective_price >= last_effective_price * 0.9:
-                        # 価格が同じか高くなった場合はスキップ
-                        should_send = False
-                        logger.info(f"前回の通知から{elapsed_days:.1f}日しか経っておらず、価格に大きな変動がないため通知をスキップします")
-                    else:
-                        logger.info(f"前回の通知から{elapsed_days:.1f}日ですが、価格が大幅に下がったため再通知します")
-        except (ValueError, TypeError) as e:
-            # 日付の解析に失敗した場合はログに記録し、通知を許可
-            logger.warning(f"日付の解析に失敗しました: {str(e)}")
-            logger.warning(f"エラーが発生したアイテム: {item}")
-    
-    return should_send
+    claimed = []
+    while len(claimed) < limit:
+        response = table.query(**query_kwargs)
+        for entry in response.get('Items', []):
+            if len(claimed) >= limit:
+                break
+            # インデックスは結果整合のため、取得の可否はテーブル側の条件で判定する
+            try:
+                result = table.update_item(
+                    Key={'id': entry['id']},
+                    UpdateExpression='SET claimed_until = :until, delivery_key = if_not_exists(delivery_key, :key) ADD attempts :one',
+                    ConditionExpression='outbox_pk = :pending AND (attribute_not_exists(claimed_until) OR claimed_until < :now)',
+                    ExpressionAttributeValues={
+                        ':until': now + OUTBOX_LEASE_SECONDS,
+                        ':key': delivery_key,
+                        ':one': 1,
+                        ':pending': OUTBOX_PENDING_VALUE,
+                        ':now': now
+                    },
+                    ReturnValues='ALL_NEW'
+                )
+                claimed.append(result['Attributes'])
+            except Exception as e:
+                if not is_conditional_check_failed(e):
+                    logger.error(f"アウトボックスのエントリの取得でエラーが発生: {entry['id']}: {str(e)}")
 
-def check_kindle_sales(items, table):
-    """セール情報を確認し、条件に合うものを通知する"""
-    sale_items = []
-    sale_percentage = float(os.environ.get('SALE_PERCENTAGE', '20'))
-    sale_price = int(os.environ.get('SALE_PRICE', '500'))
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return claimed
 
-    # 対象の配列をシャッフル
-    random.shuffle(items)
+def send_outbox_entries(entries, client=None):
+    """
+    取得したエントリを再試行キーごとにまとめ、作成順に並べて送信する
+    リクエストの再試行キーは再試行キーと宛先・含むエントリから求めるため、前回の送信が途中で中断していても
+    LINEが受付済みのリクエストは重複して配信されず、取得件数などで内容が変わったリクエストは別のキーで送られる
+    戻り値: 送信できた再試行キーの集合
+    """
+    groups = {}
+    for entry in sorted(entries, key=lambda entry: entry['outbox_sk']):
+        groups.setdefault(entry['delivery_key'], []).append(entry)
 
-    for item in items:
-        kindle_info = get_kindle_info(item['url'])
-        
-        if not kindle_info:
-            continue
-            
-        if kindle_info["current_price"] is None or kindle_info["list_price"] is None:
-            logger.info(f"価格情報を取得できませんでした: {kindle_info['title']}")
-            continue
-        
-        current_price = kindle_info["current_price"]
-        list_price = kindle_info["list_price"]
-        point_value = kindle_info["point_value"]
-        
-        # 割引率を計算
-        discount_percentage = calculate_discount_percentage(
-            current_price, 
-            list_price,
-            point_value
-        )
+    delivered = set()
+    for delivery_key, group in groups.items():
+        sale_items = [json.loads(entry['payload'], parse_float=Decimal) for entry in group]
+        if send_line_message(sale_items, client=client, retry_key=delivery_key):
+            delivered.add(delivery_key)
+    return delivered
 
-        has_sale = False
-        if discount_percentage >= sale_percentage or current_price <= sale_price:
-            logger.info(f"タイトル: {kindle_info['title']}, item: {kindle_info['item']}")
-            
-            # 通知条件を満たしているが、最近通知したかどうかをチェック
-            should_send_notification = should_notify(item, current_price, point_value)
-            
-            if should_send_notification:
-                sale_item = {
-                    "id": item['id'],
-                    "title": kindle_info['title'],
-                    "current_price": current_price,
-                    "list_price": list_price,
-                    "point_value": point_value,
-                    "effective_price": current_price - point_value,
-                    "discount_percentage": discount_percentage,
-                    "item": kindle_info['item']
-                }
-                sale_items.append(sale_item)
-                
-                # 通知情報を更新
-                item['last_notification'] = datetime.now().isoformat()
-            
-            has_sale = True
+def complete_outbox_entries(table, entries, delivered):
+    """
+    送信結果をエントリに記録する
+    送信できたエントリと試行回数がOUTBOX_MAX_ATTEMPTSに達したエントリは送信待ちのインデックスから外し、
+    それ以外は再試行キーを残したまま取得を解除して次回の送信に回す
+    戻り値: {'sent': 送信件数, 'retrying': 再試行待ち件数, 'failed': 送信を諦めた件数}
+    """
+    current_time = datetime.utcnow().isoformat() + 'Z'
+    purge_at = int(time.time()) + OUTBOX_RETENTION_DAYS * 24 * 3600
+    stats = {'sent': 0, 'retrying': 0, 'failed': 0}
+
+    for entry in entries:
+        if entry['delivery_key'] in delivered:
+            outcome = 'sent'
+            update_expression = 'SET sent_at = :now, purge_at = :purge REMOVE outbox_pk, outbox_sk, claimed_until'
+        elif int(entry.get('attempts', 0)) >= OUTBOX_MAX_ATTEMPTS:
+            outcome = 'failed'
+            update_expression = 'SET failed_at = :now, purge_at = :purge REMOVE outbox_pk, outbox_sk, claimed_until'
+            logger.error(f"{entry['attempts']}回送信できなかったため通知を諦めます: {entry['id']}")
         else:
-            logger.info(f"タイトル: {kindle_info['title']}")
+            outcome = 'retrying'
+            update_expression = 'SET last_attempt_at = :now REMOVE claimed_until'
+        stats[outcome] += 1
 
-        # 取得した情報を格納
-        item['current_price'] = current_price
-        item['description'] = kindle_info['title']
-        item['has_sale'] = has_sale
-        item['points'] = point_value
-        
-        # Amazonのレート制限を回避するために少し待機
-        random_value = random.uniform(0.3, 1)
-        time.sleep(random_value)
-        
-    return sale_items
+        values = {':now': current_time}
+        if outcome != 'retrying':
+            values[':purge'] = purge_at
+        try:
+            table.update_item(
+                Key={'id': entry['id']},
+                UpdateExpression=update_expression,
+                ExpressionAttributeValues=values
+            )
+        except Exception as e:
+            # 取得期限が切れた後に同じ再試行キーで送り直されるため、重複しては配信されない
+            logger.error(f"アウトボックスのエントリの更新でエラーが発生: {entry['id']}: {str(e)}")
+    return stats
 
-def format_text_message(sale_items):
-    """テキストメッセージを整形する（Flex Messageが使えない場合用）"""
-    if not sale_items:
-        return "セール対象の商品はありませんでした。"
-    
-    message = "📚 Kindleセール情報 📚\n\n"
-    for item in sale_items:
-        message += f"{item['title']}\n"
-        message += f"定価：¥{item['list_price']:,}、現在価格：¥{item['current_price']:,}\n"
-        message += f"ポイント：{item['point_value']}pt（{item['discount_percentage']:.1f}%オフ）\n"
-        message += f"{item['item']}\n\n"
-    
-    return message
+def run_outbox_sender(event, context, client=None):
+    """
+    アウトボックスの送信待ちのエントリをOUTBOX_BATCH_SIZE件ずつ送信する
+    LINEに送信できないエントリが出た場合や残り実行時間が少ない場合は、残りを次回の呼び出しに回す
+    """
+    table = get_table(event.get('table_name', 'KindleItems'))
+    client = get_line_client(client)
+    if client is None:
+        return {'statusCode': 200, 'body': json.dumps({'message': '通知先が設定されていないため送信しませんでした'}, ensure_ascii=False)}
+
+    stats = {'sent': 0, 'retrying': 0, 'failed': 0}
+    while True:
+        entries = claim_outbox_entries(table, max(1, OUTBOX_BATCH_SIZE), str(uuid.uuid4()))
+        if not entries:
+            break
+
+        batch_stats = complete_outbox_entries(table, entries, send_outbox_entries(entries, client))
+        for key in stats:
+            stats[key] += batch_stats[key]
+
+        if batch_stats['retrying'] or batch_stats['failed']:
+            logger.warning("送信できなかった通知があるため、残りは次回の呼び出しで送信します")
+            break
+        if context.get_remaining_time_in_millis() < CHECKPOINT_TIME_MARGIN_SECONDS * 1000:
+            logger.warning("残り実行時間が少ないため、残りの通知は次回の呼び出しで送信します")
+            break
 
-def create_flex_message(sale_items):
-    """LINE Flex Messageを作成する"""
-    contents = {
-        "type": "carousel",
-        "contents": []
+    logger.info(f"通知の送信結果: 送信 {stats['sent']}件, 再試行待ち {stats['retrying']}件, 送信失敗 {stats['failed']}件")
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': f"{stats['sent']}件の通知を送信しました",
+            'sent_count': stats['sent'],
+            'retrying_count': stats['retrying'],
+            'failed_count': stats['failed']
+        }, ensure_ascii=False)
     }
-    
-    for item in sale_items:
-        bubble = {
-            "type": "bubble",
-            "header": {
-                "type": "box",
-                "layout": "vertical",
-                "contents": [
-                    {
-                        "type": "text",
-                        "text": f"{item['discount_percentage']:.1f}%オフ",
-                        "color": "#ffffff",
-                        "weight": "bold",
-                        "size": "xl"
-                    }
-                ],
-                "backgroundColor": "#DD3333"
-            },
-            "body": {
-                "type": "box",
-                "layout": "vertical",
-                "contents": [
-                    {
-                        "type": "text",
-                        "text": item['title'],
-                        "weight": "bold",
-                        "size": "md",
-                        "wrap": True,
-                        "maxLines": 2
-                    },
-                    {
-                        "type": "box",
-                        "layout": "vertical",
-                        "margin": "lg",
-                        "contents": [
-                            {
-                                "type": "box",
-                                "layout": "baseline",
-                                "contents": [
-                                    {
-                                        "type": "text",
-                                        "text": "定価",
-                                        "color": "#999999",
-                                        "size": "sm",
-                                        "flex": 1
-                                    },
-                                    {
-                                        "type": "text",
-                                        "text": f"¥{item['list_price']:,}",
-                                        "color": "#999999",
-                                        "size": "sm",
-                                        "decoration": "line-through",
-                                        "flex": 2
-                                    }
-                                ]
-                            },
-                            {
-                                "type": "box",
-                                "layout": "baseline",
-                                "contents": [
-                                    {
-                                        "type": "text",
-                                        "text": "現在価格",
-                                        "color": "#333333",
-                                        "size": "sm",
-                                        "flex": 1
-                                    },
-                                    {
-                                        "type": "text",
-                                        "text": f"¥{item['current_price']:,}",
-                                        "color": "#333333",
-                                        "size": "sm",
-                                        "flex": 2
-                                    }
-                                ]
-                            },
-                            {
-                                "type": "box",
-                                "layout": "baseline",
-                                "contents": [
-                                    {
-                                        "type": "text",
-                                        "text": "ポイント",
-                                        "color": "#333333",
-                                        "size": "sm",
-                                        "flex": 1
-                                    },
-                                    {
-                                        "type": "text",
-                                        "text": f"{item['point_value']}pt",
-                                        "color": "#333333",
-                                        "size": "sm",
-                                        "flex": 2
-                                    }
-                                ]
-                            },
-                            {
-                                "type": "box",
-                                "layout": "baseline",
-                                "contents": [
-                                    {
-                                        "type": "text",
-                                        "text": "実質価格",
-                                        "color": "#DD3333",
-                                        "size": "sm",
-                                        "weight": "bold",
-                                        "flex": 1
-                                    },
-                                    {
-                                        "type": "text",
-                                        "text": f"¥{item['effective_price']:,}",
-                                        "color": "#DD3333",
-                                        "size": "sm",
-                                        "weight": "bold",
-                                        "flex": 2
-                                    }
-                                ]
-                            }
-                        ]
-                    }
-                ]
-            },
-            "footer": {
-                "type": "box",
-                "layout": "vertical",
-                "contents": [
-                    {
-                        "type": "button",
-                        "style": "primary",
-                        "action": {
-                            "type": "uri",
-                            "label": "商品を見る",
-                            "uri": item['item']
-                        }
-                    }
-                ]
-            }
-        }
-        contents["contents"].append(bubble)
-    
-    return contents
 
-def send_line_message(sale_items):
-    """LINE Messaging APIで通知を送信する"""
-    if not LINE_CHANNEL_ACCESS_TOKEN or not LINE_USER_ID:
-        logger.warning("LINE Channel Access TokenまたはUser IDが設定されていません。通知は送信されません。")
-        return False
-    
+def invoke_outbox_sender_lambda(payload, context):
+    """送信処理を同じLambda関数の別インスタンスとして非同期で呼び出す"""
+    get_aws_client('lambda').invoke(
+        FunctionName=context.invoked_function_arn,
+        InvocationType='Event',
+        Payload=json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    )
+
+def invoke_outbox_sender_locally(payload, context):
+    """送信処理を同一プロセス内で実行する（テスト・ローカル検証用の代替呼び出し先）"""
+    return lambda_handler(payload, context)
+
+OUTBOX_DISPATCHERS = {
+    'lambda': invoke_outbox_sender_lambda,
+    'local': invoke_outbox_sender_locally
+}
+
+def trigger_outbox_sender(table, context, dispatcher=None):
+    """アウトボックスの送信処理を呼び出す（失敗しても送信待ちのエントリは次回の呼び出しで送信される）"""
+    if dispatcher is None:
+        dispatcher = OUTBOX_DISPATCHERS.get(OUTBOX_DISPATCH_MODE, invoke_outbox_sender_lambda)
     try:
-        line_bot_api = LineBotApi(LINE_CHANNEL_ACCESS_TOKEN)
-        
-        # セール商品がある場合
-        if sale_items:
-            # まず通常のテキストメッセージを送信
-            text_message = f"📚 {len(sale_items)}冊のKindleセール本が見つかりました！"
-            line_bot_api.push_message(
-                LINE_USER_ID, 
-                TextSendMessage(text=text_message)
-            )
-            
-            # Flex Messageを送信（リッチメッセージ）
-            try:
-                flex_contents = create_flex_message(sale_items)
-                flex_message = FlexSendMessage(
-                    alt_text='Kindleセール情報',
-                    contents=flex_contents
-                )
-                logger.info(f"flex_contents length: {len(flex_contents)}")
-                line_bot_api.push_message(LINE_USER_ID, flex_message)
-            except Exception as flex_error:
-                # Flex Messageが送信できない場合はテキストで送信
-                logger.warning(f"Flex Message送信エラー: {flex_error}")
-                text_content = format_text_message(sale_items)
-                line_bot_api.push_message(
-                    LINE_USER_ID,
-                    TextSendMessage(text=text_content)
-                )
-        else:
-            # セール商品がない場合は通知しない
-            logger.info("セール商品がないため、通知は送信されません")
-        
-        return True
-    except LineBotApiError as e:
-        logger.error(f"LINE API Error: {e}")
-        return False
+        dispatcher({'mode': 'outbox_sender', 'table_name': table.name}, context)
+        logger.info("通知の送信処理を呼び出しました")
     except Exception as e:
-        logger.error(f"LINE通知の送信中にエラーが発生: {str(e)}")
-        return False
+        logger.error(f"通知の送信処理の呼び出しに失敗しました（次回の実行で送信されます）: {str(e)}")
 
 def next_schedule(context):
     # 現在の関数名を取得
     function_name = context.function_name
 
-    # EventBridge クライアントの作成
-    event_bridge = boto3.client('events')
+    # EventBridge クライアントの取得
+    event_bridge = get_aws_client('events')
     
-    # Lambda クライアントの作成
-    lambda_client = boto3.client('lambda')
+    # Lambda クライアントの取得
+    lambda_client = get_aws_client('lambda')
     
     # まず、この関数に関連する既存のルールを検索して削除
     try:
@@ -739,16 +2396,547 @@ def next_schedule(context):
     
     logger.info(f"前回のルールを削除し、次回実行は JST {next_run_jst} (UTC {next_run_time}) にスケジュールされました")
 
+def is_sale_window(now=None):
+    """セールが始まりやすい曜日（JST）かどうかを判定する"""
+    now_jst = (now or datetime.utcnow()) + timedelta(hours=9)
+    return now_jst.weekday() in SALE_WINDOW_WEEKDAYS
+
+def schedule_score(item, now_epoch):
+    """
+    取得の優先度を計算する
+    経過時間（最大許容時間に対する割合）を価格変動率で重み付けし、セール中のアイテムに加点する
+    """
+    staleness = (now_epoch - int(item['last_checked_at'])) / (MAX_STALENESS_HOURS * 3600)
+    score = staleness * (1 + VOLATILITY_WEIGHT * float(item.get('volatility') or 0))
+    if item.get('has_sale'):
+        score += ON_SALE_BONUS
+    return score
+
+def select_items_for_run(items, budget=None, now=None):
+    """
+    今回の実行で取得するアイテムを選ぶ
+    未確認またはMAX_STALENESS_HOURS以上確認していないアイテムは必ず含め、
+    残りの予算を優先度の高い順に割り当てる（予算0の場合は全件）
+    """
+    if budget is None:
+        budget = SCRAPE_BUDGET
+    if budget <= 0:
+        return items
+
+    now = now or datetime.utcnow()
+    if is_sale_window(now):
+        budget = int(budget * SALE_WINDOW_BUDGET_MULTIPLIER)
+
+    now_epoch = int((now - datetime(1970, 1, 1)).total_seconds())
+    max_staleness_seconds = MAX_STALENESS_HOURS * 3600
+    forced = []
+    candidates = []
+
+    for item in items:
+        last_checked = item.get('last_checked_at')
+        if last_checked is None or now_epoch - int(last_checked) >= max_staleness_seconds:
+            forced.append(item)
+        else:
+            candidates.append((schedule_score(item, now_epoch), item))
+
+    candidates.sort(key=lambda entry: entry[0], reverse=True)
+    selected = forced + [item for _, item in candidates[:max(0, budget - len(forced))]]
+
+    if len(forced) > budget:
+        logger.warning(f"最大許容時間を超えたアイテム({len(forced)}件)が予算({budget}件)を上回っています")
+    logger.info(f"スケジューラー: {len(items)}件中{len(selected)}件を取得します（必須: {len(forced)}件, 予算: {budget}件）")
+    return selected
+
+def load_checkpoint(table):
+    """
+    前回中断した実行のチェックポイントを取得する
+    存在しない場合や期限切れの場合はNoneを返す
+    """
+    checkpoint = table.get_item(Key={'id': CHECKPOINT_ID}).get('Item')
+    if not checkpoint:
+        return None
+
+    try:
+        started_at = datetime.fromisoformat(checkpoint['started_at'].replace('Z', ''))
+    except (KeyError, ValueError, TypeError, AttributeError):
+        logger.warning(f"チェックポイントの開始時刻が不正なため破棄します: {checkpoint.get('started_at')}")
+        return None
+
+    if datetime.utcnow() - started_at > timedelta(hours=CHECKPOINT_TTL_HOURS):
+        logger.info(f"チェックポイントが期限切れのため破棄します（開始: {checkpoint['started_at']}）")
+        return None
+
+    return checkpoint
+
+def save_checkpoint(table, checkpoint, sale_items):
+    """チェックポイント（進捗カーソルと、アウトボックスに登録したセール情報）を保存する"""
+    checkpoint['sale_items_json'] = json.dumps(sale_items, default=_decimal_default, ensure_ascii=False)
+    checkpoint['updated_at'] = datetime.utcnow().isoformat() + 'Z'
+    table.put_item(Item=checkpoint)
+
+def clear_checkpoint(table):
+    """チェックポイントを削除する"""
+    try:
+        table.delete_item(Key={'id': CHECKPOINT_ID})
+    except Exception as e:
+        logger.error(f"チェックポイントの削除でエラーが発生: {str(e)}")
+
+def checkpoint_order_key(seed, item_id):
+    """
+    チェックポイント用の処理順キー
+    実行ごとのseedで順序をランダム化しつつ、再開時にも同じ順序を再現できるようにする
+    """
+    return hashlib.blake2b(f"{seed}|{item_id}".encode('utf-8'), digest_size=8).hexdigest()
+
+def run_checkpointed_scrape(table, items, context):
+    """
+    アイテムをCHECKPOINT_INTERVAL件ずつ処理し、チャンクごとに結果と進捗カーソルを保存する
+    前回のチェックポイントがあればカーソルの続きから再開する
+    残り時間が少なくなった場合は途中で中断する
+    書き込み件数はチェックポイントに累計して保存し、再開した実行全体の件数を返す
+    戻り値: (sale_items, write_stats, completed, run_started_at)
+    """
+    checkpoint = load_checkpoint(table)
+    if checkpoint:
+        sale_items = json.loads(checkpoint.get('sale_items_json') or '[]', parse_float=Decimal)
+        logger.info(f"チェックポイントから再開します（処理済み: {checkpoint.get('processed_count', 0)}件）")
+
+        # 中断前にスケジューラーが選んだアイテムだけを続けて処理する
+        if checkpoint.get('selected_ids') is not None:
+            selected_ids = set(checkpoint['selected_ids'])
+            items = [item for item in items if item['id'] in selected_ids]
+    else:
+        checkpoint = {
+            'id': CHECKPOINT_ID,
+            'seed': f"{random.getrandbits(64):016x}",
+            'cursor': '',
+            'processed_count': 0,
+            'started_at': datetime.utcnow().isoformat() + 'Z'
+        }
+        sale_items = []
+
+        selected = select_items_for_run(items)
+        if len(selected) < len(items):
+            checkpoint['selected_ids'] = [item['id'] for item in selected]
+            items = selected
+
+    write_stats = {key: int(checkpoint.get(f"{key}_count", 0)) for key in ('written', 'skipped', 'failed')}
+    run_started_at = datetime.fromisoformat(checkpoint['started_at'].replace('Z', ''))
+    seed = checkpoint['seed']
+    cursor = checkpoint.get('cursor', '')
+
+    # カーソルより後ろのアイテムだけを処理順に並べる（再開後に追加されたアイテムも順序内に入る）
+    ordered = sorted(
+        ((checkpoint_order_key(seed, item['id']), item) for item in items),
+        key=lambda entry: entry[0]
+    )
+    remaining = [entry for entry in ordered if entry[0] > cursor]
+    interval = max(1, CHECKPOINT_INTERVAL)
+
+    for start in range(0, len(remaining), interval):
+        chunk = remaining[start:start + interval]
+        chunk_items = [item for _, item in chunk]
+
+        sale_items.extend(check_kindle_sales(chunk_items, table, shuffle=False))
+        chunk_stats = update_item(table, chunk_items)
+        for key in write_stats:
+            write_stats[key] += chunk_stats[key]
+            checkpoint[f"{key}_count"] = write_stats[key]
+
+        checkpoint['cursor'] = chunk[-1][0]
+        checkpoint['processed_count'] = int(checkpoint.get('processed_count', 0)) + len(chunk)
+        save_checkpoint(table, checkpoint, sale_items)
+        update_run_progress(table, checkpoint['processed_count'], len(ordered))
+        logger.info(f"チェックポイントを保存しました: {checkpoint['processed_count']}/{len(ordered)}件")
+
+        is_last_chunk = start + interval >= len(remaining)
+        if not is_last_chunk and context.get_remaining_time_in_millis() < CHECKPOINT_TIME_MARGIN_SECONDS * 1000:
+            logger.warning("残り実行時間が少ないため、チェックポイントを保存して中断します")
+            return sale_items, write_stats, False, run_started_at
+
+    return sale_items, write_stats, True, run_started_at
+
+def invoke_continuation(event, context):
+    """
+    中断した実行の続きを処理するため、自分自身を非同期で呼び出す
+    戻り値: 呼び出せた場合True
+    """
+    try:
+        get_aws_client('lambda').invoke(
+            FunctionName=context.invoked_function_arn,
+            InvocationType='Event',
+            Payload=json.dumps(event, ensure_ascii=False).encode('utf-8')
+        )
+        logger.info("続きの処理を非同期で呼び出しました")
+        return True
+    except Exception as e:
+        logger.error(f"続きの処理の呼び出しに失敗しました（次回のスケジュール実行で再開します）: {str(e)}")
+        return False
+
+def _decimal_default(value):
+    """json.dumps用: DynamoDBのDecimalを数値に変換する"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def split_into_shards(items, shard_size):
+    """アイテムをshard_size件ずつのシャードに分割する"""
+    return [items[i:i + shard_size] for i in range(0, len(items), shard_size)]
+
+def shard_record_id(run_id, shard_index):
+    """シャードのレコードID"""
+    return f"{SHARD_RECORD_PREFIX}{run_id}#{shard_index}"
+
+def batch_get_records(table, record_ids, attributes=None):
+    """
+    IDを指定してレコードをまとめて取得する（100件ずつ、未処理のキーは再取得する）
+    存在しないIDは結果に含めない
+    """
+    client = table.meta.client
+    records = []
+    for start in range(0, len(record_ids), 100):
+        request = {'Keys': [{'id': record_id} for record_id in record_ids[start:start + 100]]}
+        if attributes:
+            request['ProjectionExpression'] = ', '.join(f"#a{i}" for i in range(len(attributes)))
+            request['ExpressionAttributeNames'] = {f"#a{i}": name for i, name in enumerate(attributes)}
+
+        attempt = 0
+        while request:
+            response = client.batch_get_item(RequestItems={table.name: request})
+            records.extend(response.get('Responses', {}).get(table.name, []))
+            request = response.get('UnprocessedKeys', {}).get(table.name)
+            if request:
+                backoff = min(WRITE_RETRY_MAX_SECONDS, WRITE_RETRY_BASE_SECONDS * (2 ** attempt))
+                time.sleep(random.uniform(backoff / 2, backoff))
+                attempt += 1
+    return records
+
+def build_shard_payload(table_name, run_id, shard_index, rate_share):
+    """
+    ワーカー呼び出し用のイベントを作成する
+    非同期呼び出しのイベントには大きさの上限があるため、対象アイテムはシャードのレコードに保存し、ここではIDだけを渡す
+    """
+    return {
+        'mode': 'worker',
+        'table_name': table_name,
+        'run_id': run_id,
+        'shard_index': shard_index,
+        'rate_share': rate_share
+    }
+
+def invoke_shard_lambda(payload, context):
+    """ワーカーを同じLambda関数の別インスタンスとして非同期で呼び出す（結果はワーカーがDynamoDBに報告する）"""
+    get_aws_client('lambda').invoke(
+        FunctionName=context.invoked_function_arn,
+        InvocationType='Event',
+        Payload=json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    )
+
+def invoke_shard_locally(payload, context):
+    """ワーカーを同一プロセス内で実行する（テスト・ローカル検証用の代替呼び出し先）"""
+    return lambda_handler(payload, context)
+
+SHARD_DISPATCHERS = {
+    'lambda': invoke_shard_lambda,
+    'local': invoke_shard_locally
+}
+
+def dispatch_shard(table, run, shard_index, context, dispatcher=None):
+    """シャードのワーカーを呼び出す（呼び出せなかったシャードは失敗として報告する）"""
+    if dispatcher is None:
+        dispatcher = SHARD_DISPATCHERS.get(SHARD_DISPATCH_MODE, invoke_shard_lambda)
+    payload = build_shard_payload(table.name, run['run_id'], shard_index, float(run['rate_share']))
+    try:
+        dispatcher(payload, context)
+    except Exception as e:
+        logger.error(f"シャード shard-{shard_index} の呼び出しに失敗しました: {str(e)}")
+        complete_shard(table, run['run_id'], shard_index, None, context)
+
+def shard_capacity(rate_share, context):
+    """
+    ワーカー1件が実行時間内に取得できるアイテム数の見積もり
+    ワーカーは同じ関数のため、coordinatorの残り実行時間（関数のタイムアウト以下）から中断用の余裕を除いた時間で見積もる
+    """
+    rate = AMAZON_RATE_LIMIT[0] * rate_share
+    burst = max(1, int(AMAZON_RATE_LIMIT[1] * rate_share))
+    usable_seconds = context.get_remaining_time_in_millis() / 1000 - CHECKPOINT_TIME_MARGIN_SECONDS
+    return max(1, burst + int(max(0, usable_seconds) * rate))
+
+def run_coordinator(table, items, context, dispatcher=None):
+    """
+    アイテムをシャードに分割してシャードごとのレコードを作成し、ワーカーを非同期で呼び出す
+    同時に処理するのはSHARD_MAX_PARALLEL件までとし、残りのシャードは処理を終えたワーカーが順に呼び出す
+    シャードの件数はSHARD_SIZEを上限に、ワーカーに割り当てるレートで実行時間内に取得できる件数に収める
+    各ワーカーは結果をDynamoDBに報告し、最後のシャードを終えたワーカーが実行全体の結果を記録する（finalize_shard_run）
+    戻り値: 作成したシャード数（0の場合は処理対象がない）
+    """
+    if dispatcher is None:
+        dispatcher = SHARD_DISPATCHERS.get(SHARD_DISPATCH_MODE, invoke_shard_lambda)
+
+    # 取得対象はスケジューラーで選ぶ（確認結果はワーカーが各アイテムに保存する）
+    items = select_items_for_run(items)
+
+    random.shuffle(items)
+    if not items:
+        return 0
+
+    # 別インスタンスのワーカーはそれぞれレートリミッターを持つため、同時に動くワーカーで全体のレートを分け合う
+    # シャードを小さくするとシャード数（同時に動くワーカー数）が増えて割り当てが減るため、収まるまで繰り返す
+    shard_size = max(1, SHARD_SIZE)
+    while True:
+        parallel = max(1, min(-(-len(items) // shard_size), SHARD_MAX_PARALLEL))
+        rate_share = 1.0 if dispatcher is invoke_shard_locally else 1.0 / parallel
+        capacity = shard_capacity(rate_share, context)
+        if shard_size <= capacity:
+            break
+        shard_size = capacity
+    shards = split_into_shards(items, shard_size)
+
+    run_id = uuid.uuid4().hex
+    purge_at = int(time.time()) + SHARD_RECORD_RETENTION_HOURS * 3600
+    with table.batch_writer() as batch:
+        for index, shard in enumerate(shards):
+            batch.put_item(Item={
+                'id': shard_record_id(run_id, index),
+                'run_id': run_id,
+                'status': 'queued',
+                'item_ids': [item['id'] for item in shard],
+                'purge_at': purge_at
+            })
+
+    # 前回の実行の状態レコードは置き換える（実行IDが変わるため、前回のワーカーの報告は反映されない）
+    run = {
+        'id': SHARD_RUN_ID,
+        'run_id': run_id,
+        'shard_count': len(shards),
+        'next_shard': parallel,
+        'completed_shards': 0,
+        'item_count': len(items),
+        'processed_count': 0,
+        'sale_items_count': 0,
+        'written': 0,
+        'skipped': 0,
+        'failed': 0,
+        'rate_share': Decimal(str(rate_share)),
+        'started_at': datetime.utcnow().isoformat() + 'Z'
+    }
+    table.put_item(Item=run)
+    update_run_progress(table, 0, len(items))
+    logger.info(f"{len(items)}件のアイテムを{len(shards)}シャード（{shard_size}件ずつ）に分割し、{parallel}件ずつワーカーで処理します")
+
+    for index in range(parallel):
+        dispatch_shard(table, run, index, context, dispatcher)
+    return len(shards)
+
+def claim_shard(table, run_id, shard_index, lease_seconds):
+    """
+    シャードを処理中にし、対象アイテムのIDを返す
+    未処理のシャード、または処理中のまま取得期限が切れたシャードのみを取得できる（非同期呼び出しの重複配信対策）
+    取得期限はワーカーの残り実行時間とし、タイムアウトしたワーカーの再試行（非同期呼び出しの自動再試行）が取得し直せるようにする
+    取得できない場合はNoneを返す
+    """
+    now = int(time.time())
+    try:
+        response = table.update_item(
+            Key={'id': shard_record_id(run_id, shard_index)},
+            UpdateExpression='SET #status = :running, claimed_until = :until',
+            ConditionExpression='#status = :queued OR (#status = :running AND claimed_until < :now)',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':running': 'running',
+                ':queued': 'queued',
+                ':until': now + lease_seconds,
+                ':now': now
+            },
+            ReturnValues='ALL_NEW'
+        )
+        return response['Attributes'].get('item_ids', [])
+    except Exception as e:
+        if not is_conditional_check_failed(e):
+            logger.error(f"シャード shard-{shard_index} の取得でエラーが発生: {str(e)}")
+        return None
+
+def complete_shard(table, run_id, shard_index, result, context):
+    """
+    シャードの結果をシャードのレコードと実行の状態レコードに報告する
+    resultのstatusは done（全件処理）/ partial（時間切れで途中まで）/ failed のいずれかで、resultがNoneの場合は失敗とする
+    報告したワーカーは次の未処理のシャードを呼び出し、最後のシャードであれば実行全体の結果を記録する
+    """
+    write_stats = (result or {}).get('write_stats', {'written': 0, 'skipped': 0, 'failed': 0})
+    try:
+        table.update_item(
+            Key={'id': shard_record_id(run_id, shard_index)},
+            UpdateExpression='SET #status = :status, finished_at = :now',
+            ConditionExpression='#status IN (:queued, :running)',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':status': (result or {}).get('status', 'failed'),
+                ':now': datetime.utcnow().isoformat() + 'Z',
+                ':queued': 'queued',
+                ':running': 'running'
+            }
+        )
+    except Exception as e:
+        # 報告済み（重複して呼び出されたワーカー）であれば、集計に加えない
+        if not is_conditional_check_failed(e):
+            logger.error(f"シャード shard-{shard_index} の結果の記録でエラーが発生: {str(e)}")
+        return
+
+    try:
+        run = table.update_item(
+            Key={'id': SHARD_RUN_ID},
+            UpdateExpression=(
+                'ADD completed_shards :one, next_shard :one, processed_count :processed, sale_items_count :sales, '
+                'written :written, skipped :skipped, failed :failed'
+            ),
+            ConditionExpression='run_id = :run_id',
+            ExpressionAttributeValues={
+                ':one': 1,
+                ':processed': (result or {}).get('processed_count', 0),
+                ':sales': (result or {}).get('sale_items_count', 0),
+                ':written': write_stats['written'],
+                ':skipped': write_stats['skipped'],
+                ':failed': write_stats['failed'],
+                ':run_id': run_id
+            },
+            ReturnValues='ALL_NEW'
+        )['Attributes']
+    except Exception as e:
+        # 新しい実行が始まっている場合は、この実行の結果を反映しない
+        if not is_conditional_check_failed(e):
+            logger.error(f"実行の状態レコードの更新でエラーが発生: {str(e)}")
+        return
+
+    update_run_progress(table, int(run['processed_count']), int(run['item_count']))
+
+    # 完了したシャード1件につき、未処理のシャードを1件呼び出す
+    next_index = int(run['next_shard']) - 1
+    if next_index < int(run['shard_count']):
+        dispatch_shard(table, run, next_index, context)
+
+    if int(run['completed_shards']) == int(run['shard_count']):
+        finalize_shard_run(table, run, context)
+
+def finalize_shard_run(table, run, context):
+    """
+    最後のシャードを終えたワーカーで、実行全体の結果を記録して更新ロックを解除する
+    """
+    shard_ids = [shard_record_id(run['run_id'], index) for index in range(int(run['shard_count']))]
+    shards = batch_get_records(table, shard_ids)
+    # 途中までしか処理できなかったシャードも失敗として数える（処理済みのアイテムは保存・集計済み）
+    failed_shards = [
+        f"shard-{index}"
+        for index in sorted(int(shard['id'].rsplit('#', 1)[1]) for shard in shards if shard.get('status') != 'done')
+    ]
+
+    items = scan_all_items(table)
+    write_stats = {key: int(run[key]) for key in ('written', 'skipped', 'failed')}
+    run_started_at = datetime.fromisoformat(run['started_at'].replace('Z', ''))
+    record_run_completed(table, int(run['sale_items_count']), int(run['processed_count']), write_stats, run_started_at)
+    write_catalog_summary(table, items, run_started_at, write_stats, failed_shards)
+    logger.info(f"全{run['shard_count']}シャードの処理が完了しました（失敗: {len(failed_shards)}件）")
+
+    clear_update_lock(table)
+    trigger_outbox_sender(table, context)
+
+def run_worker(event, context):
+    """
+    coordinatorから割り当てられたシャードを処理し、結果をDynamoDBに報告する
+    CHECKPOINT_INTERVAL件ずつ取得・保存し、残り実行時間が少なくなった場合はそこまでの結果を報告して終える
+    LINE通知と次回スケジュールはここでは行わない
+    """
+    table = get_table(event.get('table_name', 'KindleItems'))
+    run_id = event['run_id']
+    shard_index = int(event['shard_index'])
+    shard_id = f"shard-{shard_index}"
+
+    item_ids = claim_shard(table, run_id, shard_index, context.get_remaining_time_in_millis() // 1000)
+    if item_ids is None:
+        logger.warning(f"シャード {shard_id} は処理中か処理済みです")
+        return {'statusCode': 409, 'shard_id': shard_id}
+
+    result = {
+        'status': 'partial',
+        'sale_items_count': 0,
+        'write_stats': {'written': 0, 'skipped': 0, 'failed': 0},
+        'processed_count': 0
+    }
+    try:
+        items = [item for item in batch_get_records(table, list(item_ids), SCAN_ATTRIBUTES) if not is_system_record(item)]
+        for item in items:
+            snapshot_item(item)
+        random.shuffle(items)
+        logger.info(f"シャード {shard_id} の処理を開始します（{len(items)}件）")
+
+        interval = max(1, CHECKPOINT_INTERVAL)
+        for start in range(0, len(items), interval):
+            if start and context.get_remaining_time_in_millis() < CHECKPOINT_TIME_MARGIN_SECONDS * 1000:
+                logger.warning(f"残り実行時間が少ないため、シャード {shard_id} を{start}/{len(items)}件で終えます")
+                break
+            chunk = items[start:start + interval]
+            result['sale_items_count'] += len(check_kindle_sales(chunk, table, shuffle=False))
+            chunk_stats = update_item(table, chunk)
+            for key in result['write_stats']:
+                result['write_stats'][key] += chunk_stats[key]
+            result['processed_count'] += len(chunk)
+        else:
+            result['status'] = 'done'
+            # 削除済みで取得できなかったアイテムも処理済みとして数える
+            result['processed_count'] = len(item_ids)
+    except Exception as e:
+        logger.error(f"シャード {shard_id} の処理中にエラーが発生しました: {str(e)}")
+        result['status'] = 'failed'
+
+    complete_shard(table, run_id, shard_index, result, context)
+    if result['status'] == 'failed':
+        return {'statusCode': 500, 'shard_id': shard_id}
+    return {
+        'statusCode': 200 if result['status'] == 'done' else 206,
+        'shard_id': shard_id,
+        'sale_items_count': result['sale_items_count']
+    }
+
+def schedule_next_run(event, context):
+    """API経由での実行でない場合のみ次のスケジュールを設定する"""
+    if event.get('source') != 'api_trigger':
+        next_schedule(context)
+        logger.info("次回実行がスケジュールされました")
+    else:
+        logger.info("API経由での実行のため、次回スケジュールは設定しません")
+
+@report_init_timings
 def lambda_handler(event, context):
     """Lambda用ハンドラー関数"""
-    logger.info("Kindleセール監視を開始します")
+    mode = event.get('mode') or SCRAPER_MODE
+    logger.info(f"Kindleセール監視を開始します（モード: {mode}）")
     HEADERS["User-Agent"] = random.choice(USER_AGENTS)
+    # 接続はウォームスタート間で再利用するが、User-Agentを切り替えるためCookieは実行ごとに破棄する
+    # （ページを取得しないcoordinatorではセッションを作成しない）
+    if _http_session is not None:
+        _http_session.cookies.clear()
+
+    # ワーカーとして呼ばれた場合は全体のレートのうち割り当て分だけを使う
+    rate_share = float(event.get('rate_share', 1.0))
+    configure_rate_limit(
+        AMAZON_HOST,
+        AMAZON_RATE_LIMIT[0] * rate_share,
+        max(1, int(AMAZON_RATE_LIMIT[1] * rate_share))
+    )
+
+    if mode == 'worker':
+        return run_worker(event, context)
+
+    if mode == 'outbox_sender':
+        return run_outbox_sender(event, context)
     
-    # DynamoDBクライアントの初期化
-    dynamodb = boto3.resource('dynamodb')
+    # DynamoDBテーブルの取得（ウォームスタート時は前回のリソースを再利用）
     # テーブル名はイベントから取得するか、環境変数などから設定することも可能
     table_name = event.get('table_name', 'KindleItems')
-    table = dynamodb.Table(table_name)
+    table = get_table(table_name)
+
+    continuation_event = None
+    trigger_sender = False
+    keep_lock = False
 
     try:
         # 重複実行チェック
@@ -772,42 +2960,96 @@ def lambda_handler(event, context):
             }
         
         try:
+            run_started_at = datetime.utcnow()
             # テーブルからすべてのアイテムを取得
             items = scan_all_items(table)
             logger.info(f"取得したアイテム数: {len(items)}")
+
+            failed_shards = []
+            if mode == 'coordinator':
+                # シャードごとにワーカーが取得・保存まで行い、結果をDynamoDBに報告する
+                shard_count = run_coordinator(table, items, context)
+                if shard_count:
+                    # 更新ロックの解除と実行結果の記録は、最後のシャードを終えたワーカーが行う
+                    # 次回スケジュールはワーカーの結果を待たずに設定する
+                    keep_lock = True
+                    schedule_next_run(event, context)
+                    return {
+                        'statusCode': 202,
+                        'body': json.dumps({
+                            'message': f"{shard_count}シャードに分割してワーカーに割り当てました",
+                            'shard_count': shard_count,
+                            'processed_items_count': len(items)
+                        }, ensure_ascii=False)
+                    }
+                sale_items, write_stats = [], {'written': 0, 'skipped': 0, 'failed': 0}
+            else:
+                # セール商品を検索し、チェックポイントごとに結果を保存する
+                # 開始時刻と書き込み件数は、中断・再開をまたいだ実行全体の値を使う
+                sale_items, write_stats, completed, run_started_at = run_checkpointed_scrape(table, items, context)
+
+                if not completed:
+                    # 次回スケジュールは全件の処理が終わった実行で行う（登録済みの通知は先に送信する）
+                    # 自分自身を呼び出さない設定の場合は、次回のスケジュール実行で再開する
+                    if CHECKPOINT_SELF_CONTINUE:
+                        continuation_event = event
+                    else:
+                        schedule_next_run(event, context)
+                    trigger_sender = bool(sale_items)
+                    return {
+                        'statusCode': 202,
+                        'body': json.dumps({
+                            'message': '実行時間の上限が近いため中断しました。続きは次の呼び出しで再開します',
+                            'pending_sale_items_count': len(sale_items),
+                            'written_items_count': write_stats['written'],
+                            'skipped_writes_count': write_stats['skipped'],
+                            'failed_writes_count': write_stats['failed']
+                        }, ensure_ascii=False)
+                    }
             
-            # セール商品を検索（tableオブジェクトも渡す）
-            sale_items = check_kindle_sales(items, table)
-            
-            # セール商品がある場合のみLINE通知を送信
+            # 通知は判定したチャンク・シャードごとにアウトボックスへ登録済み
+            # 送信はロックを解除した後に送信処理を呼び出して行う（前回までに送れなかった通知も送信する）
             if sale_items:
-                logger.info(f"{len(sale_items)}件のセール商品を検出し、通知します")
-                send_line_message(sale_items)
+                logger.info(f"{len(sale_items)}件のセール商品を検出し、通知を登録しました")
             else:
                 logger.info("通知すべきセール商品は検出されませんでした")
+            trigger_sender = True
 
-            # DBに保存
-            update_item(table, items)
+            if mode != 'coordinator':
+                # 全件の処理が終わったのでチェックポイントを削除
+                clear_checkpoint(table)
+
+            record_run_completed(table, len(sale_items), len(items), write_stats, run_started_at)
+            write_catalog_summary(table, items, run_started_at, write_stats, failed_shards)
+
+            schedule_next_run(event, context)
 
-            # API経由での実行でない場合のみ次のスケジュールを設定
-            if event.get('source') != 'api_trigger':
-                next_schedule(context)
-                logger.info("次回実行がスケジュールされました")
-            else:
-                logger.info("API経由での実行のため、次回スケジュールは設定しません")
-            
             return {
                 'statusCode': 200,
                 'body': json.dumps({
-                    'message': f"{len(sale_items)}件のセール商品を検出し、通知しました",
+                    'message': f"{len(sale_items)}件のセール商品を検出し、通知を登録しました",
                     'sale_items_count': len(sale_items),
-                    'processed_items_count': len(items)
+                    'processed_items_count': len(items),
+                    'written_items_count': write_stats['written'],
+                    'skipped_writes_count': write_stats['skipped'],
+                    'failed_writes_count': write_stats['failed'],
+                    'failed_shards': failed_shards
                 }, ensure_ascii=False)
             }
-            
         finally:
-            # 実行中フラグをクリア（必ず実行）
-            clear_update_lock(table)
+            # 実行中フラグをクリア（ワーカーに引き継いだ場合を除き必ず実行）
+            if not keep_lock:
+                clear_update_lock(table)
+
+            # ロックを解除してから続きの処理と通知の送信処理を呼び出す
+            if continuation_event is not None and not invoke_continuation(continuation_event, context):
+                # 続きを呼び出せなかった場合は、次回のスケジュール実行で再開する
+                try:
+                    schedule_next_run(continuation_event, context)
+                except Exception as e:
+                    logger.error(f"次回スケジュールの設定でエラーが発生: {str(e)}")
+            if trigger_sender:
+                trigger_outbox_sender(table, context)
             
     except Exception as e:
         logger.error(f"処理中にエラーが発生しました: {str(e)}")
@@ -827,4 +3069,7 @@ def lambda_handler(event, context):
 
 # 互換性用のハンドラー
 def handler(event, context):
-    return lambda_handler(event, context)
\ No newline at end of file
+    return lambda_handler(event, context)
+
+# モジュール読み込み時間（ファイル先頭からここまで）
+_init_timings['module_load'] = round((time.perf_counter() - _MODULE_LOAD_STARTED) * 1000, 1)
\ No newline at end of file
@@ -34,10 +34,11 @@ module "cognito" {
 
 # IAMモジュール（権限管理）
 module "iam" {
-  source           = "./modules/iam"
-  project_name     = var.project_name
-  environment      = var.environment
-  dynamodb_arn     = module.dynamodb.table_arn
+  source                = "./modules/iam"
+  project_name          = var.project_name
+  environment           = var.environment
+  dynamodb_arn          = module.dynamodb.table_arn
+  scraper_function_name = var.lambda_scraper_name
 }
 
 # 共通Lambda Layerモジュール（依存関係管理）
@@ -104,7 +105,13 @@ module "kindle_scraper" {
   environment_variables = {
     LINE_CHANNEL_ACCESS_TOKEN = var.line_channel_access_token
     LINE_USER_ID              = var.line_user_id
+    LINE_USER_IDS             = var.line_user_ids
     SALE_PERCENTAGE           = tostring(var.sale_percentage)
     SALE_PRICE                = tostring(var.sale_price)
+    SCRAPER_MODE              = var.scraper_mode
+    SCRAPER_SHARD_SIZE        = tostring(var.scraper_shard_size)
+    SCRAPE_BUDGET             = tostring(var.scrape_budget)
+    MAX_STALENESS_HOURS       = tostring(var.max_staleness_hours)
+    NOTIFY_BELOW_MIN_DAYS     = tostring(var.notify_below_min_days)
   }
 }
\ No newline at end of file
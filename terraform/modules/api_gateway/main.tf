@@ -51,10 +51,11 @@ resource "aws_apigatewayv2_api" "api" {
   name          = var.api_name
   protocol_type = "HTTP"
   cors_configuration {
-    allow_origins = ["*"]
-    allow_methods = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
-    allow_headers = ["Content-Type", "Authorization"]
-    max_age       = 300
+    allow_origins  = ["*"]
+    allow_methods  = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
+    allow_headers  = ["Content-Type", "Authorization", "If-None-Match"]
+    expose_headers = ["ETag"]
+    max_age        = 300
   }
 
   tags = {
@@ -124,6 +125,24 @@ resource "aws_apigatewayv2_route" "items_post" {
   authorizer_id     = aws_apigatewayv2_authorizer.cognito.id
 }
 
+resource "aws_apigatewayv2_route" "items_batch_post" {
+  api_id    = aws_apigatewayv2_api.api.id
+  route_key = "POST /api/items/batch"
+  target    = "integrations/${aws_apigatewayv2_integration.items.id}"
+  
+  authorization_type = "JWT"
+  authorizer_id     = aws_apigatewayv2_authorizer.cognito.id
+}
+
+resource "aws_apigatewayv2_route" "items_batch_delete" {
+  api_id    = aws_apigatewayv2_api.api.id
+  route_key = "POST /api/items/batch-delete"
+  target    = "integrations/${aws_apigatewayv2_integration.items.id}"
+  
+  authorization_type = "JWT"
+  authorizer_id     = aws_apigatewayv2_authorizer.cognito.id
+}
+
 resource "aws_apigatewayv2_route" "items_by_id" {
   api_id    = aws_apigatewayv2_api.api.id
   route_key = "GET /api/items/{id}"
@@ -133,6 +152,15 @@ resource "aws_apigatewayv2_route" "items_by_id" {
   authorizer_id     = aws_apigatewayv2_authorizer.cognito.id
 }
 
+resource "aws_apigatewayv2_route" "items_history" {
+  api_id    = aws_apigatewayv2_api.api.id
+  route_key = "GET /api/items/{id}/history"
+  target    = "integrations/${aws_apigatewayv2_integration.items.id}"
+  
+  authorization_type = "JWT"
+  authorizer_id     = aws_apigatewayv2_authorizer.cognito.id
+}
+
 resource "aws_apigatewayv2_route" "items_delete" {
   api_id    = aws_apigatewayv2_api.api.id
   route_key = "DELETE /api/items/{id}"
@@ -142,6 +170,36 @@ resource "aws_apigatewayv2_route" "items_delete" {
   authorizer_id     = aws_apigatewayv2_authorizer.cognito.id
 }
 
+# statusルート（Cognito認証必須）
+resource "aws_apigatewayv2_route" "status_get" {
+  api_id    = aws_apigatewayv2_api.api.id
+  route_key = "GET /api/status"
+  target    = "integrations/${aws_apigatewayv2_integration.items.id}"
+  
+  authorization_type = "JWT"
+  authorizer_id     = aws_apigatewayv2_authorizer.cognito.id
+}
+
+# 集計ルート（Cognito認証必須）
+resource "aws_apigatewayv2_route" "summary_get" {
+  api_id    = aws_apigatewayv2_api.api.id
+  route_key = "GET /api/summary"
+  target    = "integrations/${aws_apigatewayv2_integration.items.id}"
+  
+  authorization_type = "JWT"
+  authorizer_id     = aws_apigatewayv2_authorizer.cognito.id
+}
+
+# タイトル検索ルート（Cognito認証必須）
+resource "aws_apigatewayv2_route" "search_get" {
+  api_id    = aws_apigatewayv2_api.api.id
+  route_key = "GET /api/search"
+  target    = "integrations/${aws_apigatewayv2_integration.items.id}"
+  
+  authorization_type = "JWT"
+  authorizer_id     = aws_apigatewayv2_authorizer.cognito.id
+}
+
 # updateルート（Cognito認証必須）
 resource "aws_apigatewayv2_route" "update_post" {
   api_id    = aws_apigatewayv2_api.api.id
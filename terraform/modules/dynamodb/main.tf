@@ -25,6 +25,68 @@ resource "aws_dynamodb_table" "items" {
     type = "S"
   }
 
+  attribute {
+    name = "list_pk"
+    type = "S"
+  }
+
+  attribute {
+    name = "sort_key"
+    type = "S"
+  }
+
+  attribute {
+    name = "sale_pk"
+    type = "S"
+  }
+
+  attribute {
+    name = "sale_discount"
+    type = "N"
+  }
+
+  attribute {
+    name = "outbox_pk"
+    type = "S"
+  }
+
+  attribute {
+    name = "outbox_sk"
+    type = "S"
+  }
+
+  # 一覧APIの並び順用インデックス（セール中 → ポイント還元率 → 更新日時）
+  global_secondary_index {
+    name            = "ListOrderIndex"
+    hash_key        = "list_pk"
+    range_key       = "sort_key"
+    projection_type = "ALL"
+  }
+
+  # セール中のアイテムのみを持つスパースインデックス（割引率の高い順）
+  # sale_pk / sale_discount はセール中のアイテムにだけスクレイパーが設定する
+  global_secondary_index {
+    name            = "SaleIndex"
+    hash_key        = "sale_pk"
+    range_key       = "sale_discount"
+    projection_type = "ALL"
+  }
+
+  # 送信待ちの通知（アウトボックスのエントリ）のみを持つスパースインデックス（作成順）
+  # outbox_pk / outbox_sk は送信待ちの間だけスクレイパーが設定する
+  global_secondary_index {
+    name            = "OutboxIndex"
+    hash_key        = "outbox_pk"
+    range_key       = "outbox_sk"
+    projection_type = "ALL"
+  }
+
+  # 送信済み・送信失敗のアウトボックスのエントリを保持期間の経過後に削除する
+  ttl {
+    attribute_name = "purge_at"
+    enabled        = true
+  }
+
   tags = {
     Name        = "${var.project_name}-dynamodb"
     Environment = var.environment
@@ -14,6 +14,15 @@ variable "dynamodb_arn" {
   type        = string
 }
 
+variable "scraper_function_name" {
+  description = "Lambda Scraper関数名（自分自身の呼び出しを許可する）"
+  type        = string
+}
+
+data "aws_caller_identity" "current" {}
+
+data "aws_region" "current" {}
+
 # Lambda関数用のIAMロール
 resource "aws_iam_role" "lambda_role" {
   name = "${var.project_name}_lambda_role"
@@ -62,9 +71,14 @@ resource "aws_iam_policy" "lambda_policy" {
           "dynamodb:DeleteItem",
           "dynamodb:Scan",
           "dynamodb:Query",
-          "dynamodb:UpdateItem"
+          "dynamodb:UpdateItem",
+          "dynamodb:BatchGetItem",
+          "dynamodb:BatchWriteItem"
+        ]
+        Resource = [
+          var.dynamodb_arn,
+          "${var.dynamodb_arn}/index/*"
         ]
-        Resource = var.dynamodb_arn
       }
     ]
   })
@@ -97,7 +111,10 @@ resource "aws_iam_policy" "scraper_policy" {
           "dynamodb:Query",
           "dynamodb:UpdateItem"
         ]
-        Resource = var.dynamodb_arn
+        Resource = [
+          var.dynamodb_arn,
+          "${var.dynamodb_arn}/index/*"
+        ]
       },
       # イベントルール管理権限（自動スケジューリング用）
       {
@@ -114,6 +131,17 @@ resource "aws_iam_policy" "scraper_policy" {
           "cloudwatch:PutMetricData"
         ]
         Resource = "*"
+      },
+      # シャード分割実行時のワーカー・続きの処理・通知の送信処理の呼び出し権限（スクレイパー自身のみ）
+      {
+        Effect = "Allow"
+        Action = [
+          "lambda:InvokeFunction"
+        ]
+        Resource = [
+          "arn:aws:lambda:${data.aws_region.current.name}:${data.aws_caller_identity.current.account_id}:function:${var.scraper_function_name}",
+          "arn:aws:lambda:${data.aws_region.current.name}:${data.aws_caller_identity.current.account_id}:function:${var.scraper_function_name}:*"
+        ]
       }
     ]
   })
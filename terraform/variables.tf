@@ -73,6 +73,13 @@ variable "line_user_id" {
   sensitive   = true
 }
 
+variable "line_user_ids" {
+  description = "複数のユーザーに通知する場合のLINE User ID（カンマ区切り、指定した場合はline_user_idより優先。機密情報）"
+  type        = string
+  default     = ""
+  sensitive   = true
+}
+
 variable "sale_percentage" {
   description = "セール通知する割引率のしきい値（%）"
   type        = number
@@ -83,4 +90,34 @@ variable "sale_price" {
   description = "セール通知する価格のしきい値（円）"
   type        = number
   default     = 500
+}
+
+variable "scraper_mode" {
+  description = "スクレイパーの実行モード（single: 1回の呼び出しで全件処理, coordinator: シャードに分割してワーカーに配布）"
+  type        = string
+  default     = "single"
+}
+
+variable "scraper_shard_size" {
+  description = "coordinatorモードで1ワーカーに割り当てるアイテム数"
+  type        = number
+  default     = 100
+}
+
+variable "scrape_budget" {
+  description = "1回の実行で取得するアイテム数の上限（0の場合は全件を取得）"
+  type        = number
+  default     = 0
+}
+
+variable "max_staleness_hours" {
+  description = "この時間以上確認していないアイテムは予算に関係なく取得する"
+  type        = number
+  default     = 72
+}
+
+variable "notify_below_min_days" {
+  description = "0より大きい場合、実質価格が直近N日間の最安値以下のときのみ通知する"
+  type        = number
+  default     = 0
 }
\ No newline at end of file